@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Profile
+from .models import CustomUser, Profile, OutgoingEmail
 
 class CustomUserAdmin(UserAdmin):
     model = CustomUser
@@ -27,3 +27,10 @@ admin.site.register(CustomUser, CustomUserAdmin)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'phone', 'location')
     search_fields = ('user__email', 'user__username', 'location')
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'recipients')
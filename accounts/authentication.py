@@ -0,0 +1,169 @@
+"""
+JWT authentication that resolves the request user from token claims.
+
+Tokens issued by ``CountyConnectRefreshToken`` carry the user's role,
+activity and staff flags, county scope and ``auth_version``.
+``CachedJWTAuthentication`` builds ``request.user`` from them: a CustomUser
+whose other fields are deferred, so they load lazily if a view needs them.
+
+``CustomUser.auth_version`` is incremented in the database by every change
+that can alter the claims: saving or deleting the user and changing their
+officer posting (see ``accounts.signals``). Claims are trusted only while
+they carry the current version. It is mirrored in the shared cache, so a
+typical authenticated request makes no database queries for the user. When
+the cache has no entry, say because it was evicted, the version is read
+from the user row rather than assumed unchanged. Older tokens are resolved
+from the database, and kept per process in a small LRU keyed by version.
+Refreshing a token re-reads its claims from the user row.
+
+Without a shared cache backend (see countyconnect.caches) every request
+loads the user from the database, as JWTAuthentication does.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from countyconnect.caches import is_shared
+
+User = get_user_model()
+
+# User fields carried as token claims, in addition to "county".
+CLAIM_FIELDS = ("role", "is_active", "is_staff", "is_superuser", "auth_version")
+
+
+class UserCache:
+    """
+    Thread-safe LRU of (user id, auth version) -> resolved claims, each kept for ``ttl`` seconds.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize, self.ttl = maxsize, ttl
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = (time.monotonic() + self.ttl, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+user_cache = UserCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TTL)
+
+
+def _version_key(user_id):
+    return f"accounts:auth:version:{user_id}"
+
+
+def claims_for(user):
+    return {**{field: getattr(user, field) for field in CLAIM_FIELDS}, "county": user.county_scope}
+
+
+def invalidate(user_ids):
+    """
+    Stop trusting the claims of tokens issued until now to ``user_ids``.
+    Runs in the caller's transaction; the cache is updated once it commits.
+    """
+    user_ids = {str(user_id) for user_id in user_ids if user_id is not None}
+    if user_ids:
+        User.objects.filter(pk__in=user_ids).update(auth_version=F("auth_version") + 1)
+        transaction.on_commit(lambda: publish_versions(user_ids))
+
+
+def publish_versions(user_ids):
+    """
+    Copy the committed auth versions of ``user_ids`` to the shared cache.
+    Set rather than deleted, so a request that read the row before the
+    commit cannot put the old version back (it only ever adds).
+    """
+    if not is_shared():
+        return
+    versions = dict(User.objects.filter(pk__in=user_ids).values_list("pk", "auth_version"))
+    cache.set_many(
+        {_version_key(user_id): version for user_id, version in versions.items()},
+        timeout=settings.AUTH_USER_CACHE_TTL,
+    )
+    cache.delete_many([_version_key(user_id) for user_id in user_ids if int(user_id) not in versions])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that takes the user from signed claims instead of a
+    database lookup, falling back to the database for tokens that predate a
+    change to the user, carry no claims, or whose version is unknown.
+    """
+
+    def get_user(self, validated_token):
+        if not is_shared():
+            return super().get_user(validated_token)
+
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        user_id = str(user_id)
+
+        version = cache.get(_version_key(user_id))
+        claims = None
+        if version is not None:
+            claims = self.token_claims(validated_token, version) or user_cache.get((user_id, version))
+        if claims is None:
+            # Unknown version: only the user row can say which claims are current.
+            claims = self.load_claims(user_id)
+            cache.add(_version_key(user_id), claims["auth_version"], timeout=settings.AUTH_USER_CACHE_TTL)
+            user_cache.set((user_id, claims["auth_version"]), claims)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not claims["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return self.build_user(user_id, claims)
+
+    @staticmethod
+    def token_claims(validated_token, version):
+        if any(field not in validated_token for field in (*CLAIM_FIELDS, "county")):
+            return None
+        if validated_token["auth_version"] != version:
+            return None
+        return {field: validated_token[field] for field in (*CLAIM_FIELDS, "county")}
+
+    def load_claims(self, user_id):
+        try:
+            user = self.user_model.objects.only("id", *CLAIM_FIELDS).get(**{api_settings.USER_ID_FIELD: user_id})
+        except (self.user_model.DoesNotExist, ValueError):
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        return claims_for(user)
+
+    def build_user(self, user_id, claims):
+        values = {"id": self.user_model._meta.pk.to_python(user_id), **claims}
+        # from_db() expects the loaded fields in model order; the rest stay deferred.
+        fields = [field.attname for field in self.user_model._meta.concrete_fields if field.attname in values]
+        user = self.user_model.from_db(
+            router.db_for_read(self.user_model), fields, [values[field] for field in fields]
+        )
+        user.county_scope = claims["county"]
+        return user
@@ -0,0 +1,127 @@
+"""
+In-process Bloom filter in front of the refresh token blacklist.
+
+``CountyConnectRefreshToken.check_blacklist`` asks ``blacklist_filter``
+before querying ``token_blacklist``. A token the filter has never seen is
+not blacklisted, so a refresh can skip the database. A hit, which may be a
+false positive, falls through to the usual query.
+
+The filter only knows the tokens blacklisted before its last rebuild. Every
+blacklisting, once committed, increments a generation counter in the shared
+cache, and a rebuild records the value it started from. The filter's "no"
+is trusted only while the counter still holds that value. A blacklisting
+anywhere since the rebuild, or a counter the cache has evicted, sends every
+check to the database until the next rebuild. Without a shared cache
+``check_blacklist`` always queries. Once the filter is older than
+``TOKEN_BLACKLIST_FILTER_TTL`` seconds, or before it is first built, every
+token is reported as possibly blacklisted and a rebuild runs on a
+background thread, never on the request that noticed.
+
+``manage.py prune_tokens`` keeps the tables, and so the filter, bounded.
+"""
+import hashlib
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: k positions from the two halves of one digest.
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+GENERATION_KEY = "accounts:blacklist:generation"
+
+
+def current_generation():
+    """
+    The counter's value, starting it from a timestamp if it is missing so a
+    restarted counter never repeats a value a filter may have recorded.
+    """
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+class BlacklistFilter:
+    def __init__(self, ttl, error_rate):
+        self.ttl, self.error_rate = ttl, error_rate
+        # (filter, monotonic time its query started, generation it covers), swapped as one.
+        self.built = None
+        self.lock = threading.Lock()
+        self.rebuilding = False
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="blacklist-filter")
+
+    def rebuild(self):
+        # Read before the query: a blacklisting it misses has bumped the generation since.
+        started, generation = time.monotonic(), current_generation()
+        tokens = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now()).order_by()
+        # Headroom so the error rate holds as the table grows until the next rebuild.
+        bloom = BloomFilter(tokens.count() * 2 + 1024, self.error_rate)
+        for jti in tokens.values_list("token__jti", flat=True).iterator(chunk_size=5000):
+            bloom.add(jti)
+        self.built = bloom, started, generation
+
+    def schedule_rebuild(self):
+        with self.lock:
+            if self.rebuilding:
+                return
+            self.rebuilding = True
+        self.executor.submit(self._rebuild_in_background)
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        finally:
+            # The executor thread outlives requests, so honour CONN_MAX_AGE here.
+            close_old_connections()
+            with self.lock:
+                self.rebuilding = False
+
+    def might_contain(self, jti):
+        """
+        False only if ``jti`` is certainly not blacklisted.
+        """
+        built = self.built
+        if built is None or time.monotonic() - built[1] > self.ttl:
+            self.schedule_rebuild()
+            return True
+        bloom, _, generation = built
+        if cache.get(GENERATION_KEY) != generation:
+            return True  # blacklisted since the rebuild, or the counter was evicted
+        return jti in bloom
+
+
+blacklist_filter = BlacklistFilter(settings.TOKEN_BLACKLIST_FILTER_TTL, settings.TOKEN_BLACKLIST_FILTER_ERROR_RATE)
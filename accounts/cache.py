@@ -0,0 +1,48 @@
+"""
+Per-user cache of the serialized /me/ profile.
+
+Entries are keyed by the user's profile version, which the signals in
+accounts.signals bump when the user or profile row changes, so a stale
+entry is never read again and simply expires. Versions start from a
+timestamp, so a version key that falls out of the cache cannot revive an
+older entry.
+
+Bumps only reach other workers through a shared cache, and a database
+cache read costs more than the profile query it would save. ProfileView
+therefore reads straight from the database, and nothing is bumped, unless
+``countyconnect.caches.is_shared()``.
+"""
+import time
+
+from django.core.cache import cache
+
+from countyconnect.caches import is_shared
+
+PREFIX = "accounts:profile"
+
+
+def _version_key(user_id):
+    return f"{PREFIX}:version:{user_id}"
+
+
+def version(user_id):
+    key = _version_key(user_id)
+    current = cache.get(key)
+    if current is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        current = cache.get(key)
+    return current
+
+
+def bump(user_id):
+    if not is_shared():
+        return  # nothing was cached to evict
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def profile_key(user_id):
+    return f"{PREFIX}:{user_id}:{version(user_id)}"
@@ -0,0 +1,103 @@
+"""
+Bounded worker pool for password hashing on the async auth path.
+
+PBKDF2 deliberately burns a few hundred milliseconds of CPU per check.
+Run inline, a login spike pins every worker. ``auth_pool`` runs the
+credential checks on a fixed number of threads instead (hashlib releases
+the GIL while hashing, so they use every core). The event loop keeps
+serving other requests meanwhile.
+
+At most ``AUTH_HASH_MAX_PENDING`` checks may be queued or running. Beyond
+that, ``run`` raises ``PoolSaturated`` straight away so the view can answer
+503 with Retry-After rather than let the queue, and every client's
+latency, grow without bound. ``stats()`` reports queue depth, wait and run
+times for the metrics endpoint.
+
+``hash_passwords`` hashes a whole batch (bulk provisioning) on threads of
+its own, so a large job neither waits behind logins nor starves them.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import close_old_connections
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+class HashingPool:
+    def __init__(self, workers, max_pending):
+        self.workers, self.max_pending = workers, max_pending
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="auth-hash")
+        self.lock = threading.Lock()
+        self.pending = self.running = self.peak_pending = 0
+        self.completed = self.rejected = 0
+        self.wait_seconds = self.run_seconds = 0.0
+
+    async def run(self, func, *args, **kwargs):
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PoolSaturated()
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+
+        submitted = time.monotonic()
+
+        def job():
+            started = time.monotonic()
+            with self.lock:
+                self.running += 1
+                self.wait_seconds += started - submitted
+            try:
+                return func(*args, **kwargs)
+            finally:
+                # Pool threads outlive requests, so honour CONN_MAX_AGE here.
+                close_old_connections()
+                with self.lock:
+                    self.running -= 1
+                    self.completed += 1
+                    self.run_seconds += time.monotonic() - started
+
+        future = self.executor.submit(job)
+        # Also fires if the job is cancelled before it starts.
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future):
+        with self.lock:
+            self.pending -= 1
+
+    def stats(self):
+        with self.lock:
+            done = self.completed or 1
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "queue_depth": self.pending - self.running,
+                "running": self.running,
+                "peak_pending": self.peak_pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.wait_seconds / done * 1000, 2),
+                "avg_run_ms": round(self.run_seconds / done * 1000, 2),
+            }
+
+
+auth_pool = HashingPool(settings.AUTH_HASH_WORKERS, settings.AUTH_HASH_MAX_PENDING)
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    make_password() for every password, in order, across ``workers`` threads.
+    """
+    workers = workers or settings.AUTH_HASH_WORKERS
+    if workers == 1 or len(passwords) < 2:
+        return [make_password(password) for password in passwords]
+    with ThreadPoolExecutor(min(workers, len(passwords)), thread_name_prefix="bulk-hash") as executor:
+        return list(executor.map(make_password, passwords))
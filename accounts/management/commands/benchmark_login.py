@@ -0,0 +1,74 @@
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from django.core.management.base import BaseCommand
+
+TARGETS = {
+    "sync": "/api/accounts/login/",
+    "async": "/api/accounts/login/async/",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test login against a running server and report throughput per core, "
+        "for the sync DRF view and the async pooled view"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', type=str, default='http://127.0.0.1:8000', help='Server base URL')
+        parser.add_argument('--email', type=str, required=True, help='Email of an active test account')
+        parser.add_argument('--password', type=str, required=True, help='Password of the test account')
+        parser.add_argument('--requests', type=int, default=200, help='Logins per target (default: 200)')
+        parser.add_argument('--concurrency', type=int, default=32, help='Concurrent clients (default: 32)')
+        parser.add_argument(
+            '--cores', type=int, default=os.cpu_count() or 1,
+            help='CPU cores available to the server, for the per-core figure (default: this machine\'s)'
+        )
+        parser.add_argument(
+            '--target', choices=sorted(TARGETS), action='append',
+            help='Only benchmark this view (repeatable; default: both)'
+        )
+
+    def handle(self, *args, **options):
+        body = {"email": options['email'], "password": options['password']}
+        local = threading.local()
+
+        def login(url):
+            session = getattr(local, "session", None)
+            if session is None:
+                session = local.session = requests.Session()
+            started = time.perf_counter()
+            try:
+                status = session.post(url, json=body, timeout=120).status_code
+            except requests.RequestException:
+                status = "error"
+            return status, time.perf_counter() - started
+
+        for target in options['target'] or list(TARGETS):
+            url = options['url'].rstrip('/') + TARGETS[target]
+            self.stdout.write(self.style.WARNING(
+                f"{target}: {options['requests']} logins, {options['concurrency']} clients -> {url}"
+            ))
+            started = time.perf_counter()
+            with ThreadPoolExecutor(options['concurrency']) as clients:
+                results = list(clients.map(login, [url] * options['requests']))
+            elapsed = time.perf_counter() - started
+
+            statuses = Counter(status for status, _ in results)
+            latencies = sorted(latency for status, latency in results if status == 200)
+            rate = statuses[200] / elapsed if elapsed else 0
+            self.stdout.write(self.style.SUCCESS(
+                f"{target}: {statuses[200]} ok, {statuses[503]} shed (503), "
+                f"{sum(statuses.values()) - statuses[200] - statuses[503]} failed in {elapsed:.2f}s"
+            ))
+            if latencies:
+                p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+                self.stdout.write(self.style.SUCCESS(
+                    f"{target}: {rate:.2f} logins/s, {rate / options['cores']:.2f} per core, "
+                    f"p50 {statistics.median(latencies) * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms"
+                ))
@@ -0,0 +1,89 @@
+import time
+from datetime import timedelta
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from accounts.models import OutgoingEmail
+
+
+class Command(BaseCommand):
+    help = "Deliver queued emails from the outbox, one SMTP connection per batch"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Emails per SMTP connection (default: 100)')
+        parser.add_argument('--max-attempts', type=int, default=5, help='Attempts before an email is marked failed (default: 5)')
+        parser.add_argument('--backoff', type=int, default=60, help='Seconds before the first retry, doubled on each attempt (default: 60)')
+        parser.add_argument('--max-backoff', type=int, default=3600, help='Upper bound on the retry delay in seconds (default: 3600)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting when it is drained')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls with --loop (default: 5)')
+
+    def handle(self, *args, **options):
+        totals = {'sent': 0, 'retry': 0, 'failed': 0}
+        while True:
+            counts = self.send_batch(options)
+            for key in totals:
+                totals[key] += counts[key]
+            if sum(counts.values()) == 0:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Outbox drained: {totals['sent']} sent, {totals['retry']} to retry, {totals['failed']} failed."
+        ))
+
+    def send_batch(self, options):
+        counts = {'sent': 0, 'retry': 0, 'failed': 0}
+        with transaction.atomic():
+            # Rows stay locked while they are sent, so concurrent workers skip them.
+            emails = list(
+                OutgoingEmail.objects.select_for_update(skip_locked=True)
+                .filter(status=OutgoingEmail.Status.PENDING, next_attempt_at__lte=timezone.now())
+                .order_by('next_attempt_at', 'id')[:options['batch_size']]
+            )
+            if not emails:
+                return counts
+
+            connection = get_connection()
+            try:
+                connection.open()
+            except Exception as exc:
+                for email in emails:
+                    counts[self.record_failure(email, exc, options)] += 1
+            else:
+                try:
+                    for email in emails:
+                        try:
+                            EmailMessage(
+                                subject=email.subject,
+                                body=email.message,
+                                from_email=email.from_email,
+                                to=email.recipients,
+                                connection=connection,
+                            ).send()
+                        except Exception as exc:
+                            counts[self.record_failure(email, exc, options)] += 1
+                        else:
+                            email.status = OutgoingEmail.Status.SENT
+                            email.sent_at = timezone.now()
+                            email.attempts += 1
+                            email.last_error = ''
+                            counts['sent'] += 1
+                finally:
+                    connection.close()
+
+            OutgoingEmail.objects.bulk_update(
+                emails, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+            )
+        return counts
+
+    def record_failure(self, email, exc, options):
+        email.attempts += 1
+        email.last_error = f"{type(exc).__name__}: {exc}"
+        if email.attempts >= options['max_attempts']:
+            email.status = OutgoingEmail.Status.FAILED
+            return 'failed'
+        delay = min(options['backoff'] * 2 ** (email.attempts - 1), options['max_backoff'])
+        email.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        return 'retry'
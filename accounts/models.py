@@ -1,4 +1,6 @@
 from django.db import models
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from cloudinary.models import CloudinaryField
 
@@ -45,6 +47,8 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=False)
     is_staff = models.BooleanField(default=False)
     date_joined = models.DateTimeField(auto_now_add=True)
+    # Incremented in the database whenever token claims may have changed (see accounts.authentication).
+    auth_version = models.PositiveIntegerField(default=0, editable=False)
 
     objects = CustomUserManager()
 
@@ -67,6 +71,18 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     def is_viewer(self):
         return self.role == self.UserRole.VIEWER
 
+    @cached_property
+    def county_scope(self):
+        """
+        County of the department this user is an officer of, if any.
+        """
+        from departments.models import DepartmentOfficer
+        return (
+            DepartmentOfficer.objects.filter(user_id=self.pk)
+            .values_list("department__county_id", flat=True)
+            .first()
+        )
+
     def get_display_name(self):
         if self.first_name or self.last_name:
             return f"{self.first_name} {self.last_name}".strip()
@@ -82,3 +98,32 @@ class Profile(models.Model):
 
     def __str__(self):
         return f"{self.user.get_display_name()}'s profile"
+
+
+class OutgoingEmail(models.Model):
+    """
+    Email outbox. Rows are written in the same transaction as the change that
+    triggers them and delivered later by the ``send_outbox`` command.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        SENT = 'SENT', 'Sent'
+        FAILED = 'FAILED', 'Failed'
+
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
@@ -0,0 +1,94 @@
+"""
+Bulk provisioning of user accounts (see BulkProvisionUsersView).
+
+Rows are validated one by one, but uniqueness is checked with one query
+per field for the whole batch. Passwords are hashed in parallel. Users and
+profiles are inserted with bulk_create, and every verification email is
+queued in the outbox in one insert, inside a single transaction. A row that
+a concurrent request took in the meantime is reported as an error.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .hashing import hash_passwords
+from .models import Profile
+from .serializers import ProvisionUserSerializer
+from .utils import send_emails
+
+User = get_user_model()
+BATCH_SIZE = 500
+
+
+def _error(index, errors):
+    return {"row": index, "status": "error", "errors": errors}
+
+
+def provision_users(rows, verification_email):
+    """
+    Create inactive accounts for ``rows`` and queue ``verification_email(user)``
+    for each. Returns one result per row, in order.
+    """
+    results = [None] * len(rows)
+    valid = []
+    for index, row in enumerate(rows):
+        serializer = ProvisionUserSerializer(data=row)
+        if serializer.is_valid():
+            data = dict(serializer.validated_data)
+            data["email"] = User.objects.normalize_email(data["email"])
+            data["username"] = data.get("username") or None
+            valid.append((index, data))
+        else:
+            results[index] = _error(index, serializer.errors)
+
+    taken_emails = set(
+        User.objects.filter(email__in=[data["email"] for _, data in valid]).values_list("email", flat=True)
+    )
+    taken_usernames = set(
+        User.objects.filter(username__in=[data["username"] for _, data in valid if data["username"]])
+        .values_list("username", flat=True)
+    )
+    accepted = []
+    for index, data in valid:
+        errors = {}
+        if data["email"] in taken_emails:
+            errors["email"] = ["A user with this email already exists."]
+        if data["username"] and data["username"] in taken_usernames:
+            errors["username"] = ["A user with this username already exists."]
+        if errors:
+            results[index] = _error(index, errors)
+            continue
+        # Later rows repeating this email/username are rejected too.
+        taken_emails.add(data["email"])
+        if data["username"]:
+            taken_usernames.add(data["username"])
+        accepted.append((index, data))
+
+    if accepted:
+        passwords = hash_passwords([data.pop("password") for _, data in accepted])
+        with transaction.atomic():
+            # Rows taken by a concurrent request since the check above are skipped, not raised.
+            User.objects.bulk_create(
+                [User(password=password, is_active=False, **data) for (_, data), password in zip(accepted, passwords)],
+                batch_size=BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+            # Read back by email: not every backend returns primary keys from bulk inserts.
+            # A row is ours only if it has the (salted, so unique) hash we inserted.
+            found = User.objects.in_bulk([data["email"] for _, data in accepted], field_name="email")
+            users = {
+                data["email"]: found[data["email"]]
+                for (_, data), password in zip(accepted, passwords)
+                if data["email"] in found and found[data["email"]].password == password
+            }
+            Profile.objects.bulk_create([Profile(user=user) for user in users.values()], batch_size=BATCH_SIZE)
+            send_emails([verification_email(user) for user in users.values()])
+
+        for index, data in accepted:
+            user = users.get(data["email"])
+            if user is not None:
+                results[index] = {"row": index, "status": "created", "id": user.pk, "email": user.email}
+            elif data["email"] in found:
+                results[index] = _error(index, {"email": ["A user with this email already exists."]})
+            else:
+                results[index] = _error(index, {"username": ["A user with this username already exists."]})
+    return results
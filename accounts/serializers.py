@@ -1,6 +1,10 @@
 from django.contrib.auth import authenticate, get_user_model
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from .models import Profile
+from .tokens import CountyConnectRefreshToken
 
 User = get_user_model()
 
@@ -24,6 +28,20 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
 
 
+#  Bulk Provisioning Row Serializer
+class ProvisionUserSerializer(serializers.Serializer):
+    """
+    One row of a bulk provisioning request. Uniqueness is checked for the
+    whole batch at once by accounts.provisioning, not per row.
+    """
+    email = serializers.EmailField(max_length=254)
+    username = serializers.CharField(max_length=150, required=False, allow_blank=True, allow_null=True)
+    first_name = serializers.CharField(max_length=30, required=False, allow_blank=True)
+    last_name = serializers.CharField(max_length=30, required=False, allow_blank=True)
+    password = serializers.CharField(write_only=True, min_length=8, style={"input_type": "password"})
+    role = serializers.ChoiceField(choices=User.UserRole.choices, default=User.UserRole.COUNTY_OFFICIAL)
+
+
 #  Login Serializer
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
@@ -46,6 +64,38 @@ class LoginSerializer(serializers.Serializer):
         return user
 
 
+#  Token Refresh Serializer
+class RefreshTokenSerializer(TokenRefreshSerializer):
+    """
+    TokenRefreshSerializer that re-stamps the role, flags and county claims
+    from the user row it checks, so the new access and rotated refresh
+    tokens never carry a role the user has lost.
+    """
+    token_class = CountyConnectRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first() if user_id else None
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        refresh.stamp(user)
+
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+
+        return data
+
+
 #  User Serializer 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -67,16 +117,25 @@ class ProfileSerializer(serializers.ModelSerializer):
         fields = ['user', 'bio', 'phone', 'location', 'avatar']
 
     def update(self, instance, validated_data):
-        # Allow updating nested user fields if provided
+        # Allow updating nested user fields if provided; only changed columns are written
         user_data = validated_data.pop('user', {})
-        for attr, value in user_data.items():
-            setattr(instance.user, attr, value)
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.user.save()
-        instance.save()
+        user_fields = self.assign_changes(instance.user, user_data)
+        profile_fields = self.assign_changes(instance, validated_data)
+        if user_fields:
+            instance.user.save(update_fields=user_fields)
+        if profile_fields:
+            instance.save(update_fields=profile_fields)
         return instance
 
+    @staticmethod
+    def assign_changes(obj, data):
+        changed = []
+        for attr, value in data.items():
+            if getattr(obj, attr) != value:
+                setattr(obj, attr, value)
+                changed.append(attr)
+        return changed
+
 
 # Password Reset Request Serializer
 class ResetPasswordSerializer(serializers.Serializer):
@@ -0,0 +1,80 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from countyconnect.caches import is_shared
+from departments.models import Department, DepartmentOfficer
+from departments.signals import bulk_saved
+from . import cache as profile_cache
+from .authentication import invalidate, publish_versions
+from .blacklist import bump_generation
+from .models import CustomUser, Profile
+
+# Saves that cannot change a token's claims.
+IGNORED_UPDATES = {frozenset({"last_login"})}
+
+
+@receiver(pre_save, sender=CustomUser)
+def bump_auth_version(sender, instance, update_fields=None, **kwargs):
+    """
+    Full saves increment the version in their own UPDATE, relative to the
+    stored value, so a stale instance can never write an older one back.
+    """
+    if not instance._state.adding and update_fields is None:
+        instance.auth_version = F("auth_version") + 1
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_claims(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and frozenset(update_fields) in IGNORED_UPDATES):
+        return
+    if update_fields is None:
+        # Bumped by the save itself; reload the new value if it is read.
+        del instance.auth_version
+        transaction.on_commit(partial(publish_versions, [instance.pk]))
+    else:
+        invalidate([instance.pk])
+
+
+@receiver(post_delete, sender=CustomUser)
+def forget_deleted_user(sender, instance, **kwargs):
+    transaction.on_commit(partial(publish_versions, [instance.pk]))
+
+
+@receiver([post_save, post_delete, bulk_saved], sender=DepartmentOfficer)
+def invalidate_officer_scope(sender, instance=None, instances=(), **kwargs):
+    """
+    The county claim comes from the officer's department.
+    """
+    invalidate(obj.user_id for obj in ([instance] if instance is not None else instances))
+
+
+@receiver([post_save, bulk_saved], sender=Department)
+def invalidate_department_scope(sender, instance=None, instances=(), created=False, **kwargs):
+    """
+    A department moved to another county moves its officers' scope.
+    """
+    if created:
+        return
+    departments = [instance] if instance is not None else instances
+    invalidate(DepartmentOfficer.objects.filter(department__in=departments).values_list("user_id", flat=True))
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def bump_blacklist_generation(sender, instance, created, **kwargs):
+    # After commit, so a filter rebuilt meanwhile still sees the counter move.
+    if created and is_shared():
+        transaction.on_commit(bump_generation)
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+@receiver([post_save, post_delete], sender=Profile)
+def evict_cached_profile(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and frozenset(update_fields) in IGNORED_UPDATES:
+        return
+    user_id = instance.pk if sender is CustomUser else instance.user_id
+    transaction.on_commit(partial(profile_cache.bump, user_id))
@@ -1,3 +1,537 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import check_password
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from departments.models import Department, DepartmentOfficer
+from locations.models import County
+
+from .authentication import invalidate, user_cache
+from .blacklist import BlacklistFilter, blacklist_filter
+from .hashing import HashingPool, hash_passwords
+from .models import CustomUser, OutgoingEmail, Profile
+from .tokens import CountyConnectRefreshToken
+from .utils import build_email, send_email, send_emails
+
+FAST_HASHER = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+# The test runner is a single process, so local memory stands in for Redis here.
+SHARED_LOCMEM = ["django.core.cache.backends.locmem.LocMemCache"]
+
+
+# ============================================================
+#   EMAIL OUTBOX
+# ============================================================
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class OutboxTests(TestCase):
+
+    def send_outbox(self, *args):
+        out = StringIO()
+        call_command("send_outbox", *args, stdout=out)
+        return out.getvalue()
+
+    def test_register_queues_instead_of_sending(self):
+        response = APIClient().post("/api/accounts/register/", {
+            "email": "wanjiku@example.com", "password": "s3cret-pass",
+        }, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.recipients, ["wanjiku@example.com"])
+        self.assertEqual(email.status, OutgoingEmail.Status.PENDING)
+        self.assertIn("/api/accounts/verify-email/", email.message)
+
+    def test_queued_email_rolls_back_with_the_caller(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            send_email("Hello", "Body", "a@example.com")
+            raise RuntimeError
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+    def test_send_outbox_delivers_pending_emails(self):
+        send_emails([build_email(f"Subject {i}", "Body", f"user{i}@example.com") for i in range(3)])
+        later = build_email("Later", "Body", "later@example.com")
+        later.next_attempt_at = timezone.now() + timedelta(hours=1)
+        later.save()
+
+        output = self.send_outbox("--batch-size", "2")
+
+        self.assertIn("3 sent, 0 to retry, 0 failed", output)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [
+            "user0@example.com", "user1@example.com", "user2@example.com",
+        ])
+        self.assertEqual(OutgoingEmail.objects.filter(status=OutgoingEmail.Status.SENT).count(), 3)
+        sent = OutgoingEmail.objects.filter(status=OutgoingEmail.Status.SENT).first()
+        self.assertEqual(sent.attempts, 1)
+        self.assertIsNotNone(sent.sent_at)
+        self.assertEqual(OutgoingEmail.objects.get(subject="Later").status, OutgoingEmail.Status.PENDING)
+
+    def test_failed_send_backs_off_then_gives_up(self):
+        send_email("Hello", "Body", "a@example.com")
+        with mock.patch("accounts.management.commands.send_outbox.EmailMessage.send", side_effect=OSError("refused")):
+            output = self.send_outbox("--max-attempts", "2", "--backoff", "60")
+            self.assertIn("0 sent, 1 to retry, 0 failed", output)
+
+            email = OutgoingEmail.objects.get()
+            self.assertEqual(email.status, OutgoingEmail.Status.PENDING)
+            self.assertEqual(email.attempts, 1)
+            self.assertEqual(email.last_error, "OSError: refused")
+            self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=50))
+
+            # Not due yet, so nothing is picked up.
+            self.assertIn("0 sent, 0 to retry, 0 failed", self.send_outbox("--max-attempts", "2"))
+
+            OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertIn("0 sent, 0 to retry, 1 failed", self.send_outbox("--max-attempts", "2"))
+
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.Status.FAILED)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_connection_failure_counts_against_every_email(self):
+        send_emails([build_email("Hello", "Body", f"user{i}@example.com") for i in range(2)])
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.open", side_effect=OSError("down")):
+            output = self.send_outbox()
+        self.assertIn("0 sent, 2 to retry, 0 failed", output)
+        self.assertEqual(set(OutgoingEmail.objects.values_list("attempts", flat=True)), {1})
+
+    def test_password_reset_is_queued(self):
+        CustomUser.objects.create_user("b@example.com", "s3cret-pass")
+        APIClient().post("/api/accounts/request-password-reset/", {"email": "b@example.com"}, format="json")
+        self.assertEqual(OutgoingEmail.objects.get().recipients, ["b@example.com"])
+
+
+# ============================================================
+#   JWT USERS FROM TOKEN CLAIMS
+# ============================================================
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+@override_settings(SHARED_CACHE_BACKENDS=SHARED_LOCMEM)
+class TokenClaimsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.admin = CustomUser.objects.create_user(
+            "admin@example.com", "s3cret-pass", role=CustomUser.UserRole.ADMIN, is_active=True
+        )
+        self.refresh = CountyConnectRefreshToken.for_user(self.admin)
+
+    def client_for(self, access):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        return client
+
+    def provision(self, access):
+        return self.client_for(access).post("/api/accounts/users/bulk/", [
+            {"email": f"official{time.monotonic_ns()}@example.com", "password": "s3cret-pass"},
+        ], format="json")
+
+    def queries(self, access):
+        """
+        Every query of an admin-only request whose view itself makes none.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_for(access).get("/api/departments/cache-stats/")
+        self.assertEqual(response.status_code, 200)
+        return [query["sql"] for query in queries]
+
+    def demote(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.role = CustomUser.UserRole.CITIZEN
+            self.admin.save()
+        user_cache.clear()  # as seen by another worker
+
+    def version(self):
+        return CustomUser.objects.values_list("auth_version", flat=True).get(pk=self.admin.pk)
+
+    def test_tokens_carry_the_claims(self):
+        access = self.refresh.access_token
+        self.assertEqual(access["role"], "ADMIN")
+        self.assertEqual((access["is_active"], access["is_staff"], access["county"]), (True, False, None))
+        self.assertEqual(access["auth_version"], 0)
+
+    def test_requests_resolve_the_user_without_a_query(self):
+        access = str(self.refresh.access_token)
+        self.assertTrue(self.queries(access))  # reads the version once
+        self.assertEqual(self.queries(access), [])
+
+    def test_demotion_applies_on_every_worker(self):
+        access = str(self.refresh.access_token)
+        self.assertEqual(self.provision(access).status_code, 201)
+        self.demote()
+        self.assertEqual(self.version(), 1)
+        self.assertEqual(self.provision(access).status_code, 403)
+
+    def test_evicted_version_is_read_from_the_user_row(self):
+        access = str(self.refresh.access_token)
+        self.assertEqual(self.provision(access).status_code, 201)
+        self.demote()
+        cache.clear()  # e.g. culled by the backend
+        self.assertEqual(self.provision(access).status_code, 403)
+
+    def test_stale_instance_cannot_restore_an_old_version(self):
+        stale = CustomUser.objects.get(pk=self.admin.pk)
+        self.demote()
+        with self.captureOnCommitCallbacks(execute=True):
+            stale.first_name = "Amina"
+            stale.save()
+        self.assertEqual(self.version(), 2)
+        self.assertEqual(stale.auth_version, 2)
+
+    def test_queryset_updates_are_invalidated_explicitly(self):
+        access = str(self.refresh.access_token)
+        self.assertEqual(self.provision(access).status_code, 201)
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.filter(pk=self.admin.pk).update(role=CustomUser.UserRole.CITIZEN)
+            invalidate([self.admin.pk])
+        self.assertEqual(self.provision(access).status_code, 403)
+
+    def test_officer_postings_change_the_county_claim(self):
+        county = County.objects.create(name="Mombasa", code=1)
+        department = Department.objects.create(name="Roads", county=county, email="roads@example.com")
+        access = str(self.refresh.access_token)
+        with self.captureOnCommitCallbacks(execute=True):
+            DepartmentOfficer.objects.create(user=self.admin, department=department)
+        self.assertEqual(self.version(), 1)
+        response = APIClient().post("/api/accounts/token/refresh/", {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(AccessToken(response.data["access"])["county"], county.pk)
+        self.assertEqual(self.provision(access).status_code, 201)  # resolved from the row
+
+    def test_refresh_restamps_claims_from_the_user_row(self):
+        self.demote()
+        response = APIClient().post("/api/accounts/token/refresh/", {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(response.status_code, 200)
+        access = AccessToken(response.data["access"])
+        self.assertEqual((access["role"], access["auth_version"]), ("CITIZEN", 1))
+        self.assertEqual(RefreshToken(response.data["refresh"])["role"], "CITIZEN")
+        self.assertEqual(self.provision(response.data["access"]).status_code, 403)
+
+    def test_refresh_rejects_deactivated_users(self):
+        CustomUser.objects.filter(pk=self.admin.pk).update(is_active=False)
+        response = APIClient().post("/api/accounts/token/refresh/", {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_process_local_cache_loads_the_user(self):
+        access = str(self.refresh.access_token)
+        with override_settings(SHARED_CACHE_BACKENDS=[]):
+            self.assertEqual(len(self.queries(access)), 1)
+            CustomUser.objects.filter(pk=self.admin.pk).update(role=CustomUser.UserRole.CITIZEN)  # no bump
+            self.assertEqual(self.provision(access).status_code, 403)
+
+
+# ============================================================
+#   ASYNC LOGIN / REGISTER ON THE HASHING POOL
+# ============================================================
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class AsyncAuthTests(TransactionTestCase):
+    # The pool's threads use their own connections, so rows must be committed.
+
+    def setUp(self):
+        CustomUser.objects.create_user("wanjiku@example.com", "s3cret-pass", is_active=True)
+
+    def post(self, path, body):
+        return async_to_sync(AsyncClient().post)(path, body, content_type="application/json")
+
+    def test_login(self):
+        response = self.post("/api/accounts/login/async/", {"email": "wanjiku@example.com", "password": "s3cret-pass"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["user"]["email"], "wanjiku@example.com")
+        self.assertIn("access", response.json())
+
+    def test_bad_credentials_and_bodies(self):
+        response = self.post("/api/accounts/login/async/", {"email": "wanjiku@example.com", "password": "wrong"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post("/api/accounts/login/async/", "not json").status_code, 400)
+        self.assertEqual(self.post("/api/accounts/login/async/", [1, 2]).status_code, 400)
+
+    def test_register_queues_the_verification_email(self):
+        response = self.post("/api/accounts/register/async/", {"email": "baraka@example.com", "password": "s3cret-pass"})
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(CustomUser.objects.get(email="baraka@example.com").is_active)
+        self.assertEqual(OutgoingEmail.objects.get().recipients, ["baraka@example.com"])
+
+    def test_saturated_pool_answers_503(self):
+        with mock.patch("accounts.views.auth_pool", HashingPool(1, 0)) as pool:
+            response = self.post("/api/accounts/login/async/", {"email": "wanjiku@example.com", "password": "s3cret-pass"})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(pool.stats()["rejected"], 1)
+
+
+class HashingPoolTests(TestCase):
+
+    def test_run_and_stats(self):
+        pool = HashingPool(2, 4)
+        self.assertEqual(async_to_sync(pool.run)(sum, [1, 2, 3]), 6)
+        stats = pool.stats()
+        self.assertEqual((stats["completed"], stats["queue_depth"], stats["running"]), (1, 0, 0))
+        self.assertEqual(stats["peak_pending"], 1)
+
+    @override_settings(PASSWORD_HASHERS=FAST_HASHER)
+    def test_hash_passwords_keeps_order(self):
+        passwords = ["one-pass", "two-pass", "three-pass"]
+        hashed = hash_passwords(passwords, workers=2)
+        self.assertTrue(all(check_password(password, encoded) for password, encoded in zip(passwords, hashed)))
+
+    def test_stats_endpoint_is_for_admins_only(self):
+        client = APIClient()
+        client.force_authenticate(CustomUser(email="staff@example.com", is_staff=True, is_active=True))
+        self.assertEqual(client.get("/api/accounts/auth-pool-stats/").status_code, 403)
+        client.force_authenticate(CustomUser(email="admin@example.com", role=CustomUser.UserRole.ADMIN, is_active=True))
+        self.assertIn("queue_depth", client.get("/api/accounts/auth-pool-stats/").data)
+
+
+# ============================================================
+#   BULK PROVISIONING
+# ============================================================
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class BulkProvisionTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser(email="admin@example.com", role=CustomUser.UserRole.ADMIN, is_active=True))
+        CustomUser.objects.create(email="existing@example.com", username="existing")
+
+    def provision(self, rows):
+        return self.client.post("/api/accounts/users/bulk/", rows, format="json")
+
+    def row(self, name, **fields):
+        return {"email": f"{name}@example.com", "password": "s3cret-pass", **fields}
+
+    def test_creates_inactive_officials_with_profiles_and_emails(self):
+        response = self.provision([self.row("amina", username="amina"), self.row("baraka", role="VIEWER")])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 2)
+        amina = CustomUser.objects.get(email="amina@example.com")
+        self.assertEqual((amina.role, amina.is_active, amina.username), ("COUNTY_OFFICIAL", False, "amina"))
+        self.assertTrue(amina.check_password("s3cret-pass"))
+        self.assertTrue(Profile.objects.filter(user=amina).exists())
+        self.assertEqual(CustomUser.objects.get(email="baraka@example.com").role, "VIEWER")
+        self.assertEqual(OutgoingEmail.objects.count(), 2)
+        self.assertEqual(response.data["results"][0], {"row": 0, "status": "created", "id": amina.pk, "email": amina.email})
+
+    def test_reports_each_failed_row(self):
+        response = self.provision([
+            self.row("amina"),
+            self.row("amina"),
+            self.row("existing"),
+            self.row("chebet", username="existing"),
+            {"email": "not-an-email", "password": "short"},
+        ])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual((response.data["created"], response.data["failed"]), (1, 4))
+        results = response.data["results"]
+        self.assertEqual([result["status"] for result in results], ["created", "error", "error", "error", "error"])
+        self.assertIn("email", results[1]["errors"])
+        self.assertIn("email", results[2]["errors"])
+        self.assertIn("username", results[3]["errors"])
+        self.assertEqual(set(results[4]["errors"]), {"email", "password"})
+
+    def test_concurrent_duplicates_fail_their_rows(self):
+        from . import provisioning
+
+        def hash_while_another_request_commits(passwords):
+            CustomUser.objects.create(email="amina@example.com")
+            CustomUser.objects.create(email="someone@example.com", username="baraka")
+            return hash_passwords(passwords)
+
+        with mock.patch.object(provisioning, "hash_passwords", hash_while_another_request_commits):
+            response = self.provision([self.row("amina"), self.row("baraka", username="baraka"), self.row("chebet")])
+
+        self.assertEqual(response.status_code, 207)
+        results = response.data["results"]
+        self.assertEqual([result["status"] for result in results], ["error", "error", "created"])
+        self.assertIn("email", results[0]["errors"])
+        self.assertIn("username", results[1]["errors"])
+        self.assertFalse(CustomUser.objects.get(email="amina@example.com").check_password("s3cret-pass"))
+        self.assertEqual(list(OutgoingEmail.objects.values_list("recipients", flat=True)), [["chebet@example.com"]])
+        self.assertEqual(Profile.objects.count(), 1)
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.provision({"email": "a@example.com"}).status_code, 400)
+        self.assertEqual(self.provision([]).status_code, 400)
+        self.assertEqual(self.provision([{"email": "bad"}]).status_code, 400)
+        self.client.force_authenticate(CustomUser(email="official@example.com", role="COUNTY_OFFICIAL", is_active=True))
+        self.assertEqual(self.provision([self.row("amina")]).status_code, 403)
+
+
+# ============================================================
+#   PROFILE CACHE
+# ============================================================
+@override_settings(SHARED_CACHE_BACKENDS=SHARED_LOCMEM)
+class ProfileCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create(email="amina@example.com", username="amina", role=CustomUser.UserRole.ADMIN, is_active=True)
+        self.profile = Profile.objects.create(user=self.user, bio="Ward clerk")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def profile_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/accounts/me/")
+        self.assertEqual(response.status_code, 200)
+        return response.data, sum("accounts_profile" in query["sql"] for query in queries.captured_queries)
+
+    def test_second_read_is_served_from_cache(self):
+        data, queries = self.profile_queries()
+        self.assertEqual((data["bio"], data["user"]["email"], queries), ("Ward clerk", "amina@example.com", 1))
+        self.assertEqual(self.profile_queries(), (data, 0))
+
+    def test_profile_and_user_writes_evict_the_entry(self):
+        self.profile_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.bio = "County engineer"
+            self.profile.save()
+        data, queries = self.profile_queries()
+        self.assertEqual((data["bio"], queries), ("County engineer", 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.username = "amina.w"
+            self.user.save()
+        data, queries = self.profile_queries()
+        self.assertEqual((data["user"]["username"], queries), ("amina.w", 1))
+
+    def test_patch_through_the_api_evicts_the_entry(self):
+        self.profile_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch("/api/accounts/me/", {"phone": "0712345678"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.profile_queries()[0]["phone"], "0712345678")
+
+    def test_unshared_backends_read_the_database(self):
+        for backend in ("locmem.LocMemCache", "db.DatabaseCache"):
+            backend_settings = {"default": {"BACKEND": f"django.core.cache.backends.{backend}", "LOCATION": "countyconnect_cache"}}
+            with self.subTest(backend), override_settings(CACHES=backend_settings, SHARED_CACHE_BACKENDS=[]):
+                self.profile_queries()
+                # Another worker's write: no bump reaches this process.
+                Profile.objects.filter(pk=self.profile.pk).update(bio=backend)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get("/api/accounts/me/")
+                self.assertEqual(response.data["bio"], backend)
+                self.assertEqual(len(queries), 1)
+                with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                    self.profile.save()
+                self.assertFalse([query for query in queries if "countyconnect_cache" in query["sql"]])
+
+
+# ============================================================
+#   REFRESH TOKEN BLACKLIST FILTER
+# ============================================================
+@override_settings(SHARED_CACHE_BACKENDS=SHARED_LOCMEM)
+class BlacklistFilterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create(email="amina@example.com", role=CustomUser.UserRole.ADMIN, is_active=True)
+        for patcher in (mock.patch.object(blacklist_filter, "built", None),
+                        mock.patch.object(blacklist_filter, "schedule_rebuild")):
+            self.addCleanup(patcher.stop)
+            self.scheduled = patcher.start()
+
+    def refresh(self, token):
+        with self.captureOnCommitCallbacks(execute=True):
+            return APIClient().post("/api/accounts/token/refresh/", {"refresh": str(token)}, format="json")
+
+    def blacklist_lookups(self, token):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.refresh(token)
+        return response, [
+            query["sql"] for query in queries.captured_queries
+            if "token_blacklist_blacklistedtoken" in query["sql"] and '"jti"' in query["sql"]
+        ]
+
+    def other_worker(self):
+        worker = BlacklistFilter(blacklist_filter.ttl, blacklist_filter.error_rate)
+        worker.rebuild()
+        return worker
+
+    def test_rotated_token_replayed_on_another_worker_is_rejected(self):
+        token = CountyConnectRefreshToken.for_user(self.user)
+        other_worker = self.other_worker()
+        self.assertEqual(self.refresh(token).status_code, 200)
+        self.assertNotIn(token["jti"], other_worker.built[0])
+        blacklist_filter.built = other_worker.built
+        response, lookups = self.blacklist_lookups(token)
+        self.assertEqual((response.status_code, len(lookups)), (401, 1))
+
+    def test_evicted_generation_sends_checks_to_the_database(self):
+        token = CountyConnectRefreshToken.for_user(self.user)
+        other_worker = self.other_worker()
+        self.assertEqual(self.refresh(token).status_code, 200)
+        cache.clear()  # e.g. evicted by the backend
+        blacklist_filter.built = other_worker.built
+        response, lookups = self.blacklist_lookups(token)
+        self.assertEqual((response.status_code, len(lookups)), (401, 1))
+
+    def test_fresh_filter_skips_the_lookup_for_unseen_tokens(self):
+        blacklist_filter.rebuild()
+        response, lookups = self.blacklist_lookups(CountyConnectRefreshToken.for_user(self.user))
+        self.assertEqual((response.status_code, lookups), (200, []))
+
+    def test_unshared_cache_always_queries(self):
+        blacklist_filter.rebuild()
+        with override_settings(SHARED_CACHE_BACKENDS=[]):
+            response, lookups = self.blacklist_lookups(CountyConnectRefreshToken.for_user(self.user))
+        self.assertEqual((response.status_code, len(lookups)), (200, 1))
+
+    def test_stale_filter_is_rebuilt_off_the_request(self):
+        token = CountyConnectRefreshToken.for_user(self.user)
+        token.blacklist()
+        response, lookups = self.blacklist_lookups(token)
+        self.assertEqual((response.status_code, len(lookups)), (401, 1))
+        self.scheduled.assert_called_once_with()
+        self.assertIsNone(blacklist_filter.built)
+
+        blacklist_filter.rebuild()
+        bloom, _, generation = blacklist_filter.built
+        blacklist_filter.built = bloom, time.monotonic() - blacklist_filter.ttl - 1, generation
+        response, lookups = self.blacklist_lookups(token)
+        self.assertEqual((response.status_code, len(lookups)), (401, 1))
+        self.assertEqual(self.scheduled.call_count, 2)
+
+    def test_rebuilds_are_scheduled_once_at_a_time(self):
+        token = CountyConnectRefreshToken.for_user(self.user)
+        token.blacklist()
+        local = BlacklistFilter(60, 0.001)
+        local.executor = mock.Mock()
+        local.schedule_rebuild()
+        local.schedule_rebuild()
+        local.executor.submit.assert_called_once_with(local._rebuild_in_background)
+        with mock.patch("accounts.blacklist.close_old_connections"):
+            local._rebuild_in_background()
+        self.assertIn(token["jti"], local.built[0])
+        self.assertFalse(local.rebuilding)
+        self.assertFalse(local.might_contain("never-issued"))
+
+
+class PruneTokensTests(TestCase):
+
+    def test_deletes_expired_tokens_in_batches(self):
+        user = CustomUser.objects.create(email="amina@example.com")
+        past, future = timezone.now() - timedelta(days=1), timezone.now() + timedelta(days=1)
+        expired = [
+            OutstandingToken.objects.create(user=user, jti=f"expired-{i}", token="t", expires_at=past)
+            for i in range(3)
+        ]
+        live = OutstandingToken.objects.create(user=user, jti="live", token="t", expires_at=future)
+        for token in (expired[0], expired[1], live):
+            BlacklistedToken.objects.create(token=token)
+
+        out = StringIO()
+        call_command("prune_tokens", "--batch-size", "2", stdout=out)
+        self.assertIn("Pruned 3 outstanding and 2 blacklisted tokens in 2 batches.", out.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list("jti", flat=True)), ["live"])
+        self.assertEqual(BlacklistedToken.objects.get().token, live)
@@ -1,6 +1,10 @@
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 import six
 
+from countyconnect.caches import is_shared
+
 class EmailVerificationTokenGenerator(PasswordResetTokenGenerator):
     def _make_hash_value(self, user, timestamp):
         return (
@@ -8,3 +12,32 @@ class EmailVerificationTokenGenerator(PasswordResetTokenGenerator):
         )
 
 email_verification_token = EmailVerificationTokenGenerator()
+
+
+class CountyConnectRefreshToken(RefreshToken):
+    """
+    Refresh token (and derived access tokens) carrying the claims that
+    accounts.authentication.CachedJWTAuthentication resolves users from.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.stamp(user)
+        return token
+
+    def stamp(self, user):
+        """
+        Set the user's current claims; access tokens made afterwards copy them.
+        """
+        from .authentication import claims_for
+
+        for claim, value in claims_for(user).items():
+            self[claim] = value
+
+    def check_blacklist(self):
+        from .blacklist import blacklist_filter
+
+        # Other workers' blacklistings only reach the filter through a shared cache.
+        if not is_shared() or blacklist_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
@@ -3,15 +3,25 @@ from .views import (
     RegisterView,
     VerifyEmailView,
     LoginView,
+    RefreshTokenView,
     ProfileView,
     RequestPasswordResetView,
-    PasswordResetConfirmView
+    PasswordResetConfirmView,
+    AsyncLoginView,
+    AsyncRegisterView,
+    AuthPoolStatsView,
+    BulkProvisionUsersView,
 )
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
+    path('users/bulk/', BulkProvisionUsersView.as_view(), name='bulk-provision-users'),
     path('verify-email/<uidb64>/<token>/', VerifyEmailView.as_view(), name='verify-email'),
     path('login/', LoginView.as_view(), name='login'),
+    path('token/refresh/', RefreshTokenView.as_view(), name='token-refresh'),
+    path('register/async/', AsyncRegisterView.as_view(), name='register-async'),
+    path('login/async/', AsyncLoginView.as_view(), name='login-async'),
+    path('auth-pool-stats/', AuthPoolStatsView.as_view(), name='auth-pool-stats'),
     path('me/', ProfileView.as_view(), name='profile'),
     path('request-password-reset/', RequestPasswordResetView.as_view(), name='request-password-reset'),
 ]
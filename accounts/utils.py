@@ -1,15 +1,23 @@
 # accounts/utils.py
-from django.core.mail import send_mail
 from django.conf import settings
+from .models import OutgoingEmail
 
-def send_email(subject, message, recipient):
-   
+
+def build_email(subject, message, recipient):
+    """
+    Unsaved outbox row, for callers that queue many emails with send_emails().
+    """
     from_email = getattr(settings, "DEFAULT_FROM_EMAIL", "obomaish@gmail.com")
-    
-    send_mail(
-        subject=subject,
-        message=message,
-        from_email=from_email,
-        recipient_list=[recipient],
-        fail_silently=False,
-    )
+    return OutgoingEmail(subject=subject, message=message, from_email=from_email, recipients=[recipient])
+
+
+def send_email(subject, message, recipient):
+    """
+    Queue an email in the outbox. It commits or rolls back with the caller's
+    transaction and is delivered by `manage.py send_outbox`.
+    """
+    build_email(subject, message, recipient).save()
+
+
+def send_emails(emails):
+    OutgoingEmail.objects.bulk_create(emails)
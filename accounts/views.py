@@ -1,22 +1,37 @@
+import json
 from rest_framework import status, generics, permissions
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenRefreshView
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.contrib.auth import get_user_model, authenticate
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from countyconnect.caches import is_shared
 from .models import Profile
-from .utils import send_email
-from .tokens import email_verification_token
+from . import cache as profile_cache
+from .hashing import PoolSaturated, auth_pool
+from .provisioning import provision_users
+from .utils import build_email, send_email
+from .tokens import email_verification_token, CountyConnectRefreshToken
 from .serializers import (
     RegisterSerializer,
     ResetPasswordSerializer,
     SetNewPasswordSerializer,
     LoginSerializer,
+    RefreshTokenSerializer,
     UserSerializer,
-    ProfileSerializer
+    ProfileSerializer,
+    ProvisionUserSerializer
 )
-from .permissions import IsCitizenOrCountyOfficialOrAdmin
+from .permissions import IsAdmin, IsCitizenOrCountyOfficialOrAdmin
 from rest_framework import exceptions
 from django.contrib.auth import get_user_model
 
@@ -26,20 +41,70 @@ User = get_user_model()
 
 #  Register User + Email Verify
 
+def verification_email(user):
+    """
+    Unsaved outbox row with the user's email verification link.
+    """
+    token = email_verification_token.make_token(user)
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    verify_link = f"http://127.0.0.1:8000/api/accounts/verify-email/{uid}/{token}/"
+    return build_email(
+        subject="Verify your CountyConnect account",
+        message=f"Hi {user.first_name or user.email},\nClick the link to verify your email: {verify_link}",
+        recipient=user.email
+    )
+
+
+@transaction.atomic
+def register_user(serializer):
+    """
+    Save a validated RegisterSerializer and queue the verification email.
+    """
+    user = serializer.save(is_active=False)
+    verification_email(user).save()
+    return user
+
+
 class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny] 
 
     def perform_create(self, serializer):
-        user = serializer.save(is_active=False)
-        token = email_verification_token.make_token(user)
-        uid = urlsafe_base64_encode(force_bytes(user.pk))
-        verify_link = f"http://127.0.0.1:8000/api/accounts/verify-email/{uid}/{token}/"
-        send_email(
-            subject="Verify your CountyConnect account",
-            message=f"Hi {user.first_name or user.email},\nClick the link to verify your email: {verify_link}",
-            recipient=user.email
-        )
+        register_user(serializer)
+
+
+
+#  Bulk Provisioning (admins)
+
+class BulkProvisionUsersView(generics.GenericAPIView):
+    """
+    POST a list of users (email, password, optional username, names and
+    role; officials by default). Valid rows become inactive accounts with
+    profiles and a queued verification email; the response reports every
+    row as created or with its errors.
+    """
+    serializer_class = ProvisionUserSerializer
+    permission_classes = [IsAdmin]
+    max_rows = 5000
+
+    def post(self, request):
+        rows = request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({'detail': 'Expected a non-empty list of users.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > self.max_rows:
+            return Response(
+                {'detail': f'At most {self.max_rows} users per request.'}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = provision_users(rows, verification_email)
+        created = sum(1 for result in results if result['status'] == 'created')
+        if created == len(rows):
+            code = status.HTTP_201_CREATED
+        elif created:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response({'created': created, 'failed': len(rows) - created, 'results': results}, status=code)
 
 
 
@@ -71,14 +136,85 @@ class LoginView(generics.GenericAPIView):
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = serializer.validated_data
+        return Response(issue_tokens(serializer.validated_data), status=status.HTTP_200_OK)
+
+
+def issue_tokens(user):
+    refresh = CountyConnectRefreshToken.for_user(user)
+    return {
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+        'user': UserSerializer(user).data
+    }
+
+
+class RefreshTokenView(TokenRefreshView):
+    serializer_class = RefreshTokenSerializer
+
+
+#  Async Login + Register (served under ASGI)
+
+def _login(data):
+    serializer = LoginSerializer(data=data)
+    if not serializer.is_valid():
+        return serializer.errors, status.HTTP_400_BAD_REQUEST
+    return issue_tokens(serializer.validated_data), status.HTTP_200_OK
+
+
+def _register(data):
+    serializer = RegisterSerializer(data=data)
+    if not serializer.is_valid():
+        return serializer.errors, status.HTTP_400_BAD_REQUEST
+    register_user(serializer)
+    return serializer.data, status.HTTP_201_CREATED
 
-        refresh = RefreshToken.for_user(user)
-        return Response({
-            'refresh': str(refresh),
-            'access': str(refresh.access_token),
-            'user': UserSerializer(user).data
-        }, status=status.HTTP_200_OK)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncCredentialsView(View):
+    """
+    JSON-only login/register that hashes on the bounded auth pool, so the
+    event loop keeps serving while PBKDF2 runs. Answers 503 with
+    Retry-After when the pool's queue is full.
+    """
+    http_method_names = ['post']
+    handler = None
+
+    async def post(self, request):
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return JsonResponse({'detail': 'JSON parse error.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            payload, code = await auth_pool.run(self.handler, data)
+        except PoolSaturated:
+            response = JsonResponse(
+                {'detail': 'Too many sign-ins in progress, please retry shortly.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            response['Retry-After'] = '1'
+            return response
+        return JsonResponse(payload, status=code)
+
+
+class AsyncLoginView(AsyncCredentialsView):
+    handler = staticmethod(_login)
+
+
+class AsyncRegisterView(AsyncCredentialsView):
+    handler = staticmethod(_register)
+
+
+class AuthPoolStatsView(APIView):
+    """
+    Queue depth, rejections and timings of the async auth hashing pool (admins only).
+    """
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return Response(auth_pool.stats())
 
 
 class ProfileView(generics.RetrieveUpdateAPIView):
@@ -87,13 +223,33 @@ class ProfileView(generics.RetrieveUpdateAPIView):
 
     def get_object(self):
         """
-        Get or create the authenticated user's profile.
+        Get the authenticated user's profile with its user in one query,
+        creating it for accounts made without one.
         """
         if self.request.user.is_anonymous:
             raise exceptions.NotAuthenticated("Authentication credentials were not provided.")
-        
-        profile, _ = Profile.objects.get_or_create(user=self.request.user)
-        return profile
+
+        profiles = Profile.objects.select_related('user')
+        try:
+            return profiles.get(user_id=self.request.user.pk)
+        except Profile.DoesNotExist:
+            Profile.objects.get_or_create(user_id=self.request.user.pk)
+            return profiles.get(user_id=self.request.user.pk)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Serve the profile from the per-user cache, keyed by its version.
+        The cache is skipped when it is per-process, since another
+        worker's version bump would never reach this one.
+        """
+        if not is_shared():
+            return Response(self.get_serializer(self.get_object()).data)
+        key = profile_cache.profile_key(request.user.pk)
+        data = cache.get(key)
+        if data is None:
+            data = dict(self.get_serializer(self.get_object()).data)
+            cache.set(key, data, settings.PROFILE_CACHE_TIMEOUT)
+        return Response(data)
 
     def update(self, request, *args, **kwargs):
         """
@@ -2,6 +2,10 @@
 ASGI config for countyconnect project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn countyconnect.asgi:application
+--workers <cores>``) so the async login/register views under /api/accounts/
+keep the event loop free while passwords are hashed on the bounded auth pool
+(accounts.hashing).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
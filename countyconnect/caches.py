@@ -0,0 +1,25 @@
+"""
+Which cache backends every worker shares.
+
+Version-key invalidation and cached responses are only correct when a
+write made by one worker is seen by all of them, and only worth it when a
+cache read is cheaper than the query it replaces. ``SHARED_CACHE_BACKENDS``
+lists the backends that are both (Redis and Memcached by default): a
+per-process backend never shares writes, and the database backend costs
+more queries than it saves. Features that depend on sharing check
+``is_shared()`` and go to the database otherwise.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+@lru_cache(maxsize=None)
+def _backend_classes(paths):
+    return tuple(import_string(path) for path in paths)
+
+
+def is_shared(alias="default"):
+    return isinstance(caches[alias], _backend_classes(tuple(settings.SHARED_CACHE_BACKENDS)))
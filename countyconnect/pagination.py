@@ -0,0 +1,229 @@
+"""
+Keyset (cursor) pagination shared by every list endpoint.
+
+Pages seek past the last row seen on the ``(ordering..., pk)`` tuple instead
+of using OFFSET, and no COUNT(*) is issued, so a deep page costs the same as
+the first one. The ordering is whatever the queryset already has: the
+OrderingFilter's ``?ordering=``, an explicit ``order_by()`` or the model's
+``Meta.ordering``, with the primary key appended as a tie-breaker.
+"""
+import base64
+import bisect
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    page_size = api_settings.PAGE_SIZE or 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    # ------------------------------------------------------------
+    #   Querysets
+    # ------------------------------------------------------------
+    def paginate_queryset(self, queryset, request, view=None):
+        self.start(request)
+        keys = self.get_keys(queryset)
+        self.ordering = [("-" if desc else "") + path for path, desc in keys]
+        values, reverse = self.decode_cursor(request)
+
+        aliases = [(f"keyset_{n}", desc != reverse) for n, (_, desc) in enumerate(keys)]
+        queryset = queryset.annotate(**{alias: F(path) for (alias, _), (path, _) in zip(aliases, keys)})
+        if values is not None:
+            values = self.typed_values(queryset, aliases, values)
+            condition = self.seek(aliases, values)
+            if condition is None:
+                queryset = queryset.none()
+            else:
+                queryset = queryset.filter(condition)
+        queryset = queryset.order_by(*[
+            # NULL sorts as the largest value in both directions.
+            F(alias).desc(nulls_first=True) if desc else F(alias).asc(nulls_last=True)
+            for alias, desc in aliases
+        ])
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        key = lambda row: [getattr(row, alias) for alias, _ in aliases]
+        self.finish(
+            values, reverse,
+            first=key(rows[0]) if rows else None,
+            last=key(rows[-1]) if rows else None,
+            has_next=has_more if not reverse else values is not None,
+            has_previous=has_more if reverse else values is not None,
+        )
+        return rows
+
+    def get_keys(self, queryset):
+        """
+        The queryset's ordering as (path, descending) pairs, ending in the primary key.
+        """
+        query = queryset.query
+        ordering = query.order_by or (query.get_meta().ordering if query.default_ordering else ())
+        keys, seen = [], set()
+        for term in ordering:
+            if not isinstance(term, str) or term == "?":
+                continue  # expressions and random ordering cannot be seeked on
+            desc = term.startswith("-")
+            path = term.lstrip("-+")
+            if path == "id":
+                path = "pk"
+            if path not in seen:
+                seen.add(path)
+                keys.append((path, desc))
+            if path == "pk":
+                break
+        if "pk" not in seen:
+            keys.append(("pk", False))
+        return keys
+
+    def typed_values(self, queryset, aliases, values):
+        """
+        Cursor values converted by each key's field, so a tampered cursor is
+        a 404 rather than a database error.
+        """
+        annotations = queryset.query.annotations
+        if any(isinstance(value, (list, dict)) for value in values):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [
+                None if value is None else annotations[alias].output_field.to_python(value)
+                for (alias, _), value in zip(aliases, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def seek(aliases, values):
+        """
+        Rows strictly after ``values`` in the order described by ``aliases``.
+        """
+        condition, equal = None, Q()
+        for (alias, desc), value in zip(aliases, values):
+            if desc:
+                after = Q(**{f"{alias}__isnull": False}) if value is None else Q(**{f"{alias}__lt": value})
+            elif value is not None:
+                after = Q(**{f"{alias}__gt": value}) | Q(**{f"{alias}__isnull": True})
+            else:
+                after = None
+            if after is not None:
+                condition = equal & after if condition is None else condition | (equal & after)
+            equal &= Q(**{f"{alias}__isnull": True}) if value is None else Q(**{alias: value})
+        return condition
+
+    # ------------------------------------------------------------
+    #   Pre-sorted sequences (e.g. the location snapshot)
+    # ------------------------------------------------------------
+    def paginate_sequence(self, count, key, ordering, request, find=None, sort_key=None):
+        """
+        Paginate positions ``0..count-1`` of a sequence already sorted by
+        ``ordering``. ``key(i)`` returns the ordering values of position i,
+        ending in the primary key; ``find(pk)`` optionally returns the
+        position of a primary key directly. ``sort_key(values)`` maps
+        ordering values to what the sequence is actually sorted on, e.g.
+        numeric codes stored as strings; it defaults to the values as-is.
+        """
+        self.start(request)
+        self.ordering = list(ordering)
+        values, reverse = self.decode_cursor(request)
+
+        if values is None:
+            start, stop = 0, self.page_size
+        else:
+            i = find(values[-1]) if find else None
+            if i is None:
+                # The row has gone; fall back to its sort position.
+                typed = sort_key or list
+                try:
+                    i = bisect.bisect_left(range(count), typed(values), key=lambda j: typed(key(j)))
+                except (TypeError, ValueError):
+                    raise NotFound(self.invalid_cursor_message)
+                start, stop = (max(i - self.page_size, 0), i) if reverse else (i, i + self.page_size)
+            else:
+                start, stop = (max(i - self.page_size, 0), i) if reverse else (i + 1, i + 1 + self.page_size)
+
+        positions = range(start, min(stop, count))
+        self.finish(
+            values, reverse,
+            first=key(positions[0]) if positions else None,
+            last=key(positions[-1]) if positions else None,
+            has_next=stop < count,
+            has_previous=start > 0,
+        )
+        return positions
+
+    # ------------------------------------------------------------
+    #   Cursors and responses
+    # ------------------------------------------------------------
+    def start(self, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def finish(self, values, reverse, first, last, has_next, has_previous):
+        if first is None and values is not None:
+            # Empty page: point back the way we came.
+            first = last = values
+        self.next_link = self.link(last, False) if has_next and last is not None else None
+        self.previous_link = self.link(first, True) if has_previous and first is not None else None
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            values, reverse, ordering = cursor["v"], bool(cursor.get("r")), cursor["o"]
+        except (AttributeError, TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if ordering != self.ordering or not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def link(self, values, reverse):
+        cursor = {"v": list(values), "o": self.ordering}
+        if reverse:
+            cursor["r"] = 1
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(cursor, cls=DjangoJSONEncoder, separators=(",", ":")).encode("utf-8")
+        ).decode("ascii")
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.next_link,
+            "previous": self.previous_link,
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from decouple import config
 from datetime import timedelta
@@ -148,11 +149,13 @@ AUTH_USER_MODEL = 'accounts.CustomUser'
 # Django REST Framework setup
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'countyconnect.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
 
@@ -166,6 +169,50 @@ SIMPLE_JWT = {
 }
 
 
+# Per-process cache of users resolved from JWT claims; its TTL also bounds how
+# long a user's auth version is kept in the shared cache
+AUTH_USER_CACHE_SIZE = config('AUTH_USER_CACHE_SIZE', default=1024, cast=int)
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=60, cast=int)
+
+# Seconds a cached /api/accounts/me/ response is kept
+PROFILE_CACHE_TIMEOUT = config('PROFILE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Threads checking passwords for the async login/register views, and how many
+# checks may queue before they answer 503
+AUTH_HASH_WORKERS = config('AUTH_HASH_WORKERS', default=os.cpu_count() or 1, cast=int)
+AUTH_HASH_MAX_PENDING = config('AUTH_HASH_MAX_PENDING', default=64, cast=int)
+
+# Seconds between rebuilds of the in-process refresh token blacklist filter,
+# and its false-positive rate (false positives fall back to a query)
+TOKEN_BLACKLIST_FILTER_TTL = config('TOKEN_BLACKLIST_FILTER_TTL', default=300, cast=int)
+TOKEN_BLACKLIST_FILTER_ERROR_RATE = config('TOKEN_BLACKLIST_FILTER_ERROR_RATE', default=0.001, cast=float)
+
+# Location hierarchy snapshot, memory-mapped by every worker on the host
+LOCATIONS_SNAPSHOT_PATH = config('LOCATIONS_SNAPSHOT_PATH', default=str(BASE_DIR / 'locations.snapshot'))
+
+# Cache (local memory by default; point it at Redis/Memcached in production
+# so every worker shares cached responses and invalidations)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='countyconnect'),
+    }
+}
+
+# Backends every worker shares and that answer faster than the database.
+# Response and profile caching are switched off on any other backend.
+SHARED_CACHE_BACKENDS = [
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.BaseMemcachedCache',
+]
+
+# Seconds a cached department directory response is kept
+DEPARTMENTS_CACHE_TIMEOUT = config('DEPARTMENTS_CACHE_TIMEOUT', default=300, cast=int)
+
+# Rows per INSERT/UPDATE statement for bulk department writes
+DEPARTMENTS_BULK_BATCH_SIZE = config('DEPARTMENTS_BULK_BATCH_SIZE', default=500, cast=int)
+
+
 # CORS (allow frontend access)
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     DepartmentCategory, Department, DepartmentUnit,
-    DepartmentOfficer, DepartmentContact
+    DepartmentOfficer, DepartmentContact, DepartmentRollup
 )
 
 admin.site.register(DepartmentCategory)
@@ -26,3 +26,15 @@ class DepartmentOfficerAdmin(admin.ModelAdmin):
     list_display = ("user", "department", "subcounty", "is_head", "active")
     list_filter = ("department", "is_head", "active")
     search_fields = ("user__username", "department__name", "subcounty__constituency_name")
+
+
+@admin.register(DepartmentRollup)
+class DepartmentRollupAdmin(admin.ModelAdmin):
+    list_display = ("county", "category", "department_count", "active_count", "budget_total", "staff_total")
+    list_filter = ("county", "category")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
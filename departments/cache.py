@@ -0,0 +1,82 @@
+"""
+Read-through response cache for the department directory.
+
+Cached responses are keyed by path, query string and the current value of
+the version keys for the scope they cover:
+
+- ``global``: bumped when categories change; part of every key.
+- ``county:<id>``: lists filtered with ?county=.
+- ``department:<id>``: lists filtered with ?department= and department detail.
+- ``all``: everything else (unfiltered lists, other detail pages).
+
+A write bumps ``all`` plus the county and department it touches, so other
+counties keep their entries. Versions start from a timestamp, so a version
+key that falls out of the cache can never revive an older entry.
+
+The cache must be shared by every worker (see countyconnect.caches), or a
+bump on one worker leaves the others serving what it evicted. Hit and miss
+counts are kept per process, so recording them costs no cache round trip.
+"""
+import hashlib
+import threading
+import time
+
+from django.core.cache import cache
+
+from countyconnect.caches import is_shared
+
+PREFIX = "departments:cache"
+
+_counts = {"hits": 0, "misses": 0}
+_counts_lock = threading.Lock()
+
+
+def _version_key(scope):
+    return f"{PREFIX}:version:{scope}"
+
+
+def versions(scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), timeout=None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump(scopes):
+    if not is_shared():
+        return  # nothing was cached to evict
+    for scope in set(scopes):
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def response_key(request, scopes):
+    query = sorted(request.query_params.lists())
+    current = versions(["global", *scopes])
+    raw = repr((request.path, query, request.accepted_renderer.format, current))
+    return f"{PREFIX}:response:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+def record(outcome):
+    with _counts_lock:
+        _counts[outcome] += 1
+
+
+def stats():
+    """
+    This process's hit and miss counts since it started.
+    """
+    with _counts_lock:
+        hits, misses = _counts["hits"], _counts["misses"]
+    return {
+        "enabled": is_shared(),
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+    }
@@ -0,0 +1,49 @@
+"""
+Streaming CSV / NDJSON exports for the department directory.
+
+Rows are read with ``values()`` through ``iterator(chunk_size=...)`` and
+encoded one at a time, so memory stays flat however large the export is
+and the first bytes leave before the query has finished.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+
+class _PassthroughRenderer(BaseRenderer):
+    """
+    Lets ``?format=`` / Accept negotiation select an export; the view streams the body itself.
+    """
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class CSVRenderer(_PassthroughRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class NDJSONRenderer(_PassthroughRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([row[name] for name in header])
+
+
+def stream_ndjson(header, rows):
+    for row in rows:
+        yield json.dumps({name: row[name] for name in header}, cls=DjangoJSONEncoder, separators=(",", ":")) + "\n"
@@ -0,0 +1,456 @@
+import os
+import resource
+import time
+from itertools import islice
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+from accounts.models import CustomUser, Profile
+from departments.importing import (
+    PasswordHasher, can_copy, copy_insert, read_rows,
+    parse_bool, parse_decimal, parse_int, parse_iso_date,
+)
+from departments.models import Department, DepartmentCategory, DepartmentOfficer, DepartmentUnit
+from departments.signals import bulk_saved
+from locations.models import County, SubCounty
+
+# Optional columns -> parser; blank cells become NULL or the field default.
+DEPARTMENT_COLUMNS = {
+    "code": str,
+    "description": str,
+    "mandate": str,
+    "phone": str,
+    "website": str,
+    "head_office_location": str,
+    "active": parse_bool,
+    "budget_allocated": parse_decimal,
+    "staff_count": parse_int,
+    "date_established": parse_iso_date,
+}
+USER_COLUMNS = {"username": str, "first_name": str, "last_name": str}
+PROFILE_COLUMNS = {"phone": str, "location": str}
+OFFICER_COLUMNS = {
+    "position": str,
+    "is_head": parse_bool,
+    "active": parse_bool,
+    "date_assigned": parse_iso_date,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-import departments and officers from CSV or XLSX files. "
+        "Departments need county, name and email columns; officers need email, county and department, "
+        "and may name a unit (created if missing) and a sub-county. New officers get a user account "
+        "(active when a password is given) and a profile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=str, help='CSV/XLSX file of departments')
+        parser.add_argument('--officers', type=str, help='CSV/XLSX file of officers')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows validated and written per batch (default: 1000)'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processes used to hash passwords (default: one per CPU)'
+        )
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Use bulk INSERTs on PostgreSQL instead of COPY'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Run the full import inside a transaction and roll it back'
+        )
+        parser.add_argument(
+            '--max-errors', type=int, default=50,
+            help='Number of rejected rows listed in the output (default: 50)'
+        )
+
+    def handle(self, *args, **options):
+        if not options['departments'] and not options['officers']:
+            raise CommandError("You must provide --departments and/or --officers")
+        self.batch_size = options['batch_size']
+        self.use_copy = can_copy() and not options['no_copy']
+        self.stats = {}
+        self.errors = []
+        started = time.perf_counter()
+
+        self.hasher = PasswordHasher(max(options['workers'], 1))
+        try:
+            with transaction.atomic():
+                # Natural keys are loaded once; batches then only look up what they add.
+                self.load_keys()
+                if options['departments']:
+                    self.import_file(options['departments'], self.write_departments)
+                if options['officers']:
+                    self.import_file(options['officers'], self.write_officers)
+                if options['dry_run']:
+                    transaction.set_rollback(True)
+        finally:
+            self.hasher.close()
+
+        for path, line, message in self.errors[:options['max_errors']]:
+            self.stdout.write(self.style.ERROR(f"{os.path.basename(path)}:{line}: {message}"))
+        if len(self.errors) > options['max_errors']:
+            self.stdout.write(self.style.ERROR(f"... and {len(self.errors) - options['max_errors']} more"))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(" Dry run: all changes rolled back."))
+        else:
+            self.stdout.write(self.style.SUCCESS(" Import complete!"))
+
+        for stage, stats in self.stats.items():
+            rate = stats['rows'] / stats['elapsed'] if stats['elapsed'] else 0
+            self.stdout.write(self.style.SUCCESS(
+                f"{stage}: {stats['rows']} rows in {stats['elapsed']:.2f}s ({rate:,.0f} rows/s)"
+            ))
+        if self.errors:
+            self.stdout.write(self.style.WARNING(f"Rejected: {len(self.errors)} rows"))
+        # ru_maxrss is reported in kilobytes on Linux.
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(self.style.SUCCESS(
+            f"Total: {time.perf_counter() - started:.2f}s wall time, {peak_mb:.1f} MB peak RSS, "
+            f"{'COPY' if self.use_copy else 'bulk INSERT'} writes, {self.hasher.workers} hashing processes"
+        ))
+
+    # ------------------------------------------------------------------
+    #   Pipeline helpers
+    # ------------------------------------------------------------------
+    def import_file(self, path, writer):
+        self.stdout.write(self.style.WARNING(f"Loading data from file: {path}"))
+        rows = read_rows(path)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            writer(path, batch)
+
+    def _record(self, stage, rows, since):
+        stats = self.stats.setdefault(stage, {"rows": 0, "elapsed": 0.0})
+        stats["rows"] += rows
+        stats["elapsed"] += time.perf_counter() - since
+
+    def reject(self, path, line, message):
+        self.errors.append((path, line, message))
+
+    def insert(self, model, objs):
+        if self.use_copy:
+            copy_insert(model, objs)
+        else:
+            model.objects.bulk_create(objs, batch_size=self.batch_size)
+
+    @staticmethod
+    def parse_columns(model, columns, row):
+        """
+        Parse the optional ``columns`` present in ``row`` into field values.
+        Raises ValueError naming the offending column.
+        """
+        values = {}
+        for column, parse in columns.items():
+            if column not in row:
+                continue
+            field = model._meta.get_field(column)
+            text = row[column]
+            if not text:
+                values[column] = None if field.null else field.get_default()
+                continue
+            if field.max_length and len(text) > field.max_length:
+                raise ValueError(f"{column}: longer than {field.max_length} characters")
+            try:
+                values[column] = parse(text)
+            except ValueError as exc:
+                raise ValueError(f"{column}: {exc}")
+        return values
+
+    @staticmethod
+    def required(row, column):
+        value = row.get(column, "")
+        if not value:
+            raise ValueError(f"{column}: required")
+        return value
+
+    def required_email(self, row):
+        email = CustomUser.objects.normalize_email(self.required(row, "email"))
+        try:
+            validate_email(email)
+        except ValidationError:
+            raise ValueError(f"email: '{email}' is not a valid address")
+        return email
+
+    def load_keys(self):
+        self.county_ids = {}
+        for pk, name, code in County.objects.values_list("id", "name", "code"):
+            self.county_ids[name.lower()] = pk
+            if code is not None:
+                self.county_ids[str(code)] = pk
+        self.category_ids = {
+            name.lower(): pk for pk, name in DepartmentCategory.objects.values_list("id", "name")
+        }
+        self.department_ids = {}
+        self.department_codes = {}
+        for pk, county_id, name, code in Department.objects.values_list("id", "county_id", "name", "code"):
+            self.department_ids[(county_id, name)] = pk
+            if code:
+                self.department_codes[code] = (county_id, name)
+        self.unit_ids = {
+            (department_id, name): pk
+            for pk, department_id, name in DepartmentUnit.objects.values_list("id", "department_id", "name")
+        }
+        self.subcounty_ids = {
+            (county_id, name.lower()): pk
+            for pk, county_id, name in SubCounty.objects.values_list("id", "county_id", "name")
+        }
+        self.seen_emails = set()
+        self.seen_usernames = set()
+
+    def county_id(self, row):
+        county = self.required(row, "county")
+        county_id = self.county_ids.get(county.lower())
+        if county_id is None:
+            raise ValueError(f"county: unknown county '{county}'")
+        return county_id
+
+    # --- Departments ---
+    def write_departments(self, path, batch):
+        start = time.perf_counter()
+        parsed = {}
+        for line, row in batch:
+            try:
+                county_id = self.county_id(row)
+                name = self.required(row, "name")
+                values = {
+                    "county_id": county_id,
+                    "name": name,
+                    "email": self.required_email(row),
+                    **self.parse_columns(Department, DEPARTMENT_COLUMNS, row),
+                }
+            except ValueError as exc:
+                self.reject(path, line, str(exc))
+                continue
+            key = (county_id, name)
+            if key in parsed:
+                self.reject(path, line, f"duplicate department '{name}' in this county")
+                continue
+            code = values.get("code")
+            if code and self.department_codes.setdefault(code, key) != key:
+                self.reject(path, line, f"code: '{code}' belongs to another department")
+                continue
+            if "category" in row:
+                values["category_id"] = row["category"] or None
+            parsed[key] = values
+        self.resolve_categories(parsed.values())
+
+        existing = Department.objects.select_for_update().in_bulk(
+            [self.department_ids[key] for key in parsed if key in self.department_ids]
+        )
+        to_create, to_update, fields = [], [], set()
+        for key, values in parsed.items():
+            department = existing.get(self.department_ids.get(key))
+            if department is None:
+                to_create.append(Department(**values))
+                continue
+            for field, value in values.items():
+                setattr(department, field, value)
+            fields.update(values)
+            to_update.append(department)
+
+        if to_create:
+            Department.objects.bulk_create(to_create, batch_size=self.batch_size)
+            created = self.read_back(Department, "county_id", "name", parsed.keys() - self.department_ids.keys())
+            self.department_ids.update(
+                ((department.county_id, department.name), department.pk) for department in created
+            )
+            bulk_saved.send(sender=Department, instances=created, created=True)
+        if to_update:
+            Department.objects.bulk_update(
+                to_update, sorted(fields - {"county_id", "name"}), batch_size=self.batch_size
+            )
+            bulk_saved.send(sender=Department, instances=to_update, created=False)
+        self._record("Departments", len(parsed), start)
+
+    def resolve_categories(self, rows):
+        """
+        Replace category names with ids, creating the categories not seen before.
+        """
+        names = {}
+        for values in rows:
+            name = values.get("category_id")
+            if name and name.lower() not in self.category_ids:
+                names.setdefault(name.lower(), name)
+        if names:
+            DepartmentCategory.objects.bulk_create(
+                [DepartmentCategory(name=name) for name in names.values()], ignore_conflicts=True
+            )
+            created = list(DepartmentCategory.objects.filter(name__in=names.values()))
+            self.category_ids.update((category.name.lower(), category.pk) for category in created)
+            bulk_saved.send(sender=DepartmentCategory, instances=created, created=True)
+        for values in rows:
+            if values.get("category_id"):
+                values["category_id"] = self.category_ids[values["category_id"].lower()]
+
+    @staticmethod
+    def read_back(model, parent_field, name_field, keys):
+        """
+        Fetch freshly inserted rows by their (parent, name) natural keys.
+        """
+        keys = set(keys)
+        candidates = model.objects.filter(**{
+            f"{parent_field}__in": {key[0] for key in keys},
+            f"{name_field}__in": {key[1] for key in keys},
+        })
+        return [obj for obj in candidates if (getattr(obj, parent_field), getattr(obj, name_field)) in keys]
+
+    # --- Officers (with their users, profiles and units) ---
+    def write_officers(self, path, batch):
+        start = time.perf_counter()
+        parsed = []
+        for line, row in batch:
+            try:
+                values = self.officer_values(row)
+            except ValueError as exc:
+                self.reject(path, line, str(exc))
+                continue
+            email, username = values["email"], values["user"].get("username")
+            if email in self.seen_emails:
+                self.reject(path, line, f"duplicate email '{email}'")
+                continue
+            if username and username in self.seen_usernames:
+                self.reject(path, line, f"duplicate username '{username}'")
+                continue
+            self.seen_emails.add(email)
+            if username:
+                self.seen_usernames.add(username)
+            parsed.append((line, values))
+
+        # Existing accounts are reused; usernames must not belong to someone else.
+        users = CustomUser.objects.in_bulk([values["email"] for _, values in parsed], field_name="email")
+        taken = dict(
+            CustomUser.objects.filter(
+                username__in=[values["user"]["username"] for _, values in parsed if values["user"].get("username")]
+            ).values_list("username", "email")
+        )
+        accepted = []
+        for line, values in parsed:
+            owner = taken.get(values["user"].get("username"))
+            if owner is not None and owner != values["email"]:
+                self.reject(path, line, f"username: '{values['user']['username']}' is taken")
+            else:
+                accepted.append(values)
+        self._record("Validation", len(batch), start)
+
+        self.create_users(path, [values for values in accepted if values["email"] not in users], users)
+        self.resolve_units(accepted)
+
+        start = time.perf_counter()
+        officers = {
+            officer.user_id: officer
+            for officer in DepartmentOfficer.objects.filter(user_id__in=[user.pk for user in users.values()])
+        }
+        to_create, to_update, fields = [], [], set()
+        for values in accepted:
+            user = users.get(values["email"])
+            if user is None:
+                continue
+            officer = officers.get(user.pk)
+            if officer is None:
+                values["officer"].setdefault("date_assigned", timezone.localdate())
+                to_create.append(DepartmentOfficer(user_id=user.pk, **values["officer"]))
+                continue
+            for field, value in values["officer"].items():
+                setattr(officer, field, value)
+            fields.update(values["officer"])
+            to_update.append(officer)
+
+        if to_create:
+            self.insert(DepartmentOfficer, to_create)
+            created = list(DepartmentOfficer.objects.filter(user_id__in=[officer.user_id for officer in to_create]))
+            bulk_saved.send(sender=DepartmentOfficer, instances=created, created=True)
+        if to_update:
+            DepartmentOfficer.objects.bulk_update(to_update, sorted(fields), batch_size=self.batch_size)
+            bulk_saved.send(sender=DepartmentOfficer, instances=to_update, created=False)
+        self._record("Officers", len(to_create) + len(to_update), start)
+
+    def officer_values(self, row):
+        county_id = self.county_id(row)
+        department = self.required(row, "department")
+        department_id = self.department_ids.get((county_id, department))
+        if department_id is None:
+            raise ValueError(f"department: unknown department '{department}' in this county")
+
+        officer = {"department_id": department_id, **self.parse_columns(DepartmentOfficer, OFFICER_COLUMNS, row)}
+        # Like the other optional columns, a blank unit or sub-county clears it.
+        if "unit" in row:
+            officer["unit_id"] = row["unit"] or None  # name, resolved once the batch's units exist
+        if "subcounty" in row:
+            subcounty_id = None
+            if row["subcounty"]:
+                subcounty_id = self.subcounty_ids.get((county_id, row["subcounty"].lower()))
+                if subcounty_id is None:
+                    raise ValueError(f"subcounty: unknown sub-county '{row['subcounty']}' in this county")
+            officer["subcounty_id"] = subcounty_id
+
+        return {
+            "email": self.required_email(row),
+            "password": row.get("password", ""),
+            "user": self.parse_columns(CustomUser, USER_COLUMNS, row),
+            "profile": self.parse_columns(Profile, PROFILE_COLUMNS, row),
+            "officer": officer,
+        }
+
+    def create_users(self, path, rows, users):
+        """
+        Create accounts and profiles for ``rows`` and add them to ``users`` by email.
+        """
+        if not rows:
+            return
+        start = time.perf_counter()
+        passwords = self.hasher.hash([values["password"] for values in rows])
+        self._record("Password hashing", sum(1 for values in rows if values["password"]), start)
+
+        start = time.perf_counter()
+        self.insert(CustomUser, [
+            CustomUser(
+                email=values["email"],
+                password=password,
+                role=CustomUser.UserRole.COUNTY_OFFICIAL,
+                is_active=bool(values["password"]),
+                **values["user"],
+            )
+            for values, password in zip(rows, passwords)
+        ])
+        created = CustomUser.objects.in_bulk([values["email"] for values in rows], field_name="email")
+        users.update(created)
+        self._record("Users", len(created), start)
+
+        start = time.perf_counter()
+        self.insert(Profile, [Profile(user_id=created[values["email"]].pk, **values["profile"]) for values in rows])
+        self._record("Profiles", len(rows), start)
+
+    def resolve_units(self, rows):
+        """
+        Replace unit names with ids, creating the units not seen before.
+        """
+        start = time.perf_counter()
+        missing = {
+            (values["officer"]["department_id"], values["officer"]["unit_id"])
+            for values in rows
+            if values["officer"].get("unit_id")
+        } - self.unit_ids.keys()
+        if missing:
+            DepartmentUnit.objects.bulk_create(
+                [DepartmentUnit(department_id=department_id, name=name) for department_id, name in missing],
+                batch_size=self.batch_size,
+            )
+            created = self.read_back(DepartmentUnit, "department_id", "name", missing)
+            self.unit_ids.update(((unit.department_id, unit.name), unit.pk) for unit in created)
+            bulk_saved.send(sender=DepartmentUnit, instances=created, created=True)
+        for values in rows:
+            officer = values["officer"]
+            if officer.get("unit_id"):
+                officer["unit_id"] = self.unit_ids[(officer["department_id"], officer["unit_id"])]
+        self._record("Units", len(missing), start)
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from departments.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the department budget and staffing rollups from the departments table"
+
+    def handle(self, *args, **options):
+        cells = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {cells} department rollup cells."))
@@ -0,0 +1,22 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from departments.search import INDEXED_FIELDS, get_backend, reindex
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search documents for departments, units and officers"
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if backend is None:
+            raise CommandError("The database has no full-text search backend; search uses LIKE scans.")
+
+        for label in INDEXED_FIELDS:
+            model = apps.get_model(label)
+            with transaction.atomic():
+                backend.clear(model)
+                reindex(model)
+            self.stdout.write(self.style.SUCCESS(
+                f"Indexed {model._default_manager.count()} {model._meta.verbose_name_plural}."
+            ))
@@ -0,0 +1,59 @@
+from django.db import migrations
+
+# Mirrors departments.search.INDEXED_FIELDS at the time of this migration.
+INDEXED_FIELDS = {
+    "Department": ("name", "description"),
+    "DepartmentUnit": ("name", "department__name"),
+    "DepartmentOfficer": ("user__username", "position", "department__name"),
+}
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in ("postgresql", "sqlite"):
+        return
+    qn = schema_editor.quote_name
+    for name, fields in INDEXED_FIELDS.items():
+        model = apps.get_model("departments", name)
+        table = model._meta.db_table
+        rows = [
+            (pk, " ".join(str(value) for value in values if value))
+            for pk, *values in model.objects.order_by().values_list("pk", *fields).iterator()
+        ]
+        if vendor == "postgresql":
+            schema_editor.execute(f"ALTER TABLE {qn(table)} ADD COLUMN search_vector tsvector")
+            schema_editor.execute(
+                f"CREATE INDEX {qn(table + '_search_gin')} ON {qn(table)} USING GIN (search_vector)"
+            )
+            sql = f"UPDATE {qn(table)} SET search_vector = to_tsvector('simple', %s) WHERE id = %s"
+            params = [(document, pk) for pk, document in rows]
+        else:
+            schema_editor.execute(f"CREATE VIRTUAL TABLE {qn(table + '_fts')} USING fts5(document)")
+            sql = f"INSERT INTO {qn(table + '_fts')}(rowid, document) VALUES (%s, %s)"
+            params = rows
+        if params:
+            with schema_editor.connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    qn = schema_editor.quote_name
+    for name in INDEXED_FIELDS:
+        table = apps.get_model("departments", name)._meta.db_table
+        if vendor == "postgresql":
+            schema_editor.execute(f"DROP INDEX IF EXISTS {qn(table + '_search_gin')}")
+            schema_editor.execute(f"ALTER TABLE {qn(table)} DROP COLUMN IF EXISTS search_vector")
+        elif vendor == "sqlite":
+            schema_editor.execute(f"DROP TABLE IF EXISTS {qn(table + '_fts')}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('departments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:34
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_rollups(apps, schema_editor):
+    Department = apps.get_model("departments", "Department")
+    DepartmentRollup = apps.get_model("departments", "DepartmentRollup")
+    rows = (
+        Department.objects.order_by()
+        .values("county_id", "category_id")
+        .annotate(
+            department_count=Count("id"),
+            active_count=Count("id", filter=Q(active=True)),
+            budget_total=Coalesce(Sum("budget_allocated"), Decimal("0.00")),
+            staff_total=Coalesce(Sum("staff_count"), 0),
+        )
+    )
+    DepartmentRollup.objects.bulk_create(DepartmentRollup(**row) for row in rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('departments', '0002_full_text_search'),
+        ('locations', '0011_keyset_name_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartmentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department_count', models.IntegerField(default=0)),
+                ('active_count', models.IntegerField(default=0)),
+                ('budget_total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('staff_total', models.BigIntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='departments.departmentcategory')),
+                ('county', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='department_rollups', to='locations.county')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('county', 'category'), name='unique_department_rollup_cell'), models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('county',), name='unique_department_rollup_uncategorised')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
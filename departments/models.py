@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from locations.models import County, SubCounty
@@ -66,6 +66,12 @@ class Department(models.Model):
     def __str__(self):
         return f"{self.name} ({self.county.name})"
 
+    def save(self, *args, **kwargs):
+        # The rollup signals lock the old row in pre_save and apply the delta
+        # in post_save; both must share the write's transaction.
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
 
 class DepartmentUnit(models.Model):
     """
@@ -157,3 +163,35 @@ class DepartmentContact(models.Model):
 
     def __str__(self):
         return f"{self.contact_type}: {self.value}"
+
+
+class DepartmentRollup(models.Model):
+    """
+    Running budget and staffing totals for one (county, category) cell,
+    maintained incrementally from department writes (see departments.rollups).
+    County and category dashboards sum at most counties x categories rows.
+    """
+    county = models.ForeignKey(County, on_delete=models.CASCADE, related_name="department_rollups")
+    category = models.ForeignKey(
+        DepartmentCategory,
+        on_delete=models.CASCADE,
+        related_name="rollups",
+        blank=True,
+        null=True
+    )
+    department_count = models.IntegerField(default=0)
+    active_count = models.IntegerField(default=0)
+    budget_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    staff_total = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["county", "category"], name="unique_department_rollup_cell"),
+            models.UniqueConstraint(
+                fields=["county"], condition=models.Q(category__isnull=True),
+                name="unique_department_rollup_uncategorised",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.county} / {self.category or 'Uncategorised'}"
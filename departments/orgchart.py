@@ -0,0 +1,74 @@
+"""
+Department org charts.
+
+A chart is assembled in memory from one query for the units (with their
+head users) and one for the active officers (with their users and
+sub-counties), however many units and officers the department has.
+DepartmentViewSet caches the result under the department's cache version,
+which unit, officer and user writes bump.
+"""
+from .models import DepartmentOfficer, DepartmentUnit
+
+USER_FIELDS = ("id", "username", "first_name", "last_name", "email")
+
+
+def person(user):
+    if user is None:
+        return None
+    return {"id": user.pk, "username": user.username, "display_name": user.get_display_name()}
+
+
+def officer_node(officer):
+    subcounty = officer.subcounty
+    return {
+        "id": officer.pk,
+        "user": person(officer.user),
+        "position": officer.position,
+        "is_head": officer.is_head,
+        "subcounty": {"id": subcounty.pk, "name": subcounty.name} if subcounty else None,
+    }
+
+
+def build(department):
+    """
+    The department's tree: department-level heads and officers, then each
+    unit with its head and officers. Heads are listed first.
+    """
+    units = (
+        DepartmentUnit.objects.filter(department=department)
+        .select_related("head")
+        .only("id", "name", "head", *[f"head__{field}" for field in USER_FIELDS])
+        .order_by("name", "pk")
+    )
+    officers = (
+        DepartmentOfficer.objects.filter(department=department, active=True)
+        .select_related("user", "subcounty")
+        .only(
+            "id", "unit", "position", "is_head", "user", "subcounty", "subcounty__name",
+            *[f"user__{field}" for field in USER_FIELDS],
+        )
+        .order_by("-is_head", "user__username", "pk")
+    )
+
+    unit_nodes = {
+        unit.pk: {"id": unit.pk, "name": unit.name, "head": person(unit.head), "officers": []}
+        for unit in units
+    }
+    heads, unassigned = [], []
+    for officer in officers:
+        node = officer_node(officer)
+        if officer.unit_id in unit_nodes:
+            unit_nodes[officer.unit_id]["officers"].append(node)
+        elif officer.is_head:
+            heads.append(node)
+        else:
+            unassigned.append(node)
+
+    return {
+        "id": department.pk,
+        "name": department.name,
+        "county": department.county_id,
+        "heads": heads,
+        "units": list(unit_nodes.values()),
+        "officers": unassigned,
+    }
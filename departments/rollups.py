@@ -0,0 +1,112 @@
+"""
+Incremental budget and staffing rollups.
+
+Every department write is turned into a delta on one or two
+DepartmentRollup cells (county x category) inside the same transaction, so
+dashboards read a table whose size depends on the number of counties and
+categories, not departments. ``manage.py rebuild_department_rollups``
+recomputes the cells from scratch.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Department, DepartmentRollup
+
+STATE_FIELDS = ("county_id", "category_id", "active", "budget_allocated", "staff_count")
+ZERO = Decimal("0.00")
+
+
+def state_of(values):
+    """
+    The (cell, contribution) a department row makes, from a dict of STATE_FIELDS.
+    Values may be as assigned to an unsaved instance, e.g. a budget string.
+    """
+    cell = (values["county_id"], values["category_id"])
+    budget = Department._meta.get_field("budget_allocated").to_python(values["budget_allocated"])
+    return cell, (1, int(bool(values["active"])), budget or ZERO, int(values["staff_count"] or 0))
+
+
+def add_delta(deltas, cell, contribution, sign):
+    current = deltas.setdefault(cell, [0, 0, ZERO, 0])
+    for n, value in enumerate(contribution):
+        current[n] += sign * value
+
+
+def apply_deltas(deltas):
+    for (county_id, category_id), (count, active, budget, staff) in deltas.items():
+        if not (count or active or budget or staff):
+            continue
+        cell = DepartmentRollup.objects.filter(county_id=county_id, category_id=category_id)
+        changes = {
+            "department_count": F("department_count") + count,
+            "active_count": F("active_count") + active,
+            "budget_total": F("budget_total") + budget,
+            "staff_total": F("staff_total") + staff,
+        }
+        if cell.update(**changes) or count <= 0:
+            # A missing cell with nothing added is a cascade in progress.
+            continue
+        try:
+            with transaction.atomic():
+                DepartmentRollup.objects.create(
+                    county_id=county_id, category_id=category_id, department_count=count,
+                    active_count=active, budget_total=budget, staff_total=staff,
+                )
+        except IntegrityError:
+            cell.update(**changes)  # created concurrently
+
+
+def merge_category_into_uncategorised(category):
+    """
+    Departments of a deleted category fall back to no category (SET_NULL,
+    which sends no signals), so their totals move to the uncategorised cells.
+    """
+    deltas = {}
+    for row in DepartmentRollup.objects.filter(category=category):
+        contribution = (row.department_count, row.active_count, row.budget_total, row.staff_total)
+        add_delta(deltas, (row.county_id, None), contribution, 1)
+    apply_deltas(deltas)
+
+
+@transaction.atomic
+def rebuild():
+    DepartmentRollup.objects.all().delete()
+    rows = (
+        Department.objects.order_by()
+        .values("county_id", "category_id")
+        .annotate(
+            department_count=Count("id"),
+            active_count=Count("id", filter=Q(active=True)),
+            budget_total=Coalesce(Sum("budget_allocated"), ZERO),
+            staff_total=Coalesce(Sum("staff_count"), 0),
+        )
+    )
+    DepartmentRollup.objects.bulk_create(DepartmentRollup(**row) for row in rows)
+    return DepartmentRollup.objects.count()
+
+
+def summary(county=None):
+    """
+    Totals overall, by county and by category, read from the rollup cells.
+    """
+    cells = DepartmentRollup.objects.order_by()
+    if county is not None:
+        cells = cells.filter(county_id=county)
+    totals = {
+        "department_count": Coalesce(Sum("department_count"), 0),
+        "active_count": Coalesce(Sum("active_count"), 0),
+        "budget_total": Coalesce(Sum("budget_total"), ZERO),
+        "staff_total": Coalesce(Sum("staff_total"), 0),
+    }
+    return {
+        "totals": cells.aggregate(**totals),
+        "by_county": list(
+            cells.values("county_id", county_name=F("county__name")).annotate(**totals).order_by("county_name")
+        ),
+        "by_category": list(
+            cells.values("category_id", category_name=F("category__name")).annotate(**totals).order_by("category_name")
+        ),
+    }
@@ -0,0 +1,161 @@
+"""
+Full-text search for departments, units and officers.
+
+Every indexed model has a search document built from its search fields,
+related names included. PostgreSQL keeps it in a ``search_vector`` tsvector
+column with a GIN index; SQLite keeps it in an FTS5 shadow table whose rowid
+is the object's primary key. Documents are refreshed by the signals in
+``departments.signals`` and can be rebuilt with ``manage.py rebuild_search_index``.
+
+Other databases, and views whose search_fields are not indexed, fall back
+to SearchFilter's LIKE scans.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+# Keep in step with the viewsets' search_fields and migration 0002.
+INDEXED_FIELDS = {
+    "departments.department": ("name", "description"),
+    "departments.departmentunit": ("name", "department__name"),
+    "departments.departmentofficer": ("user__username", "position", "department__name"),
+}
+TS_CONFIG = "simple"
+BATCH_SIZE = 500
+
+_word = re.compile(r"\w+")
+
+
+def indexed_fields(model):
+    return INDEXED_FIELDS.get(model._meta.label_lower)
+
+
+def build_documents(model, pks=None):
+    """
+    Yield (pk, document) for ``pks`` (or every row), one query per batch.
+    """
+    fields = indexed_fields(model)
+    queryset = model._default_manager.order_by("pk")
+    if pks is None:
+        pks = list(queryset.values_list("pk", flat=True))
+    pks = list(pks)
+    for start in range(0, len(pks), BATCH_SIZE):
+        rows = queryset.filter(pk__in=pks[start:start + BATCH_SIZE]).values_list("pk", *fields)
+        for pk, *values in rows:
+            yield pk, " ".join(str(value) for value in values if value)
+
+
+class PostgresSearchBackend:
+    vendor = "postgresql"
+
+    def write(self, model, rows):
+        table, pk = connection.ops.quote_name(model._meta.db_table), model._meta.pk.column
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"UPDATE {table} SET search_vector = to_tsvector(%s, %s) WHERE {pk} = %s",
+                [(TS_CONFIG, document, obj_pk) for obj_pk, document in rows],
+            )
+
+    def delete(self, model, pks):
+        pass  # the column goes with the row
+
+    def clear(self, model):
+        with connection.cursor() as cursor:
+            cursor.execute(f"UPDATE {connection.ops.quote_name(model._meta.db_table)} SET search_vector = NULL")
+
+    def search(self, queryset, words):
+        table = connection.ops.quote_name(queryset.model._meta.db_table)
+        query = " & ".join(f"{word}:*" for word in words)
+        return (
+            queryset
+            .filter(RawSQL(
+                f"{table}.search_vector @@ to_tsquery(%s, %s)", (TS_CONFIG, query), output_field=BooleanField()
+            ))
+            .annotate(search_rank=RawSQL(
+                f"ts_rank({table}.search_vector, to_tsquery(%s, %s))", (TS_CONFIG, query), output_field=FloatField()
+            ))
+            .order_by("-search_rank")
+        )
+
+
+class SQLiteSearchBackend:
+    vendor = "sqlite"
+
+    @staticmethod
+    def table(model):
+        return connection.ops.quote_name(f"{model._meta.db_table}_fts")
+
+    def write(self, model, rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT OR REPLACE INTO {self.table(model)}(rowid, document) VALUES (%s, %s)", list(rows)
+            )
+
+    def delete(self, model, pks):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table(model)} WHERE rowid = %s", [(pk,) for pk in pks])
+
+    def clear(self, model):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table(model)}")
+
+    def search(self, queryset, words):
+        model = queryset.model
+        fts = self.table(model)
+        base = f"{connection.ops.quote_name(model._meta.db_table)}.{connection.ops.quote_name(model._meta.pk.column)}"
+        match = " AND ".join(f'"{word}"*' for word in words)
+        return (
+            queryset
+            .filter(pk__in=RawSQL(f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s", (match,)))
+            # bm25 is lower-is-better; negate it so ranks sort like ts_rank.
+            .annotate(search_rank=RawSQL(
+                f"SELECT -rank FROM {fts} WHERE {fts} MATCH %s AND rowid = {base}", (match,),
+                output_field=FloatField(),
+            ))
+            .order_by("-search_rank")
+        )
+
+
+BACKENDS = {backend.vendor: backend for backend in (PostgresSearchBackend(), SQLiteSearchBackend())}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor)
+
+
+def reindex(model, pks=None):
+    """
+    Refresh the search documents of ``pks`` (or every row) of an indexed model.
+    """
+    backend = get_backend()
+    if backend is None or indexed_fields(model) is None:
+        return
+    rows = list(build_documents(model, pks))
+    backend.write(model, rows)
+    if pks is not None:
+        gone = set(pks) - {pk for pk, _ in rows}
+        if gone:
+            backend.delete(model, gone)
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter that answers ?search= from the database's full-text index
+    and orders results by relevance.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        terms = self.get_search_terms(request)
+        if not search_fields or not terms:
+            return queryset
+
+        backend = get_backend()
+        indexed = indexed_fields(queryset.model)
+        words = [word for term in terms for word in _word.findall(term.lower())]
+        if backend is None or indexed is None or not set(search_fields) <= set(indexed) or not words:
+            return super().filter_queryset(request, queryset, view)
+        return backend.search(queryset, words)
@@ -1,38 +1,317 @@
 # departments/serializers.py
-from rest_framework import serializers
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework import permissions, serializers
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueTogetherValidator, UniqueValidator
+from .signals import bulk_saved
 from .models import DepartmentCategory, Department, DepartmentUnit, DepartmentOfficer, DepartmentContact
 
-class DepartmentCategorySerializer(serializers.ModelSerializer):
-    class Meta:
-        model = DepartmentCategory
-        fields = '__all__'
 
-class DepartmentSerializer(serializers.ModelSerializer):
-    county_name = serializers.CharField(source="county.name", read_only=True)
-    category_name = serializers.CharField(source="category.name", read_only=True)
+def _key(value):
+    return value.pk if hasattr(value, "_meta") else value
+
+
+# ============================================================
+#   BULK WRITE SUPPORT
+# ============================================================
+class BatchPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary-key relation that reads from the batch cache filled by
+    BulkListSerializer, falling back to a query for single objects.
+    """
+
+    def to_internal_value(self, data):
+        cache = getattr(self.parent, "related_cache", {}).get(self.field_name)
+        if cache is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = self.get_queryset().model._meta.pk.to_python(data)
+        except (DjangoValidationError, TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if pk not in cache:
+            self.fail("does_not_exist", pk_value=data)
+        return cache[pk]
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    List serializer for bulk writes.
+    - Related objects for the whole batch are fetched with one query per foreign key.
+    - Unique constraints are checked with one query per constraint.
+    - Rows are written with bulk_create / bulk_update in batches.
+
+    For updates ``instance`` is a list aligned with the input; a ``None``
+    entry creates a new row, which is how upserts are saved.
+    """
+
+    @property
+    def batch_size(self):
+        return self.context.get("batch_size") or settings.DEPARTMENTS_BULK_BATCH_SIZE
+
+    def load_related(self, data):
+        cache = {}
+        for name, field in self.child.fields.items():
+            if field.read_only or not isinstance(field, BatchPrimaryKeyRelatedField):
+                continue
+            pk_field = field.get_queryset().model._meta.pk
+            keys = set()
+            for item in data:
+                value = item.get(name) if isinstance(item, dict) else None
+                if value is None or isinstance(value, bool):
+                    continue
+                try:
+                    keys.add(pk_field.to_python(value))
+                except (DjangoValidationError, TypeError, ValueError):
+                    continue
+            cache[name] = field.get_queryset().in_bulk(keys) if keys else {}
+        return cache
+
+    def detach_unique_validators(self):
+        """
+        Remove the per-row unique validators, returning the constraints
+        they enforced and a callable that puts them back.
+        """
+        child, constraints, restore = self.child, [], []
+
+        validators = child.validators
+        restore.append((child, validators))
+        child.validators = [v for v in validators if not isinstance(v, UniqueTogetherValidator)]
+        constraints += [tuple(v.fields) for v in validators if isinstance(v, UniqueTogetherValidator)]
+
+        for field in child.fields.values():
+            if field.read_only or not any(isinstance(v, UniqueValidator) for v in field.validators):
+                continue
+            restore.append((field, field.validators))
+            field.validators = [v for v in field.validators if not isinstance(v, UniqueValidator)]
+            constraints.append((field.source,))
+
+        def reattach():
+            for owner, original in restore:
+                owner.validators = original
+        return constraints, reattach
+
+    def check_unique(self, validated, constraints):
+        model = self.child.Meta.model
+        instances = self.instance if isinstance(self.instance, list) else [None] * len(validated)
+        errors = [{} for _ in validated]
+
+        for fields in constraints:
+            attnames = [model._meta.get_field(f).attname for f in fields]
+            keys = []
+            for attrs, instance in zip(validated, instances):
+                key = tuple(
+                    _key(attrs[f]) if f in attrs else getattr(instance, attname, None)
+                    for f, attname in zip(fields, attnames)
+                )
+                keys.append(None if None in key else key)
+
+            wanted = [key for key in keys if key]
+            taken = {}
+            if wanted:
+                lookups = {f"{attname}__in": {key[n] for key in wanted} for n, attname in enumerate(attnames)}
+                for pk, *values in model._default_manager.filter(**lookups).values_list("pk", *attnames):
+                    taken[tuple(values)] = pk
+
+            seen = set()
+            for i, key in enumerate(keys):
+                if key is None:
+                    continue
+                own = instances[i].pk if instances[i] is not None else None
+                if key in seen or taken.get(key, own) != own:
+                    if len(fields) == 1:
+                        errors[i].setdefault(fields[0], []).append("This field must be unique.")
+                    else:
+                        errors[i].setdefault(api_settings.NON_FIELD_ERRORS_KEY, []).append(
+                            f"The fields {', '.join(fields)} must make a unique set."
+                        )
+                seen.add(key)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            return super().to_internal_value(data)
+
+        self.child.related_cache = self.load_related(data)
+        constraints, reattach = self.detach_unique_validators()
+        try:
+            validated = super().to_internal_value(data)
+        finally:
+            self.child.related_cache = {}
+            reattach()
+        self.check_unique(validated, constraints)
+        return validated
+
+    @transaction.atomic
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        objs = [model(**attrs) for attrs in validated_data]
+        model._default_manager.bulk_create(objs, batch_size=self.batch_size)
+        bulk_saved.send(sender=model, instances=objs, created=True)
+        self.created = objs
+        return objs
+
+    @transaction.atomic
+    def update(self, instances, validated_data):
+        model = self.child.Meta.model
+        objs, new, changed, fields = [], [], [], set()
+        for instance, attrs in zip(instances, validated_data):
+            if instance is None:
+                instance = model(**attrs)
+                new.append(instance)
+            else:
+                for attr, value in attrs.items():
+                    setattr(instance, attr, value)
+                changed.append(instance)
+                fields.update(attrs)
+            objs.append(instance)
+
+        if new:
+            model._default_manager.bulk_create(new, batch_size=self.batch_size)
+        if changed and fields:
+            model._default_manager.bulk_update(changed, sorted(fields), batch_size=self.batch_size)
+        if new:
+            bulk_saved.send(sender=model, instances=new, created=True)
+        if changed:
+            bulk_saved.send(sender=model, instances=changed, created=False)
+        self.created = new
+        return objs
+
+
+# ============================================================
+#   SPARSE FIELDSETS AND EXPANSION
+# ============================================================
+def _split(value):
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+class DynamicFieldsMixin:
+    """
+    Shapes read responses from the query string.
+    - ?fields=name,email keeps only the listed fields.
+    - ?expand=units adds a nested field from ``expandable_fields``.
+    - Dotted names reach into expansions: ?expand=units&fields=name,units.name
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None and expand is None:
+            request = self.context.get("request")
+            if request is None or request.method not in permissions.SAFE_METHODS:
+                return
+            fields = _split(request.query_params.get("fields")) or None
+            expand = _split(request.query_params.get("expand"))
+
+        keep, nested_fields, expanded = set(), {}, {}
+        for name in fields or ():
+            head, _, rest = name.partition(".")
+            keep.add(head)
+            if rest:
+                nested_fields.setdefault(head, []).append(rest)
+        for name in expand or ():
+            head, _, rest = name.partition(".")
+            if head in self.expandable_fields:
+                expanded.setdefault(head, []).extend([rest] if rest else [])
+
+        for name, nested_expand in expanded.items():
+            self.fields[name] = self.expandable_fields[name](
+                many=True, read_only=True, fields=nested_fields.get(name), expand=nested_expand,
+            )
+        keep |= expanded.keys()
+        if fields:
+            for name in set(self.fields) - keep:
+                self.fields.pop(name)
+
+
+def shape_queryset(queryset, serializer, extra=()):
+    """
+    Restrict ``queryset`` to what ``serializer`` will output: only() the
+    columns it reads, select_related() the forward relations it follows and
+    prefetch_related() its expanded reverse relations, shaped the same way.
+    """
+    model = queryset.model
+    only, select, prefetch = {model._meta.pk.name, *extra}, set(), []
+
+    for field in serializer.fields.values():
+        if isinstance(field, serializers.ListSerializer):
+            related = model._meta.get_field(field.source)
+            child_qs = shape_queryset(
+                related.related_model._default_manager.all(), field.child, extra=[related.field.name]
+            )
+            prefetch.append(Prefetch(field.source, queryset=child_qs))
+        elif field.source != "*":
+            parts = field.source.split(".")
+            try:
+                model_field = model._meta.get_field(parts[0])
+            except FieldDoesNotExist:
+                continue  # a property or method, nothing to load
+            if not model_field.concrete:
+                continue
+            only.add(parts[0])
+            if len(parts) > 1 and model_field.is_relation:
+                select.add(parts[0])
+                only.add("__".join(parts))
+
+    queryset = queryset.select_related(None).prefetch_related(None).prefetch_related(*prefetch)
+    if select:  # select_related() with no arguments would follow every relation
+        queryset = queryset.select_related(*select)
+    return queryset.only(*only)
+
+
+class BulkModelSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    serializer_related_field = BatchPrimaryKeyRelatedField
 
     class Meta:
-        model = Department
+        list_serializer_class = BulkListSerializer
+
+
+# ============================================================
+#   DEPARTMENT SERIALIZERS
+# ============================================================
+class DepartmentCategorySerializer(BulkModelSerializer):
+    class Meta(BulkModelSerializer.Meta):
+        model = DepartmentCategory
         fields = '__all__'
 
-class DepartmentUnitSerializer(serializers.ModelSerializer):
+class DepartmentUnitSerializer(BulkModelSerializer):
     department_name = serializers.CharField(source="department.name", read_only=True)
 
-    class Meta:
+    class Meta(BulkModelSerializer.Meta):
         model = DepartmentUnit
         fields = '__all__'
 
-class DepartmentOfficerSerializer(serializers.ModelSerializer):
+class DepartmentOfficerSerializer(BulkModelSerializer):
     department_name = serializers.CharField(source="department.name", read_only=True)
     user_name = serializers.CharField(source="user.username", read_only=True)
 
-    class Meta:
+    class Meta(BulkModelSerializer.Meta):
         model = DepartmentOfficer
         fields = '__all__'
 
-class DepartmentContactSerializer(serializers.ModelSerializer):
+class DepartmentContactSerializer(BulkModelSerializer):
     department_name = serializers.CharField(source="department.name", read_only=True)
 
-    class Meta:
+    class Meta(BulkModelSerializer.Meta):
         model = DepartmentContact
         fields = '__all__'
+
+class DepartmentSerializer(BulkModelSerializer):
+    county_name = serializers.CharField(source="county.name", read_only=True)
+    category_name = serializers.CharField(source="category.name", read_only=True)
+
+    expandable_fields = {
+        "units": DepartmentUnitSerializer,
+        "officers": DepartmentOfficerSerializer,
+        "contacts": DepartmentContactSerializer,
+    }
+
+    class Meta(BulkModelSerializer.Meta):
+        model = Department
+        fields = '__all__'
@@ -0,0 +1,207 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete
+from django.dispatch import Signal, receiver
+
+from locations.models import County, SubCounty
+from . import cache as response_cache, rollups
+from .models import Department, DepartmentCategory, DepartmentUnit, DepartmentOfficer, DepartmentContact
+from .search import get_backend, reindex
+
+# Sent by BulkListSerializer after bulk_create / bulk_update, which skip post_save.
+bulk_saved = Signal()  # sender=model, instances=[...], created=bool
+
+
+def _pks(instance=None, instances=(), **kwargs):
+    return [instance.pk] if instance is not None else [obj.pk for obj in instances]
+
+
+@receiver([post_save, bulk_saved], sender=Department)
+@receiver([post_save, bulk_saved], sender=DepartmentUnit)
+@receiver([post_save, bulk_saved], sender=DepartmentOfficer)
+def refresh_search_document(sender, **kwargs):
+    """
+    Re-index saved rows once the write is committed.
+    """
+    transaction.on_commit(partial(reindex, sender, _pks(**kwargs)))
+
+
+@receiver([post_save, bulk_saved], sender=Department)
+def refresh_department_children(sender, **kwargs):
+    """
+    Unit and officer documents include the department name.
+    """
+    def refresh(pks):
+        for model in (DepartmentUnit, DepartmentOfficer):
+            reindex(model, model.objects.filter(department__in=pks).values_list("pk", flat=True))
+    transaction.on_commit(partial(refresh, _pks(**kwargs)))
+
+
+# User fields shown in officer search documents, officer rows and org charts.
+USER_DISPLAY_FIELDS = {"username", "first_name", "last_name", "email"}
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def refresh_officer_username(sender, instance, update_fields=None, **kwargs):
+    """
+    Officer documents, cached officer rows and org charts include the user's names.
+    """
+    if update_fields is not None and not USER_DISPLAY_FIELDS & set(update_fields):
+        return
+    officers = list(DepartmentOfficer.objects.filter(user_id=instance.pk))
+    units = list(DepartmentUnit.objects.filter(head_id=instance.pk))
+    if officers:
+        transaction.on_commit(partial(reindex, DepartmentOfficer, [officer.pk for officer in officers]))
+    if officers or units:
+        scopes = affected_scopes(DepartmentOfficer, officers) | affected_scopes(DepartmentUnit, units)
+        transaction.on_commit(partial(response_cache.bump, scopes))
+
+
+@receiver(post_delete, sender=Department)
+@receiver(post_delete, sender=DepartmentUnit)
+@receiver(post_delete, sender=DepartmentOfficer)
+def drop_search_document(sender, instance, **kwargs):
+    backend = get_backend()
+    if backend is not None:
+        transaction.on_commit(partial(backend.delete, sender, [instance.pk]))
+
+
+# ============================================================
+#   RESPONSE CACHE INVALIDATION
+# ============================================================
+# The foreign key that decides which cache scope a row belongs to.
+SCOPE_FIELDS = {
+    Department: "county_id",
+    DepartmentUnit: "department_id",
+    DepartmentOfficer: "department_id",
+    DepartmentContact: "department_id",
+}
+
+
+@receiver(post_init, sender=Department)
+@receiver(post_init, sender=DepartmentUnit)
+@receiver(post_init, sender=DepartmentOfficer)
+@receiver(post_init, sender=DepartmentContact)
+def remember_scope(sender, instance, **kwargs):
+    # Read from __dict__ so deferred fields are not loaded.
+    instance._loaded_scope_id = instance.__dict__.get(SCOPE_FIELDS[sender])
+
+
+def affected_scopes(sender, instances):
+    """
+    Cache scopes touched by writing ``instances``, before and after the write.
+    """
+    if sender is DepartmentCategory:
+        return {"global"}
+
+    field, scopes = SCOPE_FIELDS[sender], {"all"}
+    ids = set()
+    for obj in instances:
+        ids.update({obj.__dict__.get(field), getattr(obj, "_loaded_scope_id", None)})
+        obj._loaded_scope_id = obj.__dict__.get(field)
+    ids.discard(None)
+
+    if sender is Department:
+        scopes.update(f"county:{pk}" for pk in ids)
+        scopes.update(f"department:{obj.pk}" for obj in instances)
+    else:
+        scopes.update(f"department:{pk}" for pk in ids)
+        counties = Department.objects.filter(pk__in=ids).values_list("county_id", flat=True)
+        scopes.update(f"county:{pk}" for pk in counties)
+    return scopes
+
+
+@receiver([post_save, post_delete, bulk_saved], sender=Department)
+@receiver([post_save, post_delete, bulk_saved], sender=DepartmentCategory)
+@receiver([post_save, post_delete, bulk_saved], sender=DepartmentUnit)
+@receiver([post_save, post_delete, bulk_saved], sender=DepartmentOfficer)
+@receiver([post_save, post_delete, bulk_saved], sender=DepartmentContact)
+def evict_cached_responses(sender, instance=None, instances=(), **kwargs):
+    """
+    Bump the affected cache versions once the write is committed, so a
+    reader cannot re-cache the old rows under the new version.
+    """
+    scopes = affected_scopes(sender, [instance] if instance is not None else instances)
+    transaction.on_commit(partial(response_cache.bump, scopes))
+
+
+@receiver([post_save, post_delete], sender=County)
+def evict_county_responses(sender, instance, **kwargs):
+    """
+    Department rows carry the county name.
+    """
+    transaction.on_commit(partial(response_cache.bump, {"all", f"county:{instance.pk}"}))
+
+
+
+@receiver([post_save, pre_delete], sender=SubCounty)
+def evict_subcounty_org_charts(sender, instance, created=False, **kwargs):
+    """
+    Org charts carry officers' sub-county names; deleting one nulls the officers' link.
+    """
+    if created:
+        return
+    departments = DepartmentOfficer.objects.filter(subcounty=instance).values_list("department_id", flat=True)
+    scopes = {f"department:{pk}" for pk in departments.distinct()}
+    if scopes:
+        transaction.on_commit(partial(response_cache.bump, scopes))
+
+
+# ============================================================
+#   BUDGET / STAFFING ROLLUPS
+# ============================================================
+@receiver(post_init, sender=Department)
+def remember_rollup_state(sender, instance, **kwargs):
+    values = instance.__dict__
+    has_state = all(field in values for field in rollups.STATE_FIELDS)
+    instance._rollup_state = rollups.state_of(values) if has_state else None
+
+
+def _locked_rollup_state(instance, using):
+    """
+    State of the stored row, locked until the write commits. A stale or
+    deferred instance does not know what it is replacing.
+    """
+    old = (
+        Department.objects.using(using).select_for_update()
+        .filter(pk=instance.pk).values(*rollups.STATE_FIELDS).first()
+    )
+    return rollups.state_of(old) if old else None
+
+
+@receiver(pre_save, sender=Department)
+def load_rollup_state(sender, instance, using, **kwargs):
+    if not instance._state.adding:
+        instance._rollup_state = _locked_rollup_state(instance, using)
+
+
+@receiver(pre_delete, sender=Department)
+def load_deleted_rollup_state(sender, instance, using, **kwargs):
+    instance._rollup_state = _locked_rollup_state(instance, using)
+
+
+@receiver([post_save, bulk_saved], sender=Department)
+def update_rollups(sender, instance=None, instances=(), created=False, **kwargs):
+    deltas = {}
+    for obj in [instance] if instance is not None else instances:
+        if not created and obj._rollup_state is not None:
+            rollups.add_delta(deltas, *obj._rollup_state, -1)
+        obj._rollup_state = rollups.state_of({field: getattr(obj, field) for field in rollups.STATE_FIELDS})
+        rollups.add_delta(deltas, *obj._rollup_state, 1)
+    rollups.apply_deltas(deltas)
+
+
+@receiver(post_delete, sender=Department)
+def remove_from_rollups(sender, instance, **kwargs):
+    if instance._rollup_state is None:
+        return  # already deleted by someone else
+    deltas = {}
+    rollups.add_delta(deltas, *instance._rollup_state, -1)
+    rollups.apply_deltas(deltas)
+
+
+@receiver(pre_delete, sender=DepartmentCategory)
+def uncategorise_rollups(sender, instance, **kwargs):
+    rollups.merge_category_into_uncategorised(instance)
@@ -1,3 +1,756 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, Profile
+from locations.models import County, SubCounty
+from . import cache as response_cache, rollups
+from .models import (
+    Department, DepartmentCategory, DepartmentContact, DepartmentOfficer, DepartmentRollup, DepartmentUnit,
+)
+from .search import get_backend
+
+
+class DepartmentAPITestCase(TestCase):
+    """
+    Two counties, one category and a client signed in as an admin.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.mombasa = County.objects.create(name="Mombasa", code=1)
+        cls.kisumu = County.objects.create(name="Kisumu", code=42)
+        cls.health = DepartmentCategory.objects.create(name="Health")
+
+    def setUp(self):
+        cache.clear()  # the response cache outlives each test's rolled back rows
+        self.client = APIClient()
+        self.user = CustomUser(email="admin@example.com", role=CustomUser.UserRole.ADMIN, is_active=True)
+        self.client.force_authenticate(self.user)
+
+    def department(self, name, county=None, **fields):
+        fields.setdefault("email", f"{name.lower().replace(' ', '')}@example.com")
+        return Department.objects.create(name=name, county=county or self.mombasa, category=self.health, **fields)
+
+    def payload(self, name, county=None, **fields):
+        return {
+            "name": name,
+            "county": (county or self.mombasa).pk,
+            "category": self.health.pk,
+            "email": f"{name.lower().replace(' ', '')}@example.com",
+            **fields,
+        }
+
+
+# ============================================================
+#   BULK CREATE / UPDATE / UPSERT
+# ============================================================
+class BulkWriteTests(DepartmentAPITestCase):
+
+    def bulk_create_queries(self, count, prefix):
+        rows = [self.payload(f"{prefix} {i}") for i in range(count)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/api/departments/departments/", rows, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data), count)
+        return len(queries)
+
+    def test_bulk_create_is_set_based(self):
+        self.department("Roads")  # creates the rollup row both batches update
+        self.assertEqual(self.bulk_create_queries(2, "Small"), self.bulk_create_queries(40, "Large"))
+        self.assertEqual(Department.objects.count(), 43)
+
+    def test_single_create_still_returns_an_object(self):
+        response = self.client.post("/api/departments/departments/", self.payload("Water"), format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["name"], "Water")
+
+    def test_bulk_create_rejects_duplicates_in_batch_and_table(self):
+        self.department("Roads")
+        rows = [self.payload("Roads"), self.payload("Water"), self.payload("Water"), self.payload("Water", self.kisumu)]
+        response = self.client.post("/api/departments/departments/", rows, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.data[0])
+        self.assertEqual(response.data[1], {})
+        self.assertTrue(response.data[2])
+        self.assertEqual(response.data[3], {})
+        self.assertEqual(Department.objects.count(), 1)
+
+    def test_bulk_create_rejects_unknown_foreign_keys(self):
+        response = self.client.post(
+            "/api/departments/departments/", [self.payload("Water", county=County(pk=999))], format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("county", response.data[0])
+
+    def test_bulk_patch(self):
+        roads, water = self.department("Roads"), self.department("Water")
+        response = self.client.patch(
+            "/api/departments/departments/bulk/",
+            [{"id": roads.pk, "staff_count": 12}, {"id": water.pk, "active": False}],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        roads.refresh_from_db()
+        water.refresh_from_db()
+        self.assertEqual((roads.staff_count, roads.active), (12, True))
+        self.assertEqual((water.staff_count, water.active), (0, False))
+
+    def test_bulk_patch_requires_existing_ids(self):
+        roads = self.department("Roads")
+        response = self.client.patch(
+            "/api/departments/departments/bulk/",
+            [{"id": roads.pk, "staff_count": 12}, {"id": roads.pk + 100}, {"staff_count": 3}],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertEqual(response.data[1]["id"], ["Not found."])
+        self.assertEqual(response.data[2]["id"], ["This field is required."])
+        roads.refresh_from_db()
+        self.assertEqual(roads.staff_count, 0)
+
+    def test_bulk_patch_rejects_a_rename_onto_an_existing_name(self):
+        roads = self.department("Roads")
+        self.department("Water")
+        response = self.client.patch(
+            "/api/departments/departments/bulk/", [{"id": roads.pk, "name": "Water"}], format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_upsert_matches_on_county_and_name(self):
+        roads = self.department("Roads", staff_count=1)
+        response = self.client.post(
+            "/api/departments/departments/upsert/",
+            [self.payload("Roads", staff_count=5), self.payload("Roads", self.kisumu, staff_count=7)],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        roads.refresh_from_db()
+        self.assertEqual(roads.staff_count, 5)
+        self.assertEqual(Department.objects.get(county=self.kisumu, name="Roads").staff_count, 7)
+        self.assertEqual(Department.objects.count(), 2)
+
+    def test_upsert_requires_a_list(self):
+        response = self.client.post("/api/departments/departments/upsert/", self.payload("Roads"), format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+# ============================================================
+#   SPARSE FIELDSETS AND EXPANSION
+# ============================================================
+class SparseFieldsTests(DepartmentAPITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for name in ("Roads", "Water", "Health Services"):
+            department = Department.objects.create(
+                name=name, county=cls.mombasa, category=cls.health, email="d@example.com",
+                description="A long description that ?fields= should not load.",
+            )
+            for unit in ("North", "South"):
+                DepartmentUnit.objects.create(department=department, name=f"{name} {unit}")
+            DepartmentContact.objects.create(department=department, contact_type="PHONE", value="0700000000")
+
+    def get(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/api/departments/departments/?{query}")
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data["results"], [query["sql"] for query in queries]
+
+    def test_fields_limits_output_and_columns(self):
+        rows, sql = self.get("fields=name,county_name")
+        self.assertEqual(set(rows[0]), {"name", "county_name"})
+        select = next(query for query in sql if 'FROM "departments_department"' in query)
+        self.assertNotIn('"description"', select)
+        self.assertNotIn('"departments_departmentcategory"', select)
+        self.assertIn('"locations_county"."name"', select)
+
+    def test_expand_prefetches_reverse_relations(self):
+        rows, sql = self.get("expand=units,contacts")
+        self.assertEqual([len(row["units"]) for row in rows], [2, 2, 2])
+        self.assertEqual(rows[0]["contacts"][0]["value"], "0700000000")
+        self.assertEqual(sum('FROM "departments_departmentunit"' in query for query in sql), 1)
+        self.assertEqual(sum('FROM "departments_departmentcontact"' in query for query in sql), 1)
+
+    def test_dotted_fields_reach_into_expansions(self):
+        rows, sql = self.get("fields=name,units.name&expand=units")
+        self.assertEqual(set(rows[0]), {"name", "units"})
+        self.assertEqual(set(rows[0]["units"][0]), {"name"})
+        unit_select = next(query for query in sql if 'FROM "departments_departmentunit"' in query)
+        self.assertNotIn('"description"', unit_select)
+
+    def test_unknown_expansions_are_ignored(self):
+        rows, sql = self.get("expand=budget")
+        self.assertNotIn("budget", rows[0])
+
+    def test_writes_ignore_fields(self):
+        response = self.client.post(
+            "/api/departments/departments/?fields=name", self.payload("Lands"), format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIn("email", response.data)
+
+
+# ============================================================
+#   KEYSET PAGINATION
+# ============================================================
+class KeysetPaginationTests(DepartmentAPITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for n in range(7):
+            Department.objects.create(
+                name=f"Department {n}", county=cls.kisumu if n % 2 else cls.mombasa, email="d@example.com"
+            )
+
+    def walk(self, url):
+        names = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            counts = [query["sql"] for query in queries if "COUNT(" in query["sql"]]
+            self.assertFalse([sql for sql in counts if '"departments_department"' in sql])
+            names += [row["name"] for row in response.data["results"]]
+            url = response.data["next"]
+        return names
+
+    def test_pages_cover_every_row_once(self):
+        expected = list(Department.objects.order_by("county__name", "name").values_list("name", flat=True))
+        self.assertEqual(self.walk("/api/departments/departments/?page_size=2"), expected)
+
+    def test_ordering_param_is_seeked_on(self):
+        names = self.walk("/api/departments/departments/?page_size=3&ordering=-name")
+        self.assertEqual(names, [f"Department {n}" for n in range(6, -1, -1)])
+
+    def test_previous_link_returns_the_page_before(self):
+        first = self.client.get("/api/departments/departments/?page_size=3&ordering=name").data
+        second = self.client.get(first["next"]).data
+        self.assertEqual(self.client.get(second["previous"]).data["results"], first["results"])
+        self.assertIsNone(first["previous"])
+
+    def test_cursor_survives_deletion_of_its_row(self):
+        first = self.client.get("/api/departments/departments/?page_size=3&ordering=name").data
+        Department.objects.get(name=first["results"][-1]["name"]).delete()
+        second = self.client.get(first["next"]).data
+        self.assertEqual([row["name"] for row in second["results"]], ["Department 3", "Department 4", "Department 5"])
+
+    def test_cursor_for_another_ordering_is_rejected(self):
+        first = self.client.get("/api/departments/departments/?page_size=3&ordering=name").data
+        response = self.client.get(first["next"].replace("ordering=name", "ordering=-name"))
+        self.assertEqual(response.status_code, 404)
+
+    def test_tampered_cursor_values_are_rejected(self):
+        DepartmentCategory.objects.create(name="Roads")
+        for values in (["a", "notint"], ["a", {"x": 1}], [["a"], 1]):
+            cursor = {"v": values, "o": ["name", "pk"]}
+            encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+            response = self.client.get(f"/api/departments/categories/?page_size=1&cursor={encoded}")
+            self.assertEqual(response.status_code, 404, values)
+
+
+# ============================================================
+#   FULL-TEXT SEARCH
+# ============================================================
+class FullTextSearchTests(DepartmentAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.roads = self.department("Roads", description="Bridges, tarmac and drainage")
+            self.water = self.department("Water", description="Boreholes and sanitation for roads")
+            self.unit = DepartmentUnit.objects.create(department=self.roads, name="Bridge Maintenance")
+            self.user = CustomUser.objects.create(email="otieno@example.com", username="otieno")
+            self.officer = DepartmentOfficer.objects.create(user=self.user, department=self.water, position="Engineer")
+
+    def search(self, resource, term):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/api/departments/{resource}/", {"search": term})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(" LIKE " in query["sql"] for query in queries))
+        return [row["name" if "name" in row else "position"] for row in response.data["results"]]
+
+    def test_backend_is_used_on_sqlite(self):
+        self.assertEqual(get_backend().vendor, "sqlite")
+
+    def test_prefix_matches_ranked_by_relevance(self):
+        self.assertEqual(self.search("departments", "road"), ["Roads", "Water"])
+        self.assertEqual(self.search("departments", "bore sanit"), ["Water"])
+        self.assertEqual(self.search("departments", "tarmac"), ["Roads"])
+
+    def test_related_names_are_indexed(self):
+        self.assertEqual(self.search("units", "roads"), ["Bridge Maintenance"])
+        self.assertEqual(self.search("officers", "otieno"), ["Engineer"])
+
+    def test_renames_refresh_dependent_documents(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.roads.name = "Highways"
+            self.roads.save()
+            self.user.username = "achieng"
+            self.user.save()
+        self.assertEqual(self.search("units", "highways"), ["Bridge Maintenance"])
+        self.assertEqual(self.search("units", "roads"), [])
+        self.assertEqual(self.search("officers", "achieng"), ["Engineer"])
+
+    def test_bulk_writes_are_indexed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/departments/departments/", [self.payload("Lands")], format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.search("departments", "lands"), ["Lands"])
+
+    def test_deleted_rows_leave_the_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.water.delete()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT rowid FROM "departments_department_fts"')
+            self.assertEqual([row[0] for row in cursor.fetchall()], [self.roads.pk])
+
+    def test_rebuild_search_index(self):
+        backend = get_backend()
+        for model in (Department, DepartmentUnit, DepartmentOfficer):
+            backend.clear(model)
+        self.assertEqual(self.search("departments", "roads"), [])
+
+        out = StringIO()
+        call_command("rebuild_search_index", stdout=out)
+        self.assertIn("Indexed 2 departments.", out.getvalue())
+        cache.clear()
+        self.assertEqual(self.search("departments", "roads"), ["Roads", "Water"])
+
+
+# ============================================================
+#   STREAMING EXPORTS
+# ============================================================
+class ExportTests(DepartmentAPITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.roads = Department.objects.create(
+            name="Roads", county=cls.mombasa, category=cls.health, email="roads@example.com",
+            budget_allocated=Decimal("1500000.50"), staff_count=12,
+        )
+        Department.objects.create(name="Water, Sanitation", county=cls.kisumu, email="water@example.com")
+        user = CustomUser.objects.create(email="otieno@example.com", username="otieno")
+        DepartmentOfficer.objects.create(user=user, department=cls.roads, position="Engineer")
+        DepartmentContact.objects.create(department=cls.roads, contact_type="PHONE", value="0700000000")
+
+    def export(self, resource, query=""):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/api/departments/{resource}/export/?{query}")
+            body = b"".join(response.streaming_content).decode("utf-8") if response.status_code == 200 else None
+        return response, body, len(queries)
+
+    def test_csv(self):
+        response, body, queries = self.export("departments", "format=csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="departments.csv"')
+        rows = list(csv.DictReader(body.splitlines()))
+        self.assertEqual([row["name"] for row in rows], ["Water, Sanitation", "Roads"])
+        self.assertEqual(rows[1]["county_name"], "Mombasa")
+        self.assertEqual(rows[1]["category_name"], "Health")
+        self.assertEqual(rows[1]["budget_allocated"], "1500000.50")
+        self.assertEqual(queries, 1)
+
+    def test_ndjson_follows_list_filters(self):
+        response, body, _ = self.export("departments", f"format=ndjson&county={self.mombasa.pk}")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson; charset=utf-8")
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["name"], "Roads")
+        self.assertEqual(rows[0]["budget_allocated"], "1500000.50")
+        self.assertIsNone(rows[0]["date_established"])
+
+    def test_officer_and_contact_exports(self):
+        _, body, _ = self.export("officers", "format=ndjson")
+        self.assertEqual(json.loads(body)["user_name"], "otieno")
+        self.assertEqual(json.loads(body)["department_name"], "Roads")
+        _, body, _ = self.export("contacts", "format=csv")
+        self.assertEqual(body.splitlines()[1], f"{DepartmentContact.objects.get().pk},Roads,PHONE,0700000000,True")
+
+    def test_officer_export_leaves_out_login_emails(self):
+        self.client.force_authenticate(None)
+        response, body, _ = self.export("officers", "format=ndjson")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("otieno@example.com", body)
+        self.assertNotIn("user_email", json.loads(body))
+
+    def test_unknown_format(self):
+        response, _, _ = self.export("departments", "format=xml")
+        self.assertEqual(response.status_code, 404)
+
+
+# ============================================================
+#   RESPONSE CACHE
+# ============================================================
+# The test runner is a single process, so local memory stands in for Redis here.
+@override_settings(SHARED_CACHE_BACKENDS=["django.core.cache.backends.locmem.LocMemCache"])
+class ResponseCacheTests(DepartmentAPITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.roads = Department.objects.create(name="Roads", county=cls.mombasa, email="roads@example.com")
+        cls.water = Department.objects.create(name="Water", county=cls.kisumu, email="water@example.com")
+
+    def setUp(self):
+        super().setUp()
+        counts = mock.patch.dict(response_cache._counts, {"hits": 0, "misses": 0})
+        counts.start()
+        self.addCleanup(counts.stop)
+
+    def names(self, query=""):
+        response = self.client.get(f"/api/departments/departments/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return [row["name"] for row in response.data["results"]]
+
+    def stats(self):
+        response = self.client.get("/api/departments/cache-stats/")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_repeated_reads_are_served_from_the_cache(self):
+        self.names()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.names(), ["Water", "Roads"])
+        self.assertFalse(any('"departments_department"' in query["sql"] for query in queries))
+        self.assertEqual(self.stats(), {"enabled": True, "hits": 1, "misses": 1, "hit_ratio": 0.5})
+
+    def test_committed_writes_evict_the_entries_they_change(self):
+        self.assertEqual(self.names(), ["Water", "Roads"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/api/departments/departments/{self.roads.pk}/", {"name": "Highways"}, format="json")
+        self.assertEqual(self.names(), ["Water", "Highways"])
+
+    def test_writes_only_evict_their_own_county(self):
+        self.names(f"county={self.mombasa.pk}")
+        self.names(f"county={self.kisumu.pk}")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.department("Lands", county=self.kisumu)
+        self.assertEqual(self.names(f"county={self.mombasa.pk}"), ["Roads"])
+        self.assertEqual(self.names(f"county={self.kisumu.pk}"), ["Lands", "Water"])
+        self.assertEqual(self.stats()["hits"], 1)
+
+    def test_category_changes_evict_everything(self):
+        self.names(f"county={self.mombasa.pk}")
+        with self.captureOnCommitCallbacks(execute=True):
+            DepartmentCategory.objects.create(name="Transport")
+        self.names(f"county={self.mombasa.pk}")
+        self.assertEqual(self.stats()["hits"], 0)
+
+    def test_detail_pages_are_evicted_per_department(self):
+        self.client.get(f"/api/departments/departments/{self.water.pk}/")
+        with self.captureOnCommitCallbacks(execute=True):
+            Department.objects.filter(pk=self.water.pk).get().save()
+            DepartmentUnit.objects.create(department=self.roads, name="Bridges")
+        response = self.client.get(f"/api/departments/departments/{self.water.pk}/")
+        self.assertEqual(response.data["name"], "Water")
+        self.assertEqual(self.stats()["hits"], 0)
+
+    def test_unshared_backends_are_never_used(self):
+        for backend in ("locmem.LocMemCache", "db.DatabaseCache"):
+            backend_settings = {"default": {"BACKEND": f"django.core.cache.backends.{backend}", "LOCATION": "countyconnect_cache"}}
+            with self.subTest(backend), override_settings(CACHES=backend_settings, SHARED_CACHE_BACKENDS=[]):
+                self.names()
+                Department.objects.filter(pk=self.roads.pk).update(name="Highways")  # no eviction
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(self.names(), ["Water", "Highways"])
+                self.assertFalse([query for query in queries if "countyconnect_cache" in query["sql"]])
+                self.assertEqual(self.stats(), {"enabled": False, "hits": 0, "misses": 0, "hit_ratio": None})
+                Department.objects.filter(pk=self.roads.pk).update(name="Roads")
+
+    def test_stats_are_for_admins_only(self):
+        self.client.force_authenticate(CustomUser(email="staff@example.com", is_staff=True, is_active=True))
+        self.assertEqual(self.client.get("/api/departments/cache-stats/").status_code, 403)
+
+
+# ============================================================
+#   BUDGET / STAFFING ROLLUPS
+# ============================================================
+class RollupTests(DepartmentAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.roads = self.department("Roads", budget_allocated=Decimal("100.00"), staff_count=3)
+        self.water = self.department("Water", county=self.kisumu, budget_allocated=Decimal("30000.00"))
+
+    def cells(self):
+        return list(
+            DepartmentRollup.objects.order_by("county_id", "category_id").values_list(
+                "county_id", "category_id", "department_count", "active_count", "budget_total", "staff_total"
+            )
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = [cell for cell in self.cells() if cell[2]]  # emptied cells are kept
+        rollups.rebuild()
+        self.assertEqual(incremental, self.cells())
+
+    def test_saves_and_deletes(self):
+        self.roads.budget_allocated = "250.50"
+        self.roads.active = False
+        self.roads.save()
+        self.department("Lands", staff_count=4)
+        self.water.category = None
+        self.water.save()
+        self.assertMatchesRebuild()
+        Department.objects.get(name="Lands").delete()
+        self.assertMatchesRebuild()
+
+    def test_stale_instances_apply_deltas_against_the_stored_row(self):
+        first, second = Department.objects.get(pk=self.roads.pk), Department.objects.get(pk=self.roads.pk)
+        first.budget_allocated = Decimal("200.00")
+        first.save()
+        second.budget_allocated = Decimal("300.00")
+        second.save()
+        self.assertEqual(rollups.summary()["totals"]["budget_total"], Decimal("30300.00"))
+        self.assertMatchesRebuild()
+
+    def test_stale_delete_removes_the_stored_row(self):
+        stale = Department.objects.get(pk=self.roads.pk)
+        Department.objects.filter(pk=self.roads.pk).get().delete()
+        stale.delete()
+        self.assertEqual(rollups.summary()["totals"]["department_count"], 1)
+        self.assertMatchesRebuild()
+
+    def test_deferred_instances(self):
+        department = Department.objects.only("name").get(pk=self.roads.pk)
+        department.county = self.kisumu
+        department.save()
+        self.assertMatchesRebuild()
+
+    def test_bulk_endpoints(self):
+        self.client.post("/api/departments/departments/", [
+            self.payload("Lands", budget_allocated="10.00"), self.payload("Trade", self.kisumu, staff_count=2),
+        ], format="json")
+        self.client.patch("/api/departments/departments/bulk/", [
+            {"id": self.roads.pk, "county": self.kisumu.pk}, {"id": self.water.pk, "active": False},
+        ], format="json")
+        self.client.post("/api/departments/departments/upsert/", [
+            self.payload("Lands", budget_allocated="20.00"), self.payload("Health", staff_count=9),
+        ], format="json")
+        self.assertEqual(Department.objects.count(), 5)
+        self.assertMatchesRebuild()
+
+    def test_deleting_a_category_moves_totals_to_uncategorised(self):
+        self.health.delete()
+        self.assertEqual(DepartmentRollup.objects.filter(category__isnull=False).count(), 0)
+        self.assertMatchesRebuild()
+
+    def test_deleting_a_county_drops_its_cells(self):
+        self.kisumu.delete()
+        self.assertMatchesRebuild()
+
+    def test_analytics_endpoint(self):
+        response = self.client.get("/api/departments/analytics/", {"county": self.mombasa.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["totals"], {
+            "department_count": 1, "active_count": 1, "budget_total": Decimal("100.00"), "staff_total": 3,
+        })
+        self.assertEqual(response.data["by_category"][0]["category_name"], "Health")
+        self.assertEqual(self.client.get("/api/departments/analytics/", {"county": "x"}).status_code, 400)
+
+
+# ============================================================
+#   ORG CHART
+# ============================================================
+class OrgChartTests(DepartmentAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.roads = self.department("Roads")
+        self.changamwe = SubCounty.objects.create(county=self.mombasa, name="Changamwe")
+        self.bridges = DepartmentUnit.objects.create(department=self.roads, name="Bridges")
+        self.drainage = DepartmentUnit.objects.create(department=self.roads, name="Drainage")
+        self.director = self.officer("director", is_head=True, position="Director")
+        self.engineer = self.officer("engineer", unit=self.bridges, subcounty=self.changamwe)
+        self.clerk = self.officer("clerk")
+        self.officer("retired", active=False)
+        self.bridges.head = self.engineer.user
+        self.bridges.save()
+
+    def officer(self, username, **fields):
+        user = CustomUser.objects.create(email=f"{username}@example.com", username=username)
+        return DepartmentOfficer.objects.create(user=user, department=self.roads, **fields)
+
+    def chart(self):
+        response = self.client.get(f"/api/departments/departments/{self.roads.pk}/org-chart/")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_tree(self):
+        chart = self.chart()
+        self.assertEqual([node["user"]["username"] for node in chart["heads"]], ["director"])
+        self.assertEqual([node["user"]["username"] for node in chart["officers"]], ["clerk"])
+        bridges, drainage = chart["units"]
+        self.assertEqual(bridges["name"], "Bridges")
+        self.assertEqual(bridges["head"]["username"], "engineer")
+        self.assertEqual(bridges["officers"][0]["subcounty"], {"id": self.changamwe.pk, "name": "Changamwe"})
+        self.assertEqual(drainage, {"id": self.drainage.pk, "name": "Drainage", "head": None, "officers": []})
+
+    def test_query_count_does_not_grow_with_the_department(self):
+        def department_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.chart()
+            return len([query for query in queries if query["sql"].startswith('SELECT "departments_')])
+
+        before = department_queries()
+        for n in range(10):
+            unit = DepartmentUnit.objects.create(department=self.roads, name=f"Unit {n}")
+            self.officer(f"officer{n}", unit=unit, subcounty=self.changamwe)
+        self.assertEqual(department_queries(), before)
+        self.assertEqual(before, 3)  # department, units, officers
+
+    def test_cached_chart_follows_writes(self):
+        self.chart()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.clerk.user.username = "registrar"
+            self.clerk.user.save()
+        self.assertEqual(self.chart()["officers"][0]["user"]["username"], "registrar")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.changamwe.name = "Port Reitz"
+            self.changamwe.save()
+        self.assertEqual(self.chart()["units"][0]["officers"][0]["subcounty"]["name"], "Port Reitz")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.clerk.active = False
+            self.clerk.save()
+        self.assertEqual(self.chart()["officers"], [])
+
+    def test_unknown_department(self):
+        response = self.client.get("/api/departments/departments/999/org-chart/")
+        self.assertEqual(response.status_code, 404)
+
+
+# ============================================================
+#   DIRECTORY IMPORT
+# ============================================================
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ImportDirectoryTests(DepartmentAPITestCase):
+
+    DEPARTMENTS = [
+        ["county", "name", "email", "category", "budget_allocated", "staff_count", "active"],
+        ["Mombasa", "Roads", "roads@example.com", "Infrastructure", "1,500.50", "12", "yes"],
+        ["42", "Water", "water@example.com", "health", "", "", ""],
+        ["Nairobi", "Lands", "lands@example.com", "", "", "", ""],
+        ["Mombasa", "Trade", "not-an-email", "", "", "", ""],
+        ["Mombasa", "Roads", "again@example.com", "", "", "", ""],
+        ["Kisumu", "Fisheries", "fish@example.com", "", "", "many", ""],
+    ]
+    OFFICERS = [
+        ["email", "county", "department", "unit", "subcounty", "username", "password", "position", "is_head"],
+        ["otieno@example.com", "Mombasa", "Roads", "Bridges", "Changamwe", "otieno", "s3cret-pass", "Engineer", ""],
+        ["akinyi@example.com", "Kisumu", "Water", "", "", "", "", "Director", "yes"],
+        ["otieno@example.com", "Kisumu", "Water", "", "", "", "", "", ""],
+        ["taken@example.com", "Mombasa", "Roads", "", "", "admin", "", "", ""],
+        ["wekesa@example.com", "Mombasa", "Roads", "Bridges", "Kisauni", "", "", "", ""],
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        SubCounty.objects.create(county=self.mombasa, name="Changamwe")
+        CustomUser.objects.create(email="admin@example.com", username="admin")
+
+    def write_csv(self, name, rows):
+        path = os.path.join(self.tmp, name)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(rows)
+        return path
+
+    def import_directory(self, *args, departments=None, officers=None):
+        if departments is not None:
+            args += ("--departments", self.write_csv("departments.csv", departments))
+        if officers is not None:
+            args += ("--officers", self.write_csv("officers.csv", officers))
+        out = StringIO()
+        call_command("import_directory", "--workers", "1", *args, stdout=out)
+        return out.getvalue()
+
+    def test_departments(self):
+        output = self.import_directory(departments=self.DEPARTMENTS)
+        roads = Department.objects.get(name="Roads")
+        self.assertEqual(roads.category.name, "Infrastructure")
+        self.assertEqual((roads.budget_allocated, roads.staff_count, roads.active), (Decimal("1500.50"), 12, True))
+        water = Department.objects.get(name="Water")
+        self.assertEqual((water.county, water.category), (self.kisumu, self.health))
+        self.assertEqual(Department.objects.count(), 2)
+
+        self.assertIn("departments.csv:4: county: unknown county 'Nairobi'", output)
+        self.assertIn("departments.csv:5: email: 'not-an-email' is not a valid address", output)
+        self.assertIn("departments.csv:6: duplicate department 'Roads' in this county", output)
+        self.assertIn("departments.csv:7: staff_count:", output)
+        self.assertIn("Rejected: 4 rows", output)
+
+    def test_reimport_updates_in_place(self):
+        self.import_directory(departments=self.DEPARTMENTS)
+        rows = [self.DEPARTMENTS[0], ["Mombasa", "Roads", "roads@example.com", "", "99", "1", "no"]]
+        self.import_directory("--batch-size", "1", departments=rows)
+        roads = Department.objects.get(name="Roads")
+        self.assertEqual((roads.budget_allocated, roads.active, roads.category), (Decimal("99"), False, None))
+        self.assertEqual(Department.objects.count(), 2)
+
+        incremental = list(DepartmentRollup.objects.filter(department_count__gt=0).order_by("pk").values_list(
+            "county_id", "category_id", "department_count", "budget_total"))
+        rollups.rebuild()
+        self.assertEqual(sorted(incremental, key=str), sorted(DepartmentRollup.objects.values_list(
+            "county_id", "category_id", "department_count", "budget_total"), key=str))
+
+    def test_officers(self):
+        output = self.import_directory(departments=self.DEPARTMENTS, officers=self.OFFICERS)
+
+        otieno = DepartmentOfficer.objects.select_related("user", "unit", "subcounty").get(user__email="otieno@example.com")
+        self.assertEqual((otieno.unit.name, otieno.subcounty.name, otieno.position), ("Bridges", "Changamwe", "Engineer"))
+        self.assertEqual(otieno.user.role, CustomUser.UserRole.COUNTY_OFFICIAL)
+        self.assertTrue(otieno.user.is_active)
+        self.assertTrue(otieno.user.check_password("s3cret-pass"))
+        self.assertTrue(Profile.objects.filter(user=otieno.user).exists())
+
+        akinyi = DepartmentOfficer.objects.select_related("user").get(user__email="akinyi@example.com")
+        self.assertTrue(akinyi.is_head)
+        self.assertFalse(akinyi.user.is_active)
+        self.assertFalse(akinyi.user.has_usable_password())
+
+        self.assertIn("officers.csv:4: duplicate email 'otieno@example.com'", output)
+        self.assertIn("officers.csv:5: username: 'admin' is taken", output)
+        self.assertIn("officers.csv:6: subcounty: unknown sub-county 'Kisauni' in this county", output)
+        self.assertEqual(DepartmentUnit.objects.count(), 1)
+
+    def test_existing_accounts_are_reused(self):
+        self.import_directory(departments=self.DEPARTMENTS, officers=self.OFFICERS[:2])
+        rows = [self.OFFICERS[0], ["otieno@example.com", "Kisumu", "Water", "", "", "otieno", "", "Chief", ""]]
+        self.import_directory(officers=rows)
+        officer = DepartmentOfficer.objects.select_related("department").get()
+        self.assertEqual((officer.department.name, officer.position, officer.unit), ("Water", "Chief", None))
+        self.assertEqual(CustomUser.objects.filter(email="otieno@example.com").count(), 1)
+
+    def test_dry_run_rolls_back(self):
+        output = self.import_directory("--dry-run", departments=self.DEPARTMENTS, officers=self.OFFICERS)
+        self.assertIn("Dry run", output)
+        self.assertFalse(Department.objects.exists())
+        self.assertFalse(DepartmentOfficer.objects.exists())
+
+    def test_requires_a_file(self):
+        with self.assertRaises(CommandError):
+            call_command("import_directory")
@@ -1,11 +1,14 @@
 # departments/urls.py
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 from .views import (
     DepartmentCategoryViewSet,
     DepartmentViewSet,
     DepartmentUnitViewSet,
     DepartmentOfficerViewSet,
-    DepartmentContactViewSet
+    DepartmentContactViewSet,
+    ResponseCacheStatsView,
+    DepartmentAnalyticsView,
 )
 
 router = DefaultRouter()
@@ -15,4 +18,7 @@ router.register(r'units', DepartmentUnitViewSet)
 router.register(r'officers', DepartmentOfficerViewSet)
 router.register(r'contacts', DepartmentContactViewSet)
 
-urlpatterns = router.urls
+urlpatterns = [
+    path('analytics/', DepartmentAnalyticsView.as_view(), name='department-analytics'),
+    path('cache-stats/', ResponseCacheStatsView.as_view(), name='department-cache-stats'),
+] + router.urls
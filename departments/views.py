@@ -1,7 +1,17 @@
-from rest_framework import viewsets, permissions, filters, status
+from rest_framework import viewsets, permissions, filters, status, serializers
+from rest_framework.decorators import action
+from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.core.mail import send_mail
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.utils.text import slugify
 from django.conf import settings
+from accounts.permissions import IsAdmin
+from accounts.utils import build_email, send_emails
+from countyconnect.caches import is_shared
 from .models import (
     Department,
     DepartmentCategory,
@@ -9,7 +19,11 @@ from .models import (
     DepartmentOfficer,
     DepartmentContact,
 )
+from . import cache as response_cache, orgchart, rollups
+from .exports import CSVRenderer, NDJSONRenderer, stream_csv, stream_ndjson
+from .search import FullTextSearchFilter
 from .serializers import (
+    shape_queryset,
     DepartmentSerializer,
     DepartmentCategorySerializer,
     DepartmentUnitSerializer,
@@ -23,7 +37,14 @@ from .serializers import (
 class BulkCreateMixin:
     """
     Mixin to allow bulk creation (POST list of objects).
+    Lists are validated and inserted set-wise by BulkListSerializer.
     """
+    bulk_batch_size = None  # falls back to settings.DEPARTMENTS_BULK_BATCH_SIZE
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["batch_size"] = self.bulk_batch_size
+        return context
 
     def create(self, request, *args, **kwargs):
         many = isinstance(request.data, list)
@@ -33,23 +54,223 @@ class BulkCreateMixin:
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    @transaction.atomic
+    def perform_create(self, serializer):
+        created = serializer.save()
+        # Handle both single and bulk cases
+        self.notify_created(created if isinstance(created, list) else [created])
+
+    def notify_created(self, objects):
+        """
+        Hook for side effects on newly created objects, run in the same
+        transaction as the insert.
+        """
+
+
+# ============================================================
+#   BULK UPDATE / UPSERT MIXIN
+# ============================================================
+class BulkUpdateMixin(BulkCreateMixin):
+    """
+    Adds set-based bulk endpoints on top of BulkCreateMixin:
+    - PATCH <list>/bulk/   partial update of a list of objects, each with an "id".
+    - POST  <list>/upsert/ create or update a list of objects matched on upsert_fields.
+    """
+    upsert_fields = ()
+
+    def _require_list(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({"detail": "Expected a list of objects."})
+
+    @staticmethod
+    def locked(queryset):
+        """
+        Lock the rows being updated until they are saved, so the state they
+        were loaded with (e.g. for rollups) is still what they overwrite.
+        """
+        return queryset.select_for_update(of=("self",))
+
+    @action(detail=False, methods=["patch"], url_path="bulk")
+    def bulk_update(self, request):
+        self._require_list(request.data)
+        ids = [item.get("id") if isinstance(item, dict) else None for item in request.data]
+        pk_field = self.get_queryset().model._meta.pk
+        try:
+            ids = [pk_field.to_python(pk) if pk is not None else None for pk in ids]
+        except DjangoValidationError:
+            raise serializers.ValidationError({"detail": "Every object needs a valid id."})
+
+        with transaction.atomic():
+            found = self.locked(self.get_queryset()).in_bulk([pk for pk in ids if pk is not None])
+            errors = [
+                {} if pk in found else {"id": ["This field is required." if pk is None else "Not found."]}
+                for pk in ids
+            ]
+            if any(errors):
+                raise serializers.ValidationError(errors)
+
+            serializer = self.get_serializer([found[pk] for pk in ids], data=request.data, many=True, partial=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        return Response(serializer.data)
+
+    @action(detail=False, methods=["post"], url_path="upsert")
+    def upsert(self, request):
+        self._require_list(request.data)
+        model = self.get_queryset().model
+        fields = [model._meta.get_field(name) for name in self.upsert_fields]
+
+        keys = []
+        for item in request.data:
+            try:
+                key = tuple(field.to_python(item[field.name]) for field in fields)
+            except (KeyError, TypeError, DjangoValidationError):
+                key = None  # left for the serializer to reject
+            keys.append(None if key is None or None in key else key)
+
+        with transaction.atomic():
+            existing = {}
+            wanted = [key for key in keys if key]
+            if wanted:
+                lookups = {f"{field.attname}__in": {key[n] for key in wanted} for n, field in enumerate(fields)}
+                for obj in self.locked(self.get_queryset()).filter(**lookups):
+                    existing[tuple(getattr(obj, field.attname) for field in fields)] = obj
+
+            instances = [existing.get(key) if key else None for key in keys]
+            serializer = self.get_serializer(instances, data=request.data, many=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            self.notify_created(serializer.created)
+        return Response(serializer.data)
+
+
+# ============================================================
+#   SPARSE FIELDSETS MIXIN
+# ============================================================
+class SparseFieldsMixin:
+    """
+    On reads, trims the queryset to the columns and relations the requested
+    ?fields= / ?expand= shape actually serialises.
+    """
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.request.method in permissions.SAFE_METHODS:
+            qs = shape_queryset(qs, self.get_serializer())
+        return qs
+
+
+# ============================================================
+#   STREAMING EXPORT MIXIN
+# ============================================================
+class ExportMixin:
+    """
+    GET <list>/export/?format=csv|ndjson streams every row matching the
+    list's filters, with the columns named in export_fields.
+    """
+    export_fields = {}  # column -> field lookup
+    export_chunk_size = 2000
+
+    @action(detail=False, methods=["get"], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        header = list(self.export_fields)
+        rows = queryset.values(
+            *[name for name, lookup in self.export_fields.items() if name == lookup],
+            **{name: F(lookup) for name, lookup in self.export_fields.items() if name != lookup},
+        ).iterator(chunk_size=self.export_chunk_size)
+
+        renderer = request.accepted_renderer
+        body = stream_csv(header, rows) if renderer.format == "csv" else stream_ndjson(header, rows)
+        response = StreamingHttpResponse(body, content_type=f"{renderer.media_type}; charset=utf-8")
+        filename = slugify(queryset.model._meta.verbose_name_plural)
+        response["Content-Disposition"] = f'attachment; filename="{filename}.{renderer.format}"'
+        return response
+
+
+# ============================================================
+#   RESPONSE CACHE MIXIN
+# ============================================================
+class CachedResponseMixin:
+    """
+    Serves list and retrieve through the read-through response cache in
+    departments.cache. Entries are keyed by path, query string and the data
+    versions of the scope the request covers. Without a shared cache backend
+    every request is rendered, as other workers could not evict its entries.
+    """
+    # Version scope of detail pages, e.g. "department"; None means "all".
+    cache_detail_scope = None
+
+    def cache_scopes(self, request):
+        scopes = [
+            f"{param}:{request.query_params[param]}"
+            for param in ("county", "department")
+            if request.query_params.get(param)
+        ]
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if lookup is not None and self.cache_detail_scope:
+            scopes.append(f"{self.cache_detail_scope}:{lookup}")
+        return scopes or ["all"]
+
+    def cached_response(self, request, render):
+        if not is_shared():
+            return render()
+        key = response_cache.response_key(request, self.cache_scopes(request))
+        data = cache.get(key)
+        if data is not None:
+            response_cache.record("hits")
+            return Response(data)
+        response_cache.record("misses")
+        response = render()
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.DEPARTMENTS_CACHE_TIMEOUT)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs))
+
 
 # ============================================================
 #   DEPARTMENT VIEWSET
 # ============================================================
-class DepartmentViewSet(BulkCreateMixin, viewsets.ModelViewSet):
+class DepartmentViewSet(CachedResponseMixin, SparseFieldsMixin, ExportMixin, BulkUpdateMixin, viewsets.ModelViewSet):
     """
     Handles listing, creating, updating, and deleting departments.
     - Anonymous users can only view departments.
     - Authenticated users (e.g., admins) can create/update/delete.
     - Supports filtering by county, category, or search query.
+    - Supports bulk create, bulk PATCH and upsert on (county, name).
+    - Supports ?fields= and ?expand=units,officers,contacts.
+    - Streams CSV / NDJSON from export/.
+    - Reads are served from the response cache, evicted per county.
+    - Serves the unit/officer tree from org-chart/.
     """
-    queryset = Department.objects.select_related("county", "category").prefetch_related("units", "officers")
+    queryset = Department.objects.select_related("county", "category")
     serializer_class = DepartmentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [FullTextSearchFilter, filters.OrderingFilter]
     search_fields = ["name", "description"]
     ordering_fields = ["name", "county__name"]
+    upsert_fields = ("county", "name")
+    cache_detail_scope = "department"
+    export_fields = {
+        "id": "id",
+        "name": "name",
+        "code": "code",
+        "county_name": "county__name",
+        "category_name": "category__name",
+        "email": "email",
+        "phone": "phone",
+        "website": "website",
+        "head_office_location": "head_office_location",
+        "active": "active",
+        "budget_allocated": "budget_allocated",
+        "staff_count": "staff_count",
+        "date_established": "date_established",
+    }
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -61,37 +282,39 @@ class DepartmentViewSet(BulkCreateMixin, viewsets.ModelViewSet):
             qs = qs.filter(category_id=category_id)
         return qs
 
-    def perform_create(self, serializer):
+    @action(detail=True, methods=["get"], url_path="org-chart")
+    def org_chart(self, request, pk=None):
         """
-        Save and send email notification when a new department is created.
+        Units, heads and active officers as one tree, cached per department version.
         """
-        departments = serializer.save()
-        # Handle both single and bulk cases
-        if not isinstance(departments, list):
-            departments = [departments]
-
-        for department in departments:
-            if department.email:
-                send_mail(
-                    subject=f"New Department Registered: {department.name}",
-                    message=(
-                        f"A new department has been created:\n\n"
-                        f"Name: {department.name}\n"
-                        f"County: {department.county}\n"
-                        f"Category: {department.category}\n"
-                        f"Description: {department.description or 'N/A'}\n\n"
-                        f"Visit your CountyConnect dashboard for details."
-                    ),
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[department.email],
-                    fail_silently=True,
-                )
+        return self.cached_response(request, lambda: Response(orgchart.build(self.get_object())))
+
+    def notify_created(self, departments):
+        """
+        Queue an email notification when a new department is created.
+        """
+        send_emails([
+            build_email(
+                subject=f"New Department Registered: {department.name}",
+                message=(
+                    f"A new department has been created:\n\n"
+                    f"Name: {department.name}\n"
+                    f"County: {department.county}\n"
+                    f"Category: {department.category}\n"
+                    f"Description: {department.description or 'N/A'}\n\n"
+                    f"Visit your CountyConnect dashboard for details."
+                ),
+                recipient=department.email,
+            )
+            for department in departments
+            if department.email
+        ])
 
 
 # ============================================================
 #   DEPARTMENT CATEGORY VIEWSET
 # ============================================================
-class DepartmentCategoryViewSet(BulkCreateMixin, viewsets.ModelViewSet):
+class DepartmentCategoryViewSet(CachedResponseMixin, SparseFieldsMixin, BulkCreateMixin, viewsets.ModelViewSet):
     """
     Categories for grouping departments, e.g.:
     - Health
@@ -108,7 +331,7 @@ class DepartmentCategoryViewSet(BulkCreateMixin, viewsets.ModelViewSet):
 # ============================================================
 #   DEPARTMENT UNIT VIEWSET
 # ============================================================
-class DepartmentUnitViewSet(BulkCreateMixin, viewsets.ModelViewSet):
+class DepartmentUnitViewSet(CachedResponseMixin, SparseFieldsMixin, BulkCreateMixin, viewsets.ModelViewSet):
     """
     Sub-units under departments, e.g.:
     - Roads Unit (under Infrastructure)
@@ -117,7 +340,7 @@ class DepartmentUnitViewSet(BulkCreateMixin, viewsets.ModelViewSet):
     queryset = DepartmentUnit.objects.select_related("department", "head").order_by("department__name", "name")
     serializer_class = DepartmentUnitSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [FullTextSearchFilter]
     search_fields = ["name", "department__name"]
 
     def get_queryset(self):
@@ -131,7 +354,7 @@ class DepartmentUnitViewSet(BulkCreateMixin, viewsets.ModelViewSet):
 # ============================================================
 #   DEPARTMENT OFFICER VIEWSET
 # ============================================================
-class DepartmentOfficerViewSet(BulkCreateMixin, viewsets.ModelViewSet):
+class DepartmentOfficerViewSet(CachedResponseMixin, SparseFieldsMixin, ExportMixin, BulkUpdateMixin, viewsets.ModelViewSet):
     """
     Officers working in departments.
     - Links to Django Users.
@@ -140,8 +363,20 @@ class DepartmentOfficerViewSet(BulkCreateMixin, viewsets.ModelViewSet):
     queryset = DepartmentOfficer.objects.select_related("user", "department", "unit", "subcounty")
     serializer_class = DepartmentOfficerSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [FullTextSearchFilter]
     search_fields = ["user__username", "position", "department__name"]
+    upsert_fields = ("user",)
+    export_fields = {
+        "id": "id",
+        "user_name": "user__username",
+        "position": "position",
+        "department_name": "department__name",
+        "unit_name": "unit__name",
+        "subcounty_name": "subcounty__name",
+        "is_head": "is_head",
+        "active": "active",
+        "date_assigned": "date_assigned",
+    }
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -160,7 +395,7 @@ class DepartmentOfficerViewSet(BulkCreateMixin, viewsets.ModelViewSet):
 # ============================================================
 #   DEPARTMENT CONTACT VIEWSET
 # ============================================================
-class DepartmentContactViewSet(BulkCreateMixin, viewsets.ModelViewSet):
+class DepartmentContactViewSet(CachedResponseMixin, SparseFieldsMixin, ExportMixin, BulkUpdateMixin, viewsets.ModelViewSet):
     """
     Manages extra department contact channels like:
     - Additional email
@@ -172,6 +407,14 @@ class DepartmentContactViewSet(BulkCreateMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [filters.SearchFilter]
     search_fields = ["department__name", "contact_type", "value"]
+    upsert_fields = ("department", "contact_type", "value")
+    export_fields = {
+        "id": "id",
+        "department_name": "department__name",
+        "contact_type": "contact_type",
+        "value": "value",
+        "active": "active",
+    }
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -180,28 +423,52 @@ class DepartmentContactViewSet(BulkCreateMixin, viewsets.ModelViewSet):
             qs = qs.filter(department_id=dept_id)
         return qs
 
-    def perform_create(self, serializer):
+    def notify_created(self, contacts):
         """
         Notify the department via email if a new contact channel is added.
         """
-        contacts = serializer.save()
-        # Handle both single and bulk cases
-        if not isinstance(contacts, list):
-            contacts = [contacts]
-
-        for contact in contacts:
-            department = contact.department
-            if department and department.email:
-                send_mail(
-                    subject=f"New Contact Added for {department.name}",
-                    message=(
-                        f"A new contact has been added for your department.\n\n"
-                        f"Type: {contact.contact_type}\n"
-                        f"Value: {contact.value}\n"
-                        f"Active: {contact.active}\n\n"
-                        f"Visit your CountyConnect dashboard for details."
-                    ),
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[department.email],
-                    fail_silently=True,
-                )
+        send_emails([
+            build_email(
+                subject=f"New Contact Added for {contact.department.name}",
+                message=(
+                    f"A new contact has been added for your department.\n\n"
+                    f"Type: {contact.contact_type}\n"
+                    f"Value: {contact.value}\n"
+                    f"Active: {contact.active}\n\n"
+                    f"Visit your CountyConnect dashboard for details."
+                ),
+                recipient=contact.department.email,
+            )
+            for contact in contacts
+            if contact.department and contact.department.email
+        ])
+
+
+# ============================================================
+#   RESPONSE CACHE STATS
+# ============================================================
+class ResponseCacheStatsView(APIView):
+    """
+    Hit/miss counters of the department response cache (admins only).
+    """
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return Response(response_cache.stats())
+
+
+# ============================================================
+#   ANALYTICS
+# ============================================================
+class DepartmentAnalyticsView(APIView):
+    """
+    Department counts, budgets and staffing by county and category, read
+    from the incrementally maintained rollup table. Filter with ?county=<id>.
+    """
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+    def get(self, request):
+        county = request.query_params.get("county")
+        if county is not None and not county.isdigit():
+            raise serializers.ValidationError({"county": "A valid integer is required."})
+        return Response(rollups.summary(county=county))
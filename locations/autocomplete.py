@@ -0,0 +1,155 @@
+"""
+In-memory type-ahead index over ward and constituency names.
+
+Built from the shared location snapshot: a prefix trie over every word of
+every name answers "starts with" queries, and a trigram index catches typos
+when the trie has too few hits. Each trie node keeps its matches already
+ranked, so a one-letter prefix costs the same as a long one. The index is
+rebuilt whenever the snapshot is re-mapped, i.e. whenever location data has
+changed.
+"""
+import re
+from collections import Counter
+from itertools import chain
+
+from .snapshot import get_snapshot
+
+LEVELS = ("ward", "constituency")
+MIN_SIMILARITY = 0.3
+
+_non_alnum = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text):
+    return _non_alnum.sub(" ", (text or "").lower()).strip()
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AutocompleteIndex:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.entries = []     # (level, snapshot index, normalized name)
+        self.trie = {}        # char -> child node; "$" -> ranked (score, entry id) under this prefix
+        self.trigrams = {}    # trigram -> set of entry ids
+        self.entry_trigrams = []
+        self.payloads = []    # result fields of each entry, read from the snapshot once
+
+        for level in LEVELS:
+            for i in range(snapshot.count(level)):
+                entry_id = len(self.entries)
+                name = normalize(snapshot.name(level, i))
+                self.entries.append((level, i, name))
+                self.payloads.append({
+                    "type": level,
+                    "id": snapshot.pk(level, i),
+                    "name": snapshot.name(level, i),
+                    "path": snapshot.ancestors(level, i),
+                })
+
+                # Index the full name and every later word, so "central" finds "Kisumu Central".
+                words = name.split(" ")
+                for start in range(len(words)):
+                    self._insert(" ".join(words[start:]), entry_id)
+
+                grams = trigrams(name)
+                self.entry_trigrams.append(grams)
+                for gram in grams:
+                    self.trigrams.setdefault(gram, set()).add(entry_id)
+
+        self._rank(self.trie, "")
+
+    def _insert(self, text, entry_id):
+        node = self.trie
+        for char in text:
+            node = node.setdefault(char, {})
+            node.setdefault("$", []).append(entry_id)
+
+    def _rank(self, node, prefix):
+        """
+        Replace each node's entry ids with (score, entry id) pairs in result order:
+        exact name, then name prefix, then word prefix, then level and name.
+        """
+        if "$" in node:
+            best = {}
+            for entry_id in node["$"]:
+                name = self.entries[entry_id][2]
+                score = 3.0 if name == prefix else 2.0 if name.startswith(prefix) else 1.5
+                best[entry_id] = max(score, best.get(entry_id, 0))
+            node["$"] = sorted(
+                ((score, entry_id) for entry_id, score in best.items()),
+                key=lambda item: (-item[0], self._order(item[1])),
+            )
+        for char, child in node.items():
+            if char != "$":
+                self._rank(child, prefix + char)
+
+    def _order(self, entry_id):
+        level, _, name = self.entries[entry_id]
+        return LEVELS.index(level), name
+
+    def _prefix_matches(self, query):
+        node = self.trie
+        for char in query:
+            node = node.get(char)
+            if node is None:
+                return []
+        return node.get("$", [])
+
+    def search(self, query, limit=10, levels=LEVELS):
+        """
+        Return up to ``limit`` (score, level, snapshot index) tuples, best first.
+        """
+        return [(score, *self.entries[entry_id][:2]) for score, entry_id in self._matches(query, limit, levels)]
+
+    def _matches(self, query, limit, levels):
+        query = normalize(query)
+        if not query:
+            return []
+
+        matches = []
+        for score, entry_id in self._prefix_matches(query):
+            if self.entries[entry_id][0] in levels:
+                matches.append((score, entry_id))
+                if len(matches) == limit:
+                    break
+
+        # Trigram similarity is below every prefix score, so fuzzy hits only fill the tail.
+        if len(matches) < limit and len(query) >= 3:
+            scores = {}
+            prefix_ids = {entry_id for _, entry_id in matches}
+            query_grams = trigrams(query)
+            shared = Counter(chain.from_iterable(self.trigrams.get(gram, ()) for gram in query_grams))
+            for entry_id, count in shared.items():
+                if entry_id in prefix_ids or self.entries[entry_id][0] not in levels:
+                    continue
+                similarity = count / (len(query_grams) + len(self.entry_trigrams[entry_id]) - count)
+                if similarity >= MIN_SIMILARITY:
+                    scores[entry_id] = similarity
+            fuzzy = sorted(scores.items(), key=lambda item: (-item[1], self._order(item[0])))
+            matches.extend((score, entry_id) for entry_id, score in fuzzy[:limit - len(matches)])
+
+        return matches
+
+    def results(self, query, limit=10, levels=LEVELS):
+        return [
+            {**self.payloads[entry_id], "score": round(score, 3)}
+            for score, entry_id in self._matches(query, limit, levels)
+        ]
+
+
+_index = None
+
+
+def get_index():
+    """
+    Return the autocomplete index for the current snapshot, rebuilding it after data changes.
+    """
+    global _index
+    snapshot = get_snapshot()
+    if _index is None or _index.snapshot is not snapshot:
+        _index = AutocompleteIndex(snapshot)
+    return _index
@@ -0,0 +1,64 @@
+"""
+Precompressed JSON exports of the full location hierarchy.
+
+The hierarchy is serialised once per LocationDataVersion and kept in
+memory as identity, gzip and brotli bytes, so requests only pick an
+encoding and copy bytes.
+"""
+import gzip
+import hashlib
+import json
+
+import brotli
+
+from .models import County
+from .tree import build_tree
+
+
+class HierarchyExport:
+    def __init__(self, version, last_modified):
+        self.version = version
+        self.last_modified = last_modified
+        body = json.dumps(
+            build_tree(County.objects.order_by("code")), separators=(",", ":")
+        ).encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()[:32]
+
+        self.bodies = {
+            "identity": body,
+            "gzip": gzip.compress(body, compresslevel=9),
+            "br": brotli.compress(body),
+        }
+        # Each encoding is a different byte sequence, so each gets its own strong ETag.
+        self.etags = {
+            encoding: f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+            for encoding in self.bodies
+        }
+
+    def negotiate(self, accept_encoding):
+        """
+        Pick the smallest available encoding the client accepts.
+        """
+        accepted = set()
+        for part in (accept_encoding or "").split(","):
+            token, _, params = part.strip().partition(";")
+            if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                continue
+            accepted.add(token.strip().lower())
+        for encoding in ("br", "gzip"):
+            if encoding in accepted or "*" in accepted:
+                return encoding
+        return "identity"
+
+
+_export = None
+
+
+def get_export(version):
+    """
+    Return the export for ``version`` (a LocationDataVersion), building it at most once per process.
+    """
+    global _export
+    if _export is None or _export.version != version.version:
+        _export = HierarchyExport(version.version, version.updated_at)
+    return _export
@@ -0,0 +1,140 @@
+"""
+Offline point-in-ward lookup.
+
+Ward boundaries (GeoJSON, loaded by ``import_boundaries``) are indexed in
+process with a bulk-loaded R-tree over their bounding boxes. A lookup walks
+the tree to the few wards whose box contains the point and runs an exact
+point-in-polygon test on those, so no PostGIS or network geocoder is needed.
+"""
+import math
+
+from .models import Ward
+from .snapshot import get_snapshot
+
+NODE_CAPACITY = 16
+
+
+class RTree:
+    """
+    Static R-tree built with Sort-Tile-Recursive packing.
+    Nodes are (min_x, min_y, max_x, max_y, children, value) tuples.
+    """
+
+    def __init__(self, items, capacity=NODE_CAPACITY):
+        nodes = [(*bbox, None, value) for bbox, value in items]
+        while len(nodes) > capacity:
+            nodes = self._pack(nodes, capacity)
+        self.root = self._node(nodes) if nodes else None
+
+    @staticmethod
+    def _node(children):
+        return (
+            min(c[0] for c in children), min(c[1] for c in children),
+            max(c[2] for c in children), max(c[3] for c in children),
+            children, None,
+        )
+
+    def _pack(self, nodes, capacity):
+        leaf_count = math.ceil(len(nodes) / capacity)
+        slice_size = math.ceil(math.sqrt(leaf_count)) * capacity
+        nodes = sorted(nodes, key=lambda n: n[0] + n[2])
+        packed = []
+        for start in range(0, len(nodes), slice_size):
+            vertical = sorted(nodes[start:start + slice_size], key=lambda n: n[1] + n[3])
+            for i in range(0, len(vertical), capacity):
+                packed.append(self._node(vertical[i:i + capacity]))
+        return packed
+
+    def search(self, x, y):
+        """
+        Yield the values of every item whose bounding box contains (x, y).
+        """
+        if self.root is None:
+            return
+        stack = [self.root]
+        while stack:
+            min_x, min_y, max_x, max_y, children, value = stack.pop()
+            if x < min_x or x > max_x or y < min_y or y > max_y:
+                continue
+            if children is None:
+                yield value
+            else:
+                stack.extend(children)
+
+
+def _in_ring(x, y, ring):
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i][0], ring[i][1]
+        xj, yj = ring[j][0], ring[j][1]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def contains(geometry, lng, lat):
+    """
+    Whether a GeoJSON Polygon or MultiPolygon contains the point, holes excluded.
+    """
+    polygons = geometry["coordinates"]
+    if geometry["type"] == "Polygon":
+        polygons = [polygons]
+    for outer, *holes in polygons:
+        if _in_ring(lng, lat, outer) and not any(_in_ring(lng, lat, hole) for hole in holes):
+            return True
+    return False
+
+
+class WardLocator:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.geometries = {}
+        items = []
+        for pk, boundary, min_lng, min_lat, max_lng, max_lat in (
+            Ward.objects.exclude(boundary__isnull=True)
+            .values_list("id", "boundary", "min_lng", "min_lat", "max_lng", "max_lat")
+            .order_by()
+        ):
+            if boundary and min_lng is not None:
+                self.geometries[pk] = boundary
+                items.append(((min_lng, min_lat, max_lng, max_lat), pk))
+        self.tree = RTree(items)
+
+    def locate(self, lat, lng):
+        """
+        Return the primary key of the ward containing the point, or None.
+        """
+        for pk in self.tree.search(lng, lat):
+            if contains(self.geometries[pk], lng, lat):
+                return pk
+        return None
+
+    def result(self, lat, lng):
+        pk = self.locate(lat, lng)
+        if pk is None:
+            return None
+        i = self.snapshot.index("ward", pk)
+        if i is None:
+            return {"id": pk, "name": None, "code": None, "path": []}
+        return {
+            "id": pk,
+            "name": self.snapshot.name("ward", i),
+            "code": self.snapshot.code("ward", i),
+            "path": self.snapshot.ancestors("ward", i),
+        }
+
+
+_locator = None
+
+
+def get_locator():
+    """
+    Return the ward locator for the current snapshot, rebuilding it after data changes.
+    """
+    global _locator
+    snapshot = get_snapshot()
+    if _locator is None or _locator.snapshot is not snapshot:
+        _locator = WardLocator(snapshot)
+    return _locator
@@ -0,0 +1,138 @@
+"""
+Incremental reader for phpMyAdmin JSON exports.
+
+The export is a top-level array of objects, where each ``"type": "table"``
+object carries its rows in a ``"data"`` array. Instead of decoding the whole
+document at once, the reader walks that structure and yields one
+``(table_name, record)`` pair at a time, so memory use stays flat no matter
+how large the export is.
+"""
+import codecs
+import json
+import mmap
+
+CHUNK_SIZE = 1024 * 1024
+WHITESPACE = " \t\n\r"
+
+_decoder = json.JSONDecoder()
+
+
+def iter_file_chunks(path, chunk_size=CHUNK_SIZE):
+    """
+    Yield the bytes of ``path`` in ``chunk_size`` slices of a read-only memory map.
+    """
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped.
+            return
+        with mm:
+            released = 0
+            for offset in range(0, len(mm), chunk_size):
+                chunk = mm[offset:offset + chunk_size]
+                # Slices are copies, so the pages read so far can leave this
+                # process's RSS; they stay in the page cache.
+                end = offset + len(chunk)
+                end -= end % mmap.PAGESIZE
+                if end > released and hasattr(mmap, "MADV_DONTNEED"):
+                    mm.madvise(mmap.MADV_DONTNEED, released, end - released)
+                    released = end
+                yield chunk
+
+
+class _Reader:
+    """
+    A sliding text window over an iterator of byte chunks.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.buf += self.decoder.decode(b"", final=True)
+            self.eof = True
+            return True
+        # Drop what has already been consumed before growing the window.
+        self.buf = self.buf[self.pos:] + self.decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON export")
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos} of the current window")
+        self.pos += 1
+
+    def value(self):
+        """
+        Decode the next complete JSON value, pulling more input as needed.
+        """
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number ending exactly at the window edge may continue in the next chunk.
+            if end == len(self.buf) and not self.eof:
+                self._fill()
+                continue
+            self.pos = end
+            return obj
+
+    def items(self, close):
+        """
+        Yield once per element of the array or object currently open,
+        consuming the separating commas and the closing bracket.
+        """
+        if self.peek() == close:
+            self.pos += 1
+            return
+        while True:
+            yield
+            char = self.peek()
+            self.pos += 1
+            if char == close:
+                return
+            if char != ",":
+                raise ValueError(f"Expected ',' or {close!r}, got {char!r}")
+
+
+def iter_table_records(chunks):
+    """
+    Yield ``(table_name, record)`` for every row of every table in the export.
+    """
+    reader = _Reader(chunks)
+    reader.expect("[")
+    for _ in reader.items("]"):
+        reader.expect("{")
+        meta = {}
+        for _ in reader.items("}"):
+            key = reader.value()
+            reader.expect(":")
+            if key == "data" and reader.peek() == "[" and meta.get("type") == "table":
+                reader.expect("[")
+                for _ in reader.items("]"):
+                    yield meta.get("name"), reader.value()
+            else:
+                meta[key] = reader.value()
@@ -0,0 +1,115 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+MODES = {
+    "load": [],
+    "stream": ["--stream"],
+}
+
+COUNTIES = 47
+SUBCOUNTIES_PER_COUNTY = 6
+WARDS_PER_SUBCOUNTY = 5
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a phpMyAdmin export of the given size and compare peak RSS and wall time "
+        "of import_locations with and without --stream (each run is a --dry-run)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=1024, help='Size of the generated export (default: 1024)')
+        parser.add_argument('--output', type=str, help='Keep the generated export at this path')
+        parser.add_argument(
+            '--mode', choices=sorted(MODES), action='append',
+            help='Only benchmark this mode (repeatable; default: both)'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Passed on to import_locations')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = options['output'] or os.path.join(tmp, "export.json")
+            started = time.perf_counter()
+            rows = self.generate(path, options['size_mb'] * 1024 * 1024)
+            self.stdout.write(self.style.WARNING(
+                f"Generated {os.path.getsize(path) / 1024 / 1024:.0f} MB export with {rows} station rows "
+                f"in {time.perf_counter() - started:.1f}s: {path}"
+            ))
+
+            results = {}
+            for mode in options['mode'] or list(MODES):
+                results[mode] = self.run(mode, path, options['batch_size'])
+
+        ok = {mode: result for mode, result in results.items() if result[0] == 0}
+        if {"load", "stream"} <= ok.keys():
+            (_, load_time, load_rss), (_, stream_time, stream_rss) = ok["load"], ok["stream"]
+            self.stdout.write(self.style.SUCCESS(
+                f"stream vs load: {stream_rss / load_rss:.2f}x peak RSS, {stream_time / load_time:.2f}x wall time"
+            ))
+
+    def run(self, mode, path, batch_size):
+        command = [
+            sys.executable, str(settings.BASE_DIR / "manage.py"), "import_locations",
+            "--file", path, "--dry-run", "--batch-size", str(batch_size), *MODES[mode],
+        ]
+        self.stdout.write(self.style.WARNING(f"{mode}: {' '.join(command[1:])}"))
+        started = time.perf_counter()
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+        # wait4 reports this child's own peak RSS (in kilobytes on Linux).
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = exit_code = os.waitstatus_to_exitcode(status)
+        elapsed, peak_mb = time.perf_counter() - started, usage.ru_maxrss / 1024
+
+        if exit_code:
+            reason = f"killed by signal {-exit_code}" if exit_code < 0 else f"exit status {exit_code}"
+            self.stdout.write(self.style.ERROR(
+                f"{mode}: failed ({reason}) after {elapsed:.1f}s at {peak_mb:.0f} MB peak RSS"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{mode}: {elapsed:.1f}s wall time, {peak_mb:.0f} MB peak RSS"))
+        return exit_code, elapsed, peak_mb
+
+    @staticmethod
+    def generate(path, size):
+        """
+        Write an export shaped like the IEBC one: counties, subcounties, then
+        polling stations cycling over a fixed set of wards until ``size`` bytes.
+        """
+        subcounties = [
+            (county * SUBCOUNTIES_PER_COUNTY + n + 1, county + 1)
+            for county in range(COUNTIES) for n in range(SUBCOUNTIES_PER_COUNTY)
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('[\n{"type":"header","version":"5.1.1","comment":"Export to JSON plugin for PHPMyAdmin"},\n')
+            f.write('{"type":"database","name":"hci"},\n')
+            f.write('{"type":"table","name":"counties","database":"hci","data":\n[\n')
+            f.write(",\n".join(
+                f'{{"county_id":"{county}","county_name":"COUNTY {county}"}}' for county in range(1, COUNTIES + 1)
+            ))
+            f.write('\n]\n},\n{"type":"table","name":"subcounties","database":"hci","data":\n[\n')
+            f.write(",\n".join(
+                f'{{"subcounty_id":"{sid}","county_id":"{county}","constituency_name":"constituency {sid}"}}'
+                for sid, county in subcounties
+            ))
+            f.write('\n]\n},\n{"type":"table","name":"station","database":"hci","data":\n[\n')
+
+            rows, written = 0, f.tell()
+            while written < size:
+                lines = []
+                for sid, _ in subcounties:
+                    for ward in range(WARDS_PER_SUBCOUNTY):
+                        rows += 1
+                        lines.append(
+                            f'{{"station_id":"{rows}","subcounty_id":"{sid}",'
+                            f'"constituency_name":"constituency {sid}","ward":"ward {sid}-{ward}"}}'
+                        )
+                chunk = (",\n" if rows > len(lines) else "") + ",\n".join(lines)
+                f.write(chunk)
+                written += len(chunk)
+            f.write('\n]\n}\n]\n')
+        return rows
@@ -0,0 +1,88 @@
+import json
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from locations.models import County, SubCounty, Constituency, Ward, LocationDataVersion
+
+MODELS = {
+    "county": County,
+    "subcounty": SubCounty,
+    "constituency": Constituency,
+    "ward": Ward,
+}
+
+
+class Command(BaseCommand):
+    help = "Attach boundary polygons from a local GeoJSON FeatureCollection to locations"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', type=str, required=True, help='Local GeoJSON file path')
+        parser.add_argument(
+            '--level', choices=sorted(MODELS), default='ward',
+            help='Location level the features describe (default: ward)'
+        )
+        parser.add_argument(
+            '--code-property', type=str, default='code',
+            help='Feature property holding the location code (default: code)'
+        )
+        parser.add_argument(
+            '--name-property', type=str, default='name',
+            help='Feature property holding the location name, used when the code does not match'
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per bulk UPDATE (default: 500)')
+        parser.add_argument('--dry-run', action='store_true', help='Match features without saving anything')
+
+    def handle(self, *args, **options):
+        model = MODELS[options['level']]
+        self.stdout.write(self.style.WARNING(f"Loading boundaries from file: {options['file']}"))
+        with open(options['file'], 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("type") != "FeatureCollection":
+            raise CommandError("Expected a GeoJSON FeatureCollection")
+
+        by_code, by_name = {}, {}
+        for obj in model.objects.only("id", "code", "name"):
+            if obj.code is not None:
+                by_code[str(obj.code)] = obj
+            by_name.setdefault(obj.name.strip().title(), []).append(obj)
+
+        matched, unmatched, ambiguous, skipped = {}, 0, 0, 0
+        for feature in data.get("features", []):
+            geometry = feature.get("geometry") or {}
+            if not isinstance(geometry, dict) or geometry.get("type") not in ("Polygon", "MultiPolygon"):
+                skipped += 1
+                continue
+            props = feature.get("properties") or {}
+            code = props.get(options['code_property'])
+            obj = by_code.get(str(code)) if code is not None else None
+            if obj is None:
+                candidates = by_name.get(str(props.get(options['name_property']) or "").strip().title(), [])
+                if len(candidates) > 1:
+                    ambiguous += 1
+                    continue
+                obj = candidates[0] if candidates else None
+            if obj is None:
+                unmatched += 1
+                continue
+            try:
+                obj.set_boundary(geometry)
+            except ValidationError:
+                skipped += 1
+                continue
+            matched[obj.pk] = obj
+
+        if not options['dry_run'] and matched:
+            with transaction.atomic():
+                model.objects.bulk_update(
+                    list(matched.values()),
+                    ["boundary", "min_lng", "min_lat", "max_lng", "max_lat"],
+                    batch_size=options['batch_size'],
+                )
+                # Ward locators are keyed on the snapshot, so this makes every worker reload.
+                LocationDataVersion.bump()
+
+        verb = "would be updated" if options['dry_run'] else "updated"
+        self.stdout.write(self.style.SUCCESS(f"{model._meta.verbose_name_plural}: {len(matched)} {verb}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Unmatched: {unmatched}, ambiguous names: {ambiguous}, invalid or non-polygon features: {skipped}"
+        ))
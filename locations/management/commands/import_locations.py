@@ -1,8 +1,25 @@
+import hashlib
 import json
+import os
+import resource
+import tempfile
+import time
+from itertools import groupby, islice
 import requests
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from locations.models import County, SubCounty, Constituency, Ward
+from locations.json_stream import CHUNK_SIZE, iter_file_chunks, iter_table_records
+from locations.models import (
+    County, SubCounty, Constituency, Ward, LocationSourceTable, LocationDataVersion
+)
+from locations.snapshot import build_snapshot
+
+
+def row_hash(*values):
+    """
+    Content hash of the source values a location row was built from.
+    """
+    return hashlib.sha1("\x1f".join(str(v) for v in values).encode("utf-8")).hexdigest()
 
 
 class Command(BaseCommand):
@@ -11,106 +28,393 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('--url', type=str, help='URL to JSON file')
         parser.add_argument('--file', type=str, help='Local JSON file path')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows written per bulk INSERT (default: 1000)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Run the full import inside a transaction and roll it back'
+        )
+        parser.add_argument(
+            '--stream', action='store_true',
+            help='Parse the export incrementally instead of loading it into memory'
+        )
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Skip source tables unchanged since the last import and delete rows no longer in the source'
+        )
 
     def handle(self, *args, **options):
         url = options.get('url')
         file_path = options.get('file')
+        self.batch_size = options['batch_size']
+        stream = options['stream']
+        started = time.perf_counter()
 
         # --- Load JSON ---
+        # open_records() returns a fresh (table_name, record) iterator, so the
+        # incremental mode can hash every table before writing anything.
         if url:
             self.stdout.write(self.style.WARNING(f"Fetching data from URL: {url}"))
+            if stream:
+                # Spooled to disk and memory-mapped like a local export, so the
+                # body is never held in memory and can be read twice.
+                with tempfile.TemporaryDirectory() as tmp:
+                    path = self.download(url, os.path.join(tmp, "export.json"))
+                    self.run(lambda: iter_table_records(iter_file_chunks(path)), options, started)
+                return
             response = requests.get(url)
             response.raise_for_status()
             data = response.json()
+            open_records = lambda: self.iter_loaded_records(data)
         elif file_path:
             self.stdout.write(self.style.WARNING(f"Loading data from file: {file_path}"))
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            if stream:
+                open_records = lambda: iter_table_records(iter_file_chunks(file_path))
+            else:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                open_records = lambda: self.iter_loaded_records(data)
         else:
             self.stdout.write(self.style.ERROR("You must provide --url or --file"))
             return
+        self.run(open_records, options, started)
+
+    @staticmethod
+    def download(url, path):
+        with requests.get(url, stream=True) as response:
+            response.raise_for_status()
+            with open(path, "wb") as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+        return path
+
+    def run(self, open_records, options, started):
+        dry_run = options['dry_run']
+        incremental = options['incremental']
 
-        county_map = {}
-        subcounty_map = {}
-        const_map = {}
+        writers = {
+            "counties": ("Counties", self.write_counties, [County]),
+            "subcounties": ("Subcounties", self.write_subcounties, [SubCounty, Constituency]),
+            "station": ("Wards", self.write_wards, [Ward]),
+        }
+        self.stats = {}
+
+        table_hashes = self.hash_tables(open_records()) if incremental else {}
+        stored_hashes = dict(LocationSourceTable.objects.values_list("name", "content_hash"))
+        skipped = []
 
         with transaction.atomic():
-            for table in data:
-                if table.get("type") != "table":
-                    continue
-
-                name = table.get("name")
-                rows = table.get("data", [])
-
-                # --- Counties ---
-                if name == "counties":
-                    for rec in rows:
-                        cid = rec.get("county_id")
-                        cname = rec.get("county_name")
-                        if not cid or not cname:
-                            continue
-                        county_obj, _ = County.objects.get_or_create(
-                            name=cname.strip().title(),
-                            defaults={"code": int(cid)},
-                        )
-                        county_map[cid] = county_obj
-
-                # --- Subcounties ---
-                elif name == "subcounties":
-                    for rec in rows:
-                        sid = rec.get("subcounty_id")
-                        cid = rec.get("county_id")
-                        sname = rec.get("constituency_name")
-                        if not sid or not cid or not sname:
-                            continue
-
-                        county_obj = county_map.get(cid)
-                        if not county_obj:
-                            continue
-
-                        sub_name = sname.strip().title()
-                        sub_obj, _ = SubCounty.objects.get_or_create(
-                            county=county_obj,
-                            name=sub_name
-                        )
-                        subcounty_map[sid] = sub_obj
-
-                        const_obj, _ = Constituency.objects.get_or_create(
-                            name=sub_name,
-                            sub_county=sub_obj
-                        )
-                        const_map[sub_name] = const_obj
-
-                # --- Wards (stations) ---
-                elif name == "station":
-                    for rec in rows:
-                        ward_name = rec.get("ward")
-                        sid = rec.get("subcounty_id")
-                        const_name = rec.get("constituency_name")
-
-                        if not sid or not ward_name or not const_name:
-                            continue
-
-                        sub_obj = subcounty_map.get(sid)
-                        if not sub_obj:
-                            continue
-
-                        c_name = const_name.strip().title()
-                        const_obj = const_map.get(c_name)
-                        if not const_obj:
-                            const_obj, _ = Constituency.objects.get_or_create(
-                                name=c_name,
-                                sub_county=sub_obj
-                            )
-                            const_map[c_name] = const_obj
-
-                        Ward.objects.get_or_create(
-                            name=ward_name.strip().title(),
-                            constituency=const_obj
-                        )
-
-        self.stdout.write(self.style.SUCCESS(" Import complete!"))
-        self.stdout.write(self.style.SUCCESS(f"Counties: {County.objects.count()}"))
-        self.stdout.write(self.style.SUCCESS(f"Subcounties: {SubCounty.objects.count()}"))
-        self.stdout.write(self.style.SUCCESS(f"Constituencies: {Constituency.objects.count()}"))
-        self.stdout.write(self.style.SUCCESS(f"Wards: {Ward.objects.count()}"))
+            # Natural keys are loaded once; every batch then writes only missing rows.
+            self.load_existing_keys()
+
+            # Tables are processed in file order, as each level needs the one before it.
+            for table_name, table_records in groupby(open_records(), key=lambda item: item[0]):
+                level, writer, models = writers.get(table_name, (None, None, []))
+                table_hash = table_hashes.get(table_name)
+                # Unchanged tables are still read to map their source ids, but not written.
+                self.writing = not (incremental and table_hash and stored_hashes.get(table_name) == table_hash)
+                if writer and not self.writing:
+                    skipped.append(table_name)
+
+                rows = (rec for _, rec in table_records)
+                while True:
+                    batch = list(islice(rows, self.batch_size))
+                    if not batch:
+                        break
+                    if writer:
+                        start = time.perf_counter()
+                        writer(batch)
+                        self._record(level, seen=len(batch), elapsed=time.perf_counter() - start)
+
+                if incremental and writer and self.writing:
+                    for model in models:
+                        self.delete_stale(model)
+                    LocationSourceTable.objects.update_or_create(
+                        name=table_name,
+                        defaults={"content_hash": table_hash, "row_count": self.stats.get(level, {}).get("seen", 0)},
+                    )
+
+            changed = any(
+                stats["created"] or stats["updated"] or stats["deleted"]
+                for stats in self.stats.values()
+            )
+            if dry_run:
+                transaction.set_rollback(True)
+            elif changed:
+                # Committed with the rows, so every host's snapshot is behind from then on.
+                LocationDataVersion.bump()
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(" Dry run: all changes rolled back."))
+        else:
+            if changed:
+                # Rebuilt here so the first request after the import doesn't pay for it.
+                build_snapshot()
+            self.stdout.write(self.style.SUCCESS(" Import complete!"))
+
+        for table_name in skipped:
+            self.stdout.write(self.style.SUCCESS(f"Table '{table_name}' unchanged, skipped."))
+        for level, stats in self.stats.items():
+            self.stdout.write(self.style.SUCCESS(
+                f"{level}: {stats['seen']} source rows, {stats['created']} created, "
+                f"{stats['updated']} updated, {stats['deleted']} deleted in {stats['elapsed']:.2f}s"
+            ))
+        # ru_maxrss is reported in kilobytes on Linux.
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(self.style.SUCCESS(
+            f"Total: {time.perf_counter() - started:.2f}s wall time, {peak_mb:.1f} MB peak RSS"
+        ))
+
+    @staticmethod
+    def iter_loaded_records(data):
+        for table in data:
+            if table.get("type") != "table":
+                continue
+            for rec in table.get("data", []):
+                yield table.get("name"), rec
+
+    @staticmethod
+    def hash_tables(records):
+        """
+        Return {table_name: sha256 of its records} for every table in the export.
+        """
+        hashes = {}
+        for table_name, rec in records:
+            hashes.setdefault(table_name, hashlib.sha256()).update(
+                json.dumps(rec, sort_keys=True).encode("utf-8")
+            )
+        return {name: digest.hexdigest() for name, digest in hashes.items()}
+
+    # ------------------------------------------------------------------
+    #   Pipeline helpers
+    # ------------------------------------------------------------------
+    def _record(self, level, seen=0, created=0, updated=0, deleted=0, elapsed=0.0):
+        stats = self.stats.setdefault(
+            level, {"seen": 0, "created": 0, "updated": 0, "deleted": 0, "elapsed": 0.0}
+        )
+        stats["seen"] += seen
+        stats["created"] += created
+        stats["updated"] += updated
+        stats["deleted"] += deleted
+        stats["elapsed"] += elapsed
+
+    def load_existing_keys(self):
+        self.county_ids = dict(County.objects.values_list("name", "id"))
+        self.subcounty_ids = {
+            (county_id, name): pk
+            for pk, county_id, name in SubCounty.objects.values_list("id", "county_id", "name")
+        }
+        self.constituency_ids = {
+            (sub_id, name): pk
+            for pk, sub_id, name in Constituency.objects.values_list("id", "sub_county_id", "name")
+        }
+        self.ward_ids = {
+            (const_id, name): pk
+            for pk, const_id, name in Ward.objects.values_list("id", "constituency_id", "name")
+        }
+
+        # Stored source codes and content hashes, used to spot renamed and changed rows.
+        self.codes = {}
+        self.hashes = {}
+        for model in (County, SubCounty, Constituency, Ward):
+            self.codes[model] = {}
+            self.hashes[model] = {}
+            for pk, code, content_hash in model.objects.values_list("id", "code", "content_hash"):
+                if code is not None:
+                    self.codes[model][code] = pk
+                self.hashes[model][pk] = content_hash
+
+        # Rows matched or created by this import; everything else is stale.
+        self.seen_ids = {model: set() for model in (County, SubCounty, Constituency, Ward)}
+
+        # Source ids only mean something within a single export.
+        self.county_by_source = {str(code): pk for code, pk in self.codes[County].items()}
+        self.subcounty_by_source = {}
+        # Wards reference constituencies by name only, as in the source export.
+        self.constituency_by_name = {}
+        # Wards already synced from an earlier batch, which keep their first station as code.
+        self.wards_done = set()
+
+    def sync_rows(self, model, level, pending, natural_ids, key_fields, match_codes=True):
+        """
+        Create or update the rows in ``pending`` ({natural key: field values}).
+
+        Existing rows are matched on their natural key first. With
+        ``match_codes``, for levels whose source code is a stable id, a row
+        not found by name is then matched on its code, which picks up renames.
+        Rows whose stored content hash matches are left alone.
+        ``natural_ids`` is kept up to date with the primary key of every row.
+        """
+        codes, hashes, seen = self.codes[model], self.hashes[model], self.seen_ids[model]
+        to_create, to_update = {}, []
+        fields = []
+        for key, values in pending.items():
+            fields = list(values)
+            code = values.get("code")
+            pk = natural_ids.get(key)
+            if pk is None and match_codes and code is not None and codes.get(code) not in seen:
+                pk = codes.get(code)
+                if pk is not None:
+                    # A rename: the old name no longer points at this row (renames are rare).
+                    for old_key in [k for k, v in natural_ids.items() if v == pk]:
+                        del natural_ids[old_key]
+            if pk is None:
+                to_create[key] = model(**values)
+                continue
+            seen.add(pk)
+            if hashes.get(pk) != values["content_hash"]:
+                to_update.append(model(pk=pk, **values))
+                natural_ids[key] = pk
+
+        if not self.writing:
+            return
+
+        if to_update:
+            model.objects.bulk_update(to_update, fields, batch_size=self.batch_size)
+            for obj in to_update:
+                hashes[obj.pk] = obj.content_hash
+                if obj.code is not None:
+                    codes[obj.code] = obj.pk
+
+        if to_create:
+            model.objects.bulk_create(list(to_create.values()), batch_size=self.batch_size, ignore_conflicts=True)
+            # Primary keys are not returned with ignore_conflicts, so read them back.
+            keys = [key if isinstance(key, tuple) else (key,) for key in to_create]
+            lookup = {
+                f"{field}__in": {key[i] for key in keys}
+                for i, field in enumerate(key_fields)
+            }
+            for row in model.objects.filter(**lookup).values_list("id", "code", "content_hash", *key_fields):
+                pk, code, content_hash, key = row[0], row[1], row[2], row[3:]
+                key = key if len(key) > 1 else key[0]
+                natural_ids[key] = pk
+                if key in to_create:
+                    seen.add(pk)
+                hashes[pk] = content_hash
+                if code is not None:
+                    codes[code] = pk
+
+        if to_create or to_update:
+            self._record(level, created=len(to_create), updated=len(to_update))
+
+    def delete_stale(self, model):
+        """
+        Delete rows created by a previous import from a source row that is no
+        longer in the export. Rows matched by natural key are never stale.
+        """
+        stale = (
+            model.objects.exclude(code__isnull=True)
+            .exclude(content_hash="")
+            .exclude(pk__in=self.seen_ids[model])
+        )
+        deleted = stale.delete()[1].get(model._meta.label, 0)
+        if deleted:
+            self._record(model._meta.verbose_name_plural.title(), deleted=deleted)
+
+    # --- Counties ---
+    def write_counties(self, rows):
+        pending = {}
+        for rec in rows:
+            cid = rec.get("county_id")
+            cname = rec.get("county_name")
+            if not cid or not cname:
+                continue
+            name = cname.strip().title()
+            pending[name] = {"name": name, "code": int(cid), "content_hash": row_hash(name, int(cid))}
+
+        self.sync_rows(County, "Counties", pending, self.county_ids, ("name",))
+
+        for name, values in pending.items():
+            if name in self.county_ids:
+                self.county_by_source[str(values["code"])] = self.county_ids[name]
+
+    # --- Subcounties (and their same-named constituencies) ---
+    def write_subcounties(self, rows):
+        pending = {}
+        for rec in rows:
+            sid = rec.get("subcounty_id")
+            cid = rec.get("county_id")
+            sname = rec.get("constituency_name")
+            if not sid or not cid or not sname:
+                continue
+            county_id = self.county_by_source.get(cid)
+            if not county_id:
+                continue
+            name = sname.strip().title()
+            pending[(county_id, name)] = {
+                "county_id": county_id, "name": name, "code": sid, "path": f"/{county_id}/",
+                "content_hash": row_hash(name, cid, sid),
+            }
+
+        self.sync_rows(SubCounty, "Subcounties", pending, self.subcounty_ids, ("county_id", "name"))
+
+        const_pending = {}
+        for key, values in pending.items():
+            sub_id = self.subcounty_ids.get(key)
+            if sub_id:
+                self.subcounty_by_source[values["code"]] = sub_id
+                const_pending[(sub_id, key[1])] = {
+                    "sub_county_id": sub_id, "name": key[1], "code": values["code"],
+                    "path": f"/{key[0]}/{sub_id}/",
+                    "content_hash": row_hash(key[1], values["code"]),
+                }
+
+        self.sync_rows(
+            Constituency, "Constituencies", const_pending, self.constituency_ids, ("sub_county_id", "name")
+        )
+        for key in const_pending:
+            if key in self.constituency_ids:
+                self.constituency_by_name[key[1]] = self.constituency_ids[key]
+
+    # --- Wards (stations) ---
+    def write_wards(self, rows):
+        pending = []
+        for rec in rows:
+            ward_name = rec.get("ward")
+            sid = rec.get("subcounty_id")
+            const_name = rec.get("constituency_name")
+            if not sid or not ward_name or not const_name:
+                continue
+            sub_id = self.subcounty_by_source.get(sid)
+            if not sub_id:
+                continue
+            pending.append((sub_id, sid, const_name.strip().title(), ward_name.strip().title(), rec.get("station_id")))
+
+        # Materialized paths of the parents wards and constituencies hang off.
+        county_of_sub = {pk: county_id for (county_id, _), pk in self.subcounty_ids.items()}
+        sub_path = lambda sub_id: f"/{county_of_sub[sub_id]}/{sub_id}/"
+
+        # Constituencies named in the station table but not in the subcounties table.
+        self.sync_rows(
+            Constituency, "Constituencies (from stations)",
+            {
+                (sub_id, c_name): {
+                    "sub_county_id": sub_id, "name": c_name, "code": None, "path": sub_path(sub_id),
+                    "content_hash": row_hash(c_name, sid),
+                }
+                for sub_id, sid, c_name, _, _ in pending
+                if c_name not in self.constituency_by_name
+            },
+            self.constituency_ids, ("sub_county_id", "name"),
+        )
+
+        sub_of_const = {pk: sub_id for (sub_id, _), pk in self.constituency_ids.items()}
+        ward_pending = {}
+        for sub_id, sid, c_name, w_name, station_id in pending:
+            const_id = self.constituency_by_name.get(c_name) or self.constituency_ids.get((sub_id, c_name))
+            if not const_id or (const_id, w_name) in self.wards_done:
+                continue
+            # Several stations can share a ward; the first one's id becomes the ward code.
+            # It shifts when stations are inserted, so wards are matched by name only.
+            ward_pending.setdefault((const_id, w_name), {
+                "constituency_id": const_id, "name": w_name, "code": station_id,
+                "path": f"{sub_path(sub_of_const[const_id])}{const_id}/",
+                "content_hash": row_hash(w_name, c_name, sid, station_id),
+            })
+
+        self.sync_rows(
+            Ward, "Wards", ward_pending, self.ward_ids, ("constituency_id", "name"), match_codes=False
+        )
+        self.wards_done.update(ward_pending)
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:16
+
+from django.db import migrations, models
+
+
+def fill_paths(apps, schema_editor):
+    SubCounty = apps.get_model('locations', 'SubCounty')
+    Constituency = apps.get_model('locations', 'Constituency')
+    Ward = apps.get_model('locations', 'Ward')
+
+    subcounties = list(SubCounty.objects.only('id', 'county_id'))
+    for sub in subcounties:
+        sub.path = f"/{sub.county_id}/"
+    SubCounty.objects.bulk_update(subcounties, ['path'], batch_size=1000)
+    sub_paths = {sub.id: f"{sub.path}{sub.id}/" for sub in subcounties}
+
+    constituencies = list(Constituency.objects.only('id', 'sub_county_id'))
+    for const in constituencies:
+        const.path = sub_paths[const.sub_county_id]
+    Constituency.objects.bulk_update(constituencies, ['path'], batch_size=1000)
+    const_paths = {const.id: f"{const.path}{const.id}/" for const in constituencies}
+
+    wards = list(Ward.objects.filter(constituency__isnull=False).only('id', 'constituency_id'))
+    for ward in wards:
+        ward.path = const_paths[ward.constituency_id]
+    Ward.objects.bulk_update(wards, ['path'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0008_location_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='constituency',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='subcounty',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='ward',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
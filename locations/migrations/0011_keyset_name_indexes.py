@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0010_location_boundaries'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='constituency',
+            index=models.Index(fields=['name', 'id'], name='locations_c_name_70da1a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subcounty',
+            index=models.Index(fields=['name', 'id'], name='locations_s_name_b978cb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ward',
+            index=models.Index(fields=['name', 'id'], name='locations_w_name_4ba960_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+def create_version_row(apps, schema_editor):
+    LocationDataVersion = apps.get_model('locations', 'LocationDataVersion')
+    LocationDataVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0011_keyset_name_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
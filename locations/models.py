@@ -1,8 +1,64 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.functions import Concat, Substr
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
-class County(models.Model):
+class BoundaryModel(models.Model):
+    """
+    Optional boundary geometry, stored as a GeoJSON Polygon or MultiPolygon
+    with its bounding box kept alongside for spatial indexing without PostGIS.
+    """
+    boundary = models.JSONField(blank=True, null=True)
+    min_lng = models.FloatField(blank=True, null=True, editable=False)
+    min_lat = models.FloatField(blank=True, null=True, editable=False)
+    max_lng = models.FloatField(blank=True, null=True, editable=False)
+    max_lat = models.FloatField(blank=True, null=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def set_boundary(self, geometry):
+        """
+        Store a GeoJSON geometry and refresh its bounding box.
+        Raises ValidationError unless it is a Polygon or MultiPolygon whose
+        rings are lists of at least four [lng, lat] positions.
+        """
+        if not geometry:
+            self.boundary = None
+            self.min_lng = self.min_lat = self.max_lng = self.max_lat = None
+            return
+        points = [point for polygon in self._polygons(geometry) for point in polygon[0]]
+        self.boundary = geometry
+        self.min_lng = min(p[0] for p in points)
+        self.max_lng = max(p[0] for p in points)
+        self.min_lat = min(p[1] for p in points)
+        self.max_lat = max(p[1] for p in points)
+
+    @staticmethod
+    def _polygons(geometry):
+        if not isinstance(geometry, dict) or geometry.get("type") not in ("Polygon", "MultiPolygon"):
+            raise ValidationError("Boundary must be a GeoJSON Polygon or MultiPolygon.")
+        polygons = geometry.get("coordinates")
+        if geometry["type"] == "Polygon":
+            polygons = [polygons]
+        if not isinstance(polygons, list) or not polygons:
+            raise ValidationError("Boundary has no coordinates.")
+        for polygon in polygons:
+            if not isinstance(polygon, list) or not polygon:
+                raise ValidationError("Boundary polygons need at least an outer ring.")
+            for ring in polygon:
+                if not isinstance(ring, list) or len(ring) < 4 or not all(
+                    isinstance(point, (list, tuple)) and len(point) >= 2
+                    and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in point[:2])
+                    for point in ring
+                ):
+                    raise ValidationError("Boundary rings need at least four [lng, lat] positions.")
+        return polygons
+
+
+class County(BoundaryModel):
     """
     Represents one of Kenya's 47 counties.
     """
@@ -12,6 +68,7 @@ class County(models.Model):
     null=True, blank=True,
     help_text=_("Official county code, e.g., 042 for Kisumu")
 )
+    content_hash = models.CharField(max_length=40, blank=True, default="", editable=False)
 
     
 
@@ -23,7 +80,58 @@ class County(models.Model):
         return f"{self.name} County"
 
 
-class SubCounty(models.Model):
+class MaterializedPathModel(models.Model):
+    """
+    Keeps a denormalised ``path`` of ancestor ids, root first, e.g. "/47/290/"
+    for a constituency in county 47 and sub-county 290. Descendant lookups
+    become one indexed prefix match instead of a chain of joins.
+    """
+    path = models.CharField(max_length=255, blank=True, default="", db_index=True, editable=False)
+
+    # Foreign key to the parent level, and models whose paths run through this one.
+    parent_field = None
+    descendant_models = ()
+
+    class Meta:
+        abstract = True
+
+    def build_path(self):
+        """
+        The parent's path plus the parent's id; empty when there is no parent.
+        """
+        field = self._meta.get_field(self.parent_field)
+        parent_id = getattr(self, field.attname)
+        if parent_id is None:
+            return ""
+        if issubclass(field.related_model, MaterializedPathModel):
+            return getattr(self, self.parent_field).descendant_prefix()
+        return f"/{parent_id}/"
+
+    def descendant_prefix(self):
+        return f"{self.path}{self.pk}/"
+
+    def ancestor_ids(self):
+        return [int(pk) for pk in self.path.strip("/").split("/") if pk]
+
+    def save(self, *args, **kwargs):
+        old_path = None
+        if self.pk and self.descendant_models:
+            old_path = type(self).objects.filter(pk=self.pk).values_list("path", flat=True).first()
+        self.path = self.build_path()
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "path"}
+        super().save(*args, **kwargs)
+
+        if old_path is not None and old_path != self.path:
+            old_prefix, new_prefix = f"{old_path}{self.pk}/", self.descendant_prefix()
+            for model in self.descendant_models:
+                model_class = self._meta.apps.get_model("locations", model)
+                model_class.objects.filter(path__startswith=old_prefix).update(
+                    path=Concat(models.Value(new_prefix), Substr("path", len(old_prefix) + 1))
+                )
+
+
+class SubCounty(MaterializedPathModel, BoundaryModel):
     """
     Represents sub-counties within a county.
     """
@@ -31,34 +139,44 @@ class SubCounty(models.Model):
     name = models.CharField(max_length=100)
     code = models.CharField(max_length=20, blank=True, null=True)
     population = models.PositiveIntegerField(blank=True, null=True)
+    content_hash = models.CharField(max_length=40, blank=True, default="", editable=False)
+
+    parent_field = "county"
+    descendant_models = ("Constituency", "Ward")
 
     class Meta:
         verbose_name_plural = "Sub-counties"
         unique_together = ("county", "name")
         ordering = ["name"]
+        indexes = [models.Index(fields=["name", "id"])]  # keyset pagination
 
     def __str__(self):
         return f"{self.name} ({self.county.name})"
 
 
-class Constituency(models.Model):
+class Constituency(MaterializedPathModel, BoundaryModel):
     """
     Represents constituencies within a sub-county.
     """
     sub_county = models.ForeignKey(SubCounty, on_delete=models.CASCADE, related_name="constituencies")
     name = models.CharField(max_length=100)
     code = models.CharField(max_length=20, blank=True, null=True)
+    content_hash = models.CharField(max_length=40, blank=True, default="", editable=False)
+
+    parent_field = "sub_county"
+    descendant_models = ("Ward",)
 
     class Meta:
         verbose_name_plural = "Constituencies"
         unique_together = ("sub_county", "name")
         ordering = ["name"]
+        indexes = [models.Index(fields=["name", "id"])]  # keyset pagination
 
     def __str__(self):
         return f"{self.name} ({self.sub_county.name})"
 
 
-class Ward(models.Model):
+class Ward(MaterializedPathModel, BoundaryModel):
     constituency = models.ForeignKey(
         Constituency,
         on_delete=models.CASCADE,
@@ -67,12 +185,55 @@ class Ward(models.Model):
     )
     name = models.CharField(max_length=100)
     code = models.CharField(max_length=20, blank=True, null=True)
+    content_hash = models.CharField(max_length=40, blank=True, default="", editable=False)
+
+    # Wards without a constituency have no known ancestry.
+    parent_field = "constituency"
 
     class Meta:
         verbose_name_plural = "Wards"
         unique_together = ("constituency", "name")
         ordering = ["name"]
+        indexes = [models.Index(fields=["name", "id"])]  # keyset pagination
 
 
     def __str__(self):
         return f"{self.name} ({self.constituency.name})"
+
+
+class LocationSourceTable(models.Model):
+    """
+    Content hash of a source table as of the last location import.
+    Lets incremental re-imports skip tables that have not changed.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    content_hash = models.CharField(max_length=64)
+    row_count = models.PositiveIntegerField(default=0)
+    imported_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
+
+
+class LocationDataVersion(models.Model):
+    """
+    Single-row counter bumped whenever location data changes.
+    Keys the precompressed hierarchy exports served to clients.
+    """
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"v{self.version}"
+
+    @classmethod
+    def current(cls):
+        # The row is created by migration 0012.
+        return cls.objects.get(pk=1)
+
+    @classmethod
+    def bump(cls):
+        cls.objects.filter(pk=1).update(version=models.F("version") + 1, updated_at=timezone.now())
@@ -0,0 +1,106 @@
+"""
+Batch resolution of free-text ward and constituency names to ids.
+
+Names are normalised the same way import_locations stores them
+(``.strip().title()``) and looked up in a precomputed index built from the
+shared location snapshot. Names that miss fall back to a punctuation-
+insensitive key, then to the autocomplete trigram index.
+"""
+from .autocomplete import LEVELS, get_index, normalize
+from .snapshot import get_snapshot
+
+EXACT, LOOSE, FUZZY_WEIGHT = 1.0, 0.9, 0.8
+
+
+class NameIndex:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.exact = {}     # (level, title-cased name) -> [snapshot index]
+        self.loose = {}     # (level, normalized name) -> [snapshot index]
+        self.county_of = {}  # (level, snapshot index) -> county snapshot index
+
+        for level in LEVELS:
+            for i in range(snapshot.count(level)):
+                name = snapshot.name(level, i)
+                self.exact.setdefault((level, name.strip().title()), []).append(i)
+                self.loose.setdefault((level, normalize(name)), []).append(i)
+                self.county_of[(level, i)] = self._county(level, i)
+
+        self.counties = {}
+        for i in range(snapshot.count("county")):
+            self.counties[snapshot.name("county", i).strip().title()] = i
+            if snapshot.code("county", i) is not None:
+                self.counties[snapshot.code("county", i)] = i
+
+    def _county(self, level, i):
+        for parent_level in ("constituency", "subcounty", "county")[LEVELS.index(level):]:
+            i = self.snapshot.parent(level, i)
+            level = parent_level
+            if i is None:
+                return None
+        return i
+
+    def county_index(self, county):
+        """
+        Resolve a county given by name or official code.
+        """
+        county = str(county).strip()
+        i = self.counties.get(county.lstrip("0") or county)
+        return i if i is not None else self.counties.get(county.title())
+
+    def candidate(self, level, i, confidence):
+        county = self.county_of[(level, i)]
+        return {
+            "type": level,
+            "id": self.snapshot.pk(level, i),
+            "name": self.snapshot.name(level, i),
+            "county": self.snapshot.name("county", county) if county is not None else None,
+            "confidence": round(confidence, 3),
+        }
+
+    def resolve(self, name, county=None, levels=LEVELS):
+        county_i = self.county_index(county) if county else None
+        in_county = lambda level, i: county_i is None or self.county_of[(level, i)] == county_i
+
+        for confidence, table, key in (
+            (EXACT, self.exact, name.strip().title()),
+            (LOOSE, self.loose, normalize(name)),
+        ):
+            hits = [
+                (level, i)
+                for level in levels
+                for i in table.get((level, key), ())
+                if in_county(level, i)
+            ]
+            if hits:
+                break
+        else:
+            # Search wider when a county filter will discard most hits.
+            limit = 50 if county_i is not None else 5
+            fuzzy = [
+                (score, level, i)
+                for score, level, i in get_index().search(name, limit=limit, levels=levels)
+                if in_county(level, i)
+            ]
+            if not fuzzy:
+                return {"match": None, "confidence": 0.0, "ambiguous": False, "candidates": []}
+            best = fuzzy[0][0]
+            confidence = min(best, 1.0) * FUZZY_WEIGHT
+            hits = [(level, i) for score, level, i in fuzzy if score == best]
+
+        candidates = [self.candidate(level, i, confidence) for level, i in hits]
+        if len(candidates) == 1:
+            return {"match": candidates[0], "confidence": candidates[0]["confidence"],
+                    "ambiguous": False, "candidates": []}
+        return {"match": None, "confidence": 0.0, "ambiguous": True, "candidates": candidates}
+
+
+_index = None
+
+
+def get_name_index():
+    global _index
+    snapshot = get_snapshot()
+    if _index is None or _index.snapshot is not snapshot:
+        _index = NameIndex(snapshot)
+    return _index
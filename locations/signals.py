@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import County, SubCounty, Constituency, Ward, LocationDataVersion
+
+
+@receiver([post_save, post_delete], sender=County)
+@receiver([post_save, post_delete], sender=SubCounty)
+@receiver([post_save, post_delete], sender=Constituency)
+@receiver([post_save, post_delete], sender=Ward)
+def location_changed(sender, **kwargs):
+    """
+    Bump the location data version in the same transaction as the write,
+    so every host's snapshot and cached export are rebuilt once it commits.
+    """
+    LocationDataVersion.bump()
@@ -0,0 +1,338 @@
+"""
+Read-only, array-backed snapshot of the County → SubCounty → Constituency →
+Ward hierarchy.
+
+The snapshot is written once to a binary file and memory-mapped by every
+worker, so a host keeps a single copy in its page cache however many
+processes serve requests. Each level is a set of fixed-width arrays (ids,
+parent indexes, string offsets, child ranges) plus one shared UTF-8 blob.
+
+Every file records the LocationDataVersion it was built at. Location writes
+bump that version in the database, so each reader, on any host, sees that
+its file is behind and rebuilds it.
+"""
+import fcntl
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .models import County, SubCounty, Constituency, Ward, LocationDataVersion
+
+MAGIC = b"CCLOCSNP"
+FORMAT_VERSION = 2
+# Magic, format, data version, then the four level sizes and the blob length.
+HEADER = struct.Struct("<8sI4xQQQQQQ")
+
+# Builds get_snapshot tries before giving up on reaching the current version.
+BUILD_ATTEMPTS = 3
+
+LEVELS = ("county", "subcounty", "constituency", "ward")
+
+SOURCES = {
+    "county": (County.objects.all(), None),
+    "subcounty": (SubCounty.objects.all(), "county_id"),
+    "constituency": (Constituency.objects.all(), "sub_county_id"),
+    "ward": (Ward.objects.all(), "constituency_id"),
+}
+
+
+def sort_key(level, value, pk):
+    """
+    The key each level is stored in, i.e. the order its viewset lists it:
+    counties by numeric code (missing codes last), the rest by name, ties
+    broken by primary key. Sorting in Python rather than by the database
+    collation lets cursors be bisected on exactly the same key.
+    """
+    if level == "county":
+        return (value is None, int(value) if value is not None else 0, pk)
+    return (value is None, value or "", pk)
+
+
+def snapshot_path():
+    return str(getattr(settings, "LOCATIONS_SNAPSHOT_PATH", os.path.join(settings.BASE_DIR, "locations.snapshot")))
+
+
+def _layout(counts):
+    """
+    Yield (section name, typecode, length) in file order for the given level sizes.
+    """
+    for depth, level in enumerate(LEVELS):
+        n = counts[level]
+        n_children = counts[LEVELS[depth + 1]] if depth + 1 < len(LEVELS) else 0
+        yield f"{level}_id", "q", n
+        yield f"{level}_by_id", "I", n
+        yield f"{level}_parent", "i", n
+        yield f"{level}_name_off", "I", n
+        yield f"{level}_name_len", "i", n
+        yield f"{level}_code_off", "I", n
+        yield f"{level}_code_len", "i", n
+        yield f"{level}_child_start", "I", n + 1
+        yield f"{level}_child_idx", "I", n_children
+
+
+def _padding(size):
+    return -size % 8
+
+
+@contextmanager
+def _replace_lock(path):
+    """
+    Serialise the check-and-replace of the snapshot file between processes.
+    """
+    fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _file_generation(path):
+    """
+    Data version recorded in the snapshot file at ``path``; 0 if it is missing or unreadable.
+    """
+    try:
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+    except FileNotFoundError:
+        return 0
+    if len(header) < HEADER.size:
+        return 0
+    magic, version, generation, *_ = HEADER.unpack(header)
+    return generation if magic == MAGIC and version == FORMAT_VERSION else 0
+
+
+def build_snapshot(path=None):
+    """
+    Read the whole hierarchy from the database and atomically replace the snapshot file.
+
+    The file is stamped with the data version read before the hierarchy, so
+    a write that commits meanwhile leaves it marked as behind, never ahead.
+    Returns False, leaving the file alone, if a newer build already replaced it.
+    """
+    path = path or snapshot_path()
+    generation = LocationDataVersion.current().version
+    counts, sections, blob = _collect()
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, generation, *(counts[level] for level in LEVELS), len(blob)))
+        for name, typecode, length in _layout(counts):
+            data = sections[name].tobytes()
+            f.write(data + b"\0" * _padding(len(data)))
+        f.write(bytes(blob))
+
+    with _replace_lock(path):
+        if _file_generation(path) > generation:
+            os.remove(tmp_path)
+            return False
+        os.replace(tmp_path, path)
+    return True
+
+
+def _collect():
+    """
+    Return (row counts, arrays, string blob) for every level, read from the database.
+    """
+    blob = bytearray()
+    sections = {}
+    counts = {}
+    index_of = {}
+
+    def add_string(value):
+        if value is None:
+            return 0, -1
+        encoded = str(value).encode("utf-8")
+        offset = len(blob)
+        blob.extend(encoded)
+        return offset, len(encoded)
+
+    for level in LEVELS:
+        queryset, parent_field = SOURCES[level]
+        fields = ["id", "name", "code"] + ([parent_field] if parent_field else [])
+        rows = sorted(
+            queryset.values_list(*fields),
+            key=lambda row: sort_key(level, row[2] if level == "county" else row[1], row[0]),
+        )
+        counts[level] = len(rows)
+        index_of[level] = {row[0]: i for i, row in enumerate(rows)}
+
+        ids, parents = array("q"), array("i")
+        name_off, name_len, code_off, code_len = array("I"), array("i"), array("I"), array("i")
+        for row in rows:
+            ids.append(row[0])
+            parent_index = -1
+            if parent_field:
+                parent_level = LEVELS[LEVELS.index(level) - 1]
+                parent_index = index_of[parent_level].get(row[3], -1)
+            parents.append(parent_index)
+            off, length = add_string(row[1])
+            name_off.append(off)
+            name_len.append(length)
+            off, length = add_string(row[2])
+            code_off.append(off)
+            code_len.append(length)
+
+        sections[f"{level}_id"] = ids
+        sections[f"{level}_by_id"] = array("I", sorted(range(len(rows)), key=ids.__getitem__))
+        sections[f"{level}_parent"] = parents
+        sections[f"{level}_name_off"] = name_off
+        sections[f"{level}_name_len"] = name_len
+        sections[f"{level}_code_off"] = code_off
+        sections[f"{level}_code_len"] = code_len
+
+    # Child ranges: children are grouped by parent, keeping their own listing order.
+    for depth, level in enumerate(LEVELS):
+        child_level = LEVELS[depth + 1] if depth + 1 < len(LEVELS) else None
+        grouped = [[] for _ in range(counts[level])]
+        if child_level:
+            for child, parent in enumerate(sections[f"{child_level}_parent"]):
+                if parent >= 0:
+                    grouped[parent].append(child)
+        start, idx = array("I", [0]), array("I")
+        for children in grouped:
+            idx.extend(children)
+            start.append(len(idx))
+        sections[f"{level}_child_start"] = start
+        sections[f"{level}_child_idx"] = idx
+    return counts, sections, blob
+
+
+class LocationSnapshot:
+    """
+    Zero-copy view over a snapshot file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.generation, *sizes = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a location snapshot (format {FORMAT_VERSION})")
+        self.counts = dict(zip(LEVELS, sizes[:4]))
+
+        view = memoryview(self._mm)
+        offset = HEADER.size
+        self._arrays = {}
+        for name, typecode, length in _layout(self.counts):
+            size = length * array(typecode).itemsize
+            self._arrays[name] = view[offset:offset + size].cast(typecode)
+            offset += size + _padding(size)
+        self._blob = view[offset:offset + sizes[4]]
+
+    def _string(self, level, field, i):
+        length = self._arrays[f"{level}_{field}_len"][i]
+        if length < 0:
+            return None
+        offset = self._arrays[f"{level}_{field}_off"][i]
+        return str(self._blob[offset:offset + length], "utf-8")
+
+    def count(self, level):
+        return self.counts[level]
+
+    def index(self, level, pk):
+        """
+        Position of the row with primary key ``pk`` in ``level``, or None.
+        """
+        ids, by_id = self._arrays[f"{level}_id"], self._arrays[f"{level}_by_id"]
+        i = bisect_left(range(len(by_id)), pk, key=lambda j: ids[by_id[j]])
+        if i < len(by_id) and ids[by_id[i]] == pk:
+            return by_id[i]
+        return None
+
+    def pk(self, level, i):
+        return self._arrays[f"{level}_id"][i]
+
+    def name(self, level, i):
+        return self._string(level, "name", i)
+
+    def code(self, level, i):
+        return self._string(level, "code", i)
+
+    def parent(self, level, i):
+        parent = self._arrays[f"{level}_parent"][i]
+        return None if parent < 0 else parent
+
+    def ancestors(self, level, i):
+        """
+        Parent chain of a row as {"type", "id", "name"} dicts, nearest parent first.
+        """
+        chain = []
+        for parent_level in reversed(LEVELS[:LEVELS.index(level)]):
+            i = self.parent(level, i)
+            level = parent_level
+            if i is None:
+                break
+            chain.append({"type": level, "id": self.pk(level, i), "name": self.name(level, i)})
+        return chain
+
+    def children(self, level, i):
+        start = self._arrays[f"{level}_child_start"]
+        return self._arrays[f"{level}_child_idx"][start[i]:start[i + 1]]
+
+    # --- Serializer-compatible output ---
+    def county_data(self, i):
+        code = self.code("county", i)
+        return {"county_id": int(code) if code is not None else None, "county_name": self.name("county", i)}
+
+    def ward_data(self, i):
+        return {"id": self.pk("ward", i), "name": self.name("ward", i), "code": self.code("ward", i)}
+
+    def constituency_data(self, i):
+        return {
+            "id": self.pk("constituency", i),
+            "name": self.name("constituency", i),
+            "code": self.code("constituency", i),
+            "wards": [self.ward_data(w) for w in self.children("constituency", i)],
+        }
+
+    def subcounty_data(self, i):
+        return {
+            "id": self.pk("subcounty", i),
+            "name": self.name("subcounty", i),
+            "code": self.code("subcounty", i),
+            "constituencies": [self.constituency_data(c) for c in self.children("subcounty", i)],
+        }
+
+    def data(self, level, i):
+        return getattr(self, f"{level}_data")(i)
+
+
+_snapshot = None
+
+
+def get_snapshot():
+    """
+    Return this process's mapping of the snapshot for the current data
+    version, re-mapping the file when another process has rebuilt it and
+    building it when it is missing or behind. Each build can lose a race
+    with a newer write, so only BUILD_ATTEMPTS are made.
+    """
+    global _snapshot
+    path = snapshot_path()
+    generation = LocationDataVersion.current().version
+    if _snapshot is not None and _snapshot.path == path and _snapshot.generation >= generation:
+        return _snapshot
+    snapshot = _map(path)
+    for attempt in range(BUILD_ATTEMPTS):
+        if snapshot is not None and snapshot.generation >= generation:
+            _snapshot = snapshot
+            return _snapshot
+        build_snapshot(path)
+        snapshot = _map(path)
+    raise RuntimeError(f"Could not build a location snapshot at data version {generation} in {path}")
+
+
+def _map(path):
+    try:
+        return LocationSnapshot(path)
+    except (FileNotFoundError, ValueError):
+        return None
@@ -1,3 +1,565 @@
-from django.test import TestCase
+import base64
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import brotli
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser
+from . import snapshot
+from .json_stream import iter_file_chunks, iter_table_records
+from .models import County, SubCounty, Constituency, Ward, LocationDataVersion
+from .serializers import SubCountySerializer
+from .views import SubCountyViewSet
+
+
+def export(counties=(), subcounties=(), stations=()):
+    """
+    A phpMyAdmin JSON export with the three tables import_locations reads.
+    """
+    return [
+        {"type": "header", "version": "5.1.1"},
+        {"type": "database", "name": "hci"},
+        {"type": "table", "name": "counties", "database": "hci", "data": [
+            {"county_id": cid, "county_name": name} for cid, name in counties
+        ]},
+        {"type": "table", "name": "subcounties", "database": "hci", "data": [
+            {"subcounty_id": sid, "county_id": cid, "constituency_name": name} for sid, cid, name in subcounties
+        ]},
+        {"type": "table", "name": "station", "database": "hci", "data": [
+            {"station_id": st, "subcounty_id": sid, "constituency_name": const, "ward": ward}
+            for st, sid, const, ward in stations
+        ]},
+    ]
+
+
+SAMPLE = export(
+    counties=[("1", "MOMBASA"), ("42", "KISUMU")],
+    subcounties=[("1", "1", "changamwe"), ("2", "1", "jomvu"), ("3", "42", "kisumu central")],
+    stations=[
+        ("1", "1", "changamwe", "port reitz"),
+        ("2", "1", "changamwe", "kipevu"),
+        ("3", "1", "changamwe", "kipevu"),
+        ("4", "2", "jomvu", "miritini"),
+        ("5", "3", "kisumu central", "nyalenda a"),
+    ],
+)
+
+
+class TempSnapshotMixin:
+    """
+    Points the location snapshot at a per-test directory.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        snapshot_settings = override_settings(LOCATIONS_SNAPSHOT_PATH=os.path.join(self.tmp, "locations.snapshot"))
+        snapshot_settings.enable()
+        self.addCleanup(snapshot_settings.disable)
+
+    def write_export(self, data, name="export.json"):
+        path = os.path.join(self.tmp, name)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        return path
+
+    def import_locations(self, data, *args):
+        out = StringIO()
+        call_command("import_locations", "--file", self.write_export(data), *args, stdout=out)
+        return out.getvalue()
+
+
+class ImportLocationsTests(TempSnapshotMixin, TestCase):
+    def counts(self):
+        return [model.objects.count() for model in (County, SubCounty, Constituency, Ward)]
+
+    def test_import_creates_every_level(self):
+        output = self.import_locations(SAMPLE)
+        self.assertEqual(self.counts(), [2, 3, 3, 4])
+        ward = Ward.objects.get(name="Kipevu")
+        self.assertEqual(ward.constituency.name, "Changamwe")
+        self.assertEqual(ward.constituency.sub_county.county.code, 1)
+        self.assertIn("Wards: 5 source rows, 4 created, 0 updated, 0 deleted", output)
+
+    def test_small_batches_import_the_same_rows(self):
+        self.import_locations(SAMPLE, "--batch-size", "2")
+        self.assertEqual(self.counts(), [2, 3, 3, 4])
+
+    def test_reimport_creates_nothing(self):
+        self.import_locations(SAMPLE)
+        output = self.import_locations(SAMPLE)
+        self.assertEqual(self.counts(), [2, 3, 3, 4])
+        self.assertIn("Wards: 5 source rows, 0 created, 0 updated, 0 deleted", output)
+
+    def test_dry_run_rolls_back(self):
+        output = self.import_locations(SAMPLE, "--dry-run")
+        self.assertIn("Dry run", output)
+        self.assertEqual(self.counts(), [0, 0, 0, 0])
+
+
+class LocationTreeQueryCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser(email="viewer@example.com", is_active=True))
+        self.county = County.objects.create(name="Kisumu", code=42)
+        self.add_subcounty("Kisumu Central")
+
+    def add_subcounty(self, name):
+        sub = SubCounty.objects.create(county=self.county, name=name)
+        const = Constituency.objects.create(sub_county=sub, name=name)
+        for ward in ("A", "B", "C"):
+            Ward.objects.create(constituency=const, name=f"{name} {ward}")
+
+    def test_county_tree_query_count_is_constant(self):
+        with self.assertNumQueries(4):
+            first = self.client.get("/api/locations/counties/42/tree/")
+
+        for i in range(5):
+            self.add_subcounty(f"Sub {i}")
+
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/locations/counties/42/tree/")
+
+        self.assertEqual(len(first.data["subcounties"]), 1)
+        self.assertEqual(len(response.data["subcounties"]), 6)
+        self.assertEqual(len(response.data["subcounties"][0]["constituencies"][0]["wards"]), 3)
+
+    def test_country_tree_query_count_is_constant(self):
+        County.objects.create(name="Nairobi", code=47)
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/locations/counties/tree/")
+        self.assertEqual([c["county_id"] for c in response.data], [42, 47])
+
+    def test_unknown_county_tree_returns_404(self):
+        self.assertEqual(self.client.get("/api/locations/counties/99/tree/").status_code, 404)
+
+    def test_nested_subcounty_queryset_is_prefetched(self):
+        for i in range(5):
+            self.add_subcounty(f"Sub {i}")
+        with self.assertNumQueries(3):
+            SubCountySerializer(SubCountyViewSet.queryset.all(), many=True).data
+
+
+class StreamingImportTests(TempSnapshotMixin, TestCase):
+    def test_reader_yields_records_across_chunk_boundaries(self):
+        path = self.write_export(SAMPLE)
+        records = list(iter_table_records(iter_file_chunks(path, chunk_size=7)))
+        expected = [(t["name"], rec) for t in SAMPLE if t["type"] == "table" for rec in t["data"]]
+        self.assertEqual(records, expected)
+
+    def test_stream_mode_imports_the_same_rows(self):
+        self.import_locations(SAMPLE, "--stream", "--batch-size", "2")
+        streamed = list(Ward.objects.values_list("name", "code", "path").order_by("name"))
+        Ward.objects.all().delete()
+        self.import_locations(SAMPLE)
+        self.assertEqual(streamed, list(Ward.objects.values_list("name", "code", "path").order_by("name")))
+
+
+class IncrementalImportTests(TempSnapshotMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.import_locations(SAMPLE, "--incremental")
+
+    def test_unchanged_export_skips_every_table(self):
+        output = self.import_locations(SAMPLE, "--incremental")
+        for table in ("counties", "subcounties", "station"):
+            self.assertIn(f"Table '{table}' unchanged, skipped.", output)
+        self.assertEqual(Ward.objects.count(), 4)
+
+    def test_inserted_station_keeps_its_ward(self):
+        ward = Ward.objects.get(name="Port Reitz")
+        data = json.loads(json.dumps(SAMPLE))
+        data[4]["data"].insert(0, {
+            "station_id": "9", "subcounty_id": "1", "constituency_name": "changamwe", "ward": "port reitz",
+        })
+        output = self.import_locations(data, "--incremental")
+
+        self.assertIn("Wards: 6 source rows, 0 created, 1 updated, 0 deleted", output)
+        ward.refresh_from_db()
+        self.assertEqual(ward.code, "9")
+        self.assertEqual(Ward.objects.count(), 4)
+
+    def test_removed_ward_is_deleted(self):
+        data = json.loads(json.dumps(SAMPLE))
+        data[4]["data"] = [r for r in data[4]["data"] if r["ward"] != "miritini"]
+        output = self.import_locations(data, "--incremental")
+        self.assertIn("1 deleted", output)
+        self.assertFalse(Ward.objects.filter(name="Miritini").exists())
+        self.assertEqual(Ward.objects.count(), 3)
+
+    def test_renamed_county_is_updated_in_place(self):
+        county = County.objects.get(code=1)
+        data = json.loads(json.dumps(SAMPLE))
+        data[2]["data"][0]["county_name"] = "MOMBASA CITY"
+        output = self.import_locations(data, "--incremental")
+        self.assertIn("Counties: 2 source rows, 0 created, 1 updated, 0 deleted", output)
+        county.refresh_from_db()
+        self.assertEqual(county.name, "Mombasa City")
+        self.assertEqual(SubCounty.objects.filter(county=county).count(), 2)
+
+
+class SnapshotTests(TempSnapshotMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser(email="viewer@example.com", is_active=True))
+        self.import_locations(SAMPLE)
+
+    def test_lists_are_served_from_the_snapshot(self):
+        jomvu = SubCounty.objects.get(name="Jomvu")
+        snapshot.get_snapshot()
+        with CaptureQueriesContext(connection) as queries:
+            wards = self.client.get("/api/locations/wards/").data["results"]
+            subcounty = self.client.get(f"/api/locations/subcounties/{jomvu.pk}/").data
+        # Only the data version is read, once per request.
+        self.assertEqual(len(queries), 2)
+        self.assertTrue(all("locations_locationdataversion" in query["sql"] for query in queries.captured_queries))
+        self.assertEqual([w["name"] for w in wards], ["Kipevu", "Miritini", "Nyalenda A", "Port Reitz"])
+        self.assertEqual(subcounty["constituencies"][0]["wards"][0]["name"], "Miritini")
+
+    def test_location_writes_bump_the_data_version(self):
+        built = snapshot.get_snapshot()
+        version = LocationDataVersion.current().version
+        Ward.objects.filter(name="Miritini").get().delete()
+        self.assertEqual(LocationDataVersion.current().version, version + 1)
+        snap = snapshot.get_snapshot()
+        self.assertEqual((snap.count("ward"), snap.generation), (3, version + 1))
+        self.assertEqual(built.count("ward"), 4)  # existing maps stay valid
+
+    def test_write_from_another_host_is_picked_up(self):
+        snapshot.get_snapshot()
+        # Another host's write: no signal here, only the committed version bump.
+        Ward.objects.filter(name="Miritini").update(name="Mikindani")
+        LocationDataVersion.bump()
+        snap = snapshot.get_snapshot()
+        self.assertIn("Mikindani", [snap.name("ward", i) for i in range(snap.count("ward"))])
+
+    def test_build_racing_a_write_is_rebuilt(self):
+        collect = snapshot._collect
+
+        def collect_then_commit():
+            data = collect()
+            Ward.objects.filter(name="Miritini").update(name="Mikindani")
+            LocationDataVersion.bump()
+            return data
+
+        with mock.patch.object(snapshot, "_collect", collect_then_commit):
+            snapshot.build_snapshot()
+        snap = snapshot.get_snapshot()
+        names = [snap.name("ward", i) for i in range(snap.count("ward"))]
+        self.assertIn("Mikindani", names)
+        self.assertNotIn("Miritini", names)
+
+    def test_older_build_never_replaces_a_newer_file(self):
+        newer = snapshot.get_snapshot().generation
+        with mock.patch.object(LocationDataVersion, "current", return_value=LocationDataVersion(version=newer - 1)):
+            self.assertFalse(snapshot.build_snapshot())
+        self.assertEqual(snapshot._file_generation(snapshot.snapshot_path()), newer)
+
+    def test_builds_are_bounded(self):
+        LocationDataVersion.bump()
+        with mock.patch.object(snapshot, "build_snapshot") as build, mock.patch.object(snapshot, "_snapshot", None):
+            with self.assertRaises(RuntimeError):
+                snapshot.get_snapshot()
+        self.assertEqual(build.call_count, snapshot.BUILD_ATTEMPTS)
+
+
+class SnapshotPaginationTests(TempSnapshotMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser(email="viewer@example.com", is_active=True))
+        County.objects.bulk_create([County(name=f"County {code}", code=code) for code in range(12, 0, -1)])
+        County.objects.create(name="Uncoded")
+
+    def page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_pages_follow_numeric_code_order(self):
+        url, codes = "/api/locations/counties/?page_size=5", []
+        while url:
+            page = self.page(url)
+            codes += [county["county_id"] for county in page["results"]]
+            url = page["next"]
+        self.assertEqual(codes, list(range(1, 13)) + [None])
+
+        previous = self.page(self.page(self.page("/api/locations/counties/?page_size=5")["next"])["previous"])
+        self.assertEqual([county["county_id"] for county in previous["results"]], [1, 2, 3, 4, 5])
+
+    def test_cursor_row_deleted_resumes_at_its_sort_position(self):
+        first = self.page("/api/locations/counties/?page_size=4")
+        self.assertEqual([county["county_id"] for county in first["results"]], [1, 2, 3, 4])
+        with self.captureOnCommitCallbacks(execute=True):
+            County.objects.get(code=4).delete()
+
+        second = self.page(first["next"])
+        self.assertEqual([county["county_id"] for county in second["results"]], [5, 6, 7, 8])
+
+    def test_tampered_cursor_is_rejected(self):
+        cursor = {"v": ["four", 99999], "o": ["code", "pk"]}
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+        response = self.client.get(f"/api/locations/counties/?cursor={encoded}")
+        self.assertEqual(response.status_code, 404)
+
+
+class HierarchyExportTests(TempSnapshotMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser(email="viewer@example.com", is_active=True))
+        self.import_locations(SAMPLE)
+
+    def test_bodies_are_precompressed_per_encoding(self):
+        identity = self.client.get("/api/locations/hierarchy/")
+        self.assertNotIn("Content-Encoding", identity)
+        tree = json.loads(identity.content)
+        self.assertEqual([c["county_name"] for c in tree], ["Mombasa", "Kisumu"])
+
+        gzipped = self.client.get("/api/locations/hierarchy/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(gzipped["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(gzipped.content)), tree)
+
+        br = self.client.get("/api/locations/hierarchy/", HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(br["Content-Encoding"], "br")
+        self.assertEqual(json.loads(brotli.decompress(br.content)), tree)
+        self.assertEqual(len({identity["ETag"], gzipped["ETag"], br["ETag"]}), 3)
+
+    def test_matching_etag_gets_304(self):
+        etag = self.client.get("/api/locations/hierarchy/", HTTP_ACCEPT_ENCODING="gzip")["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/locations/hierarchy/", HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_viewset_write_bumps_the_version(self):
+        etag = self.client.get("/api/locations/hierarchy/")["ETag"]
+        ward = Ward.objects.get(name="Miritini")
+        self.assertEqual(self.client.patch(f"/api/locations/wards/{ward.pk}/", {"name": "Mikindani"}).status_code, 200)
+
+        response = self.client.get("/api/locations/hierarchy/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn(b"Mikindani", response.content)
+
+
+class AutocompleteTests(TempSnapshotMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser(email="viewer@example.com", is_active=True))
+        self.import_locations(SAMPLE)
+
+    def search(self, q, **params):
+        response = self.client.get("/api/locations/autocomplete/", {"q": q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data["results"]
+
+    def test_exact_then_name_prefix_then_word_prefix(self):
+        self.search("central")
+        jomvu = Constituency.objects.get(name="Jomvu")
+        # The index is rebuilt once the write commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            Ward.objects.create(constituency=jomvu, name="Central")
+            Ward.objects.create(constituency=jomvu, name="Centralia")
+        names = [r["name"] for r in self.search("central")]
+        self.assertEqual(names, ["Central", "Centralia", "Kisumu Central"])
+
+    def test_one_letter_prefix_is_ranked(self):
+        results = self.search("k", limit=2)
+        self.assertEqual([(r["type"], r["name"]) for r in results], [("ward", "Kipevu"), ("constituency", "Kisumu Central")])
+        self.assertEqual([r["name"] for r in self.search("k", type="constituency")], ["Kisumu Central"])
+
+    def test_typos_fall_back_to_trigrams(self):
+        results = self.search("nyalnda")
+        self.assertEqual(results[0]["name"], "Nyalenda A")
+        self.assertLess(results[0]["score"], 1.5)
+
+    def test_results_carry_the_parent_path(self):
+        result = self.search("port reitz")[0]
+        self.assertEqual(result["score"], 3.0)
+        self.assertEqual(
+            [(p["type"], p["name"]) for p in result["path"]],
+            [("constituency", "Changamwe"), ("subcounty", "Changamwe"), ("county", "Mombasa")],
+        )
+
+
+class ResolveTests(TempSnapshotMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser(email="viewer@example.com", is_active=True))
+        self.import_locations(SAMPLE)
+
+    def resolve(self, names, **body):
+        response = self.client.post("/api/locations/resolve/", {"names": names, **body}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_exact_loose_and_fuzzy_matches(self):
+        data = self.resolve(["kisumu central", "Nyalenda-A", "nyalnda", "zzzz"])
+        exact, loose, fuzzy, missing = data["results"]
+        self.assertEqual((exact["match"]["type"], exact["confidence"]), ("constituency", 1.0))
+        self.assertEqual((loose["match"]["name"], loose["confidence"]), ("Nyalenda A", 0.9))
+        self.assertEqual(fuzzy["match"]["name"], "Nyalenda A")
+        self.assertLess(fuzzy["confidence"], 0.8)
+        self.assertIsNone(missing["match"])
+        self.assertEqual((data["count"], data["resolved"]), (4, 3))
+
+    def test_county_context_settles_ambiguous_names(self):
+        other = Constituency.objects.get(name="Kisumu Central")
+        with self.captureOnCommitCallbacks(execute=True):
+            Ward.objects.create(constituency=other, name="Kipevu")
+
+        ambiguous = self.resolve(["kipevu"])["results"][0]
+        self.assertTrue(ambiguous["ambiguous"])
+        self.assertEqual({c["county"] for c in ambiguous["candidates"]}, {"Mombasa", "Kisumu"})
+
+        by_code = self.resolve(["kipevu"], county="042")["results"][0]
+        per_name = self.resolve([{"name": "kipevu", "county": "mombasa", "type": "ward"}])["results"][0]
+        self.assertEqual(by_code["match"]["county"], "Kisumu")
+        self.assertEqual(per_name["match"]["county"], "Mombasa")
+
+    def test_invalid_entries_are_reported_per_row(self):
+        data = self.resolve(["kipevu", {"name": " "}, 7])
+        self.assertEqual([("error" in r) for r in data["results"]], [False, True, True])
+
+    def test_rejects_empty_and_oversized_batches(self):
+        url = "/api/locations/resolve/"
+        self.assertEqual(self.client.post(url, {"names": []}, format="json").status_code, 400)
+        with mock.patch("locations.views.LocationResolveView.max_names", 2):
+            self.assertEqual(self.client.post(url, {"names": ["a", "b", "c"]}, format="json").status_code, 400)
+
+
+class MaterializedPathTests(TempSnapshotMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser(email="viewer@example.com", is_active=True))
+        self.import_locations(SAMPLE)
+        self.mombasa, self.kisumu = County.objects.get(code=1), County.objects.get(code=42)
+        self.jomvu = SubCounty.objects.get(name="Jomvu")
+
+    def ward_names(self, **params):
+        response = self.client.get("/api/locations/wards/", params)
+        return sorted(w["name"] for w in response.data["results"])
+
+    def test_import_and_save_maintain_paths(self):
+        const = Constituency.objects.get(name="Jomvu")
+        ward = Ward.objects.get(name="Miritini")
+        self.assertEqual(ward.path, f"/{self.mombasa.pk}/{self.jomvu.pk}/{const.pk}/")
+        self.assertEqual(ward.ancestor_ids(), [self.mombasa.pk, self.jomvu.pk, const.pk])
+        self.assertEqual(Ward.objects.create(constituency=const, name="Mikindani").path, ward.path)
+        self.assertEqual(Ward.objects.create(name="Unplaced").path, "")
+
+    def test_moving_a_subcounty_rewrites_descendant_paths(self):
+        self.jomvu.county = self.kisumu
+        self.jomvu.save()
+        const = Constituency.objects.get(name="Jomvu")
+        self.assertEqual(const.path, f"/{self.kisumu.pk}/{self.jomvu.pk}/")
+        self.assertTrue(Ward.objects.get(name="Miritini").path.startswith(f"/{self.kisumu.pk}/"))
+        self.assertEqual(Ward.objects.get(name="Kipevu").path.split("/")[1], str(self.mombasa.pk))
+
+    def test_ancestor_filters(self):
+        self.assertEqual(self.ward_names(county=self.mombasa.pk), ["Kipevu", "Miritini", "Port Reitz"])
+        self.assertEqual(self.ward_names(subcounty=self.jomvu.pk), ["Miritini"])
+        self.assertEqual(self.ward_names(county="x"), [])
+        self.assertEqual(self.ward_names(subcounty=0), [])
+
+        response = self.client.get("/api/locations/constituencies/", {"county": self.kisumu.pk})
+        self.assertEqual([c["name"] for c in response.data["results"]], ["Kisumu Central"])
+
+    def test_county_filter_is_one_query_without_joins(self):
+        with self.assertNumQueries(1) as queries:
+            self.ward_names(county=self.mombasa.pk)
+        self.assertNotIn("JOIN", queries.captured_queries[0]["sql"])
+
+
+def square(lng, lat, size=1.0):
+    return {"type": "Polygon", "coordinates": [[
+        [lng, lat], [lng + size, lat], [lng + size, lat + size], [lng, lat + size], [lng, lat],
+    ]]}
+
+
+class BoundaryTests(TempSnapshotMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser(email="viewer@example.com", is_active=True))
+        self.import_locations(SAMPLE)
+
+    def import_boundaries(self, features):
+        path = self.write_export({"type": "FeatureCollection", "features": features}, name="wards.geojson")
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("import_boundaries", "--file", path, stdout=out)
+        return out.getvalue()
+
+    def test_set_boundary_keeps_a_bounding_box(self):
+        ward = Ward(name="Test")
+        ward.set_boundary({"type": "MultiPolygon", "coordinates": [square(36, -1)["coordinates"], square(38, 0)["coordinates"]]})
+        self.assertEqual((ward.min_lng, ward.min_lat, ward.max_lng, ward.max_lat), (36, -1, 39, 1))
+        ward.set_boundary(None)
+        self.assertIsNone(ward.min_lng)
+
+    def test_set_boundary_rejects_malformed_geometry(self):
+        for geometry in (
+            {"type": "Polygon", "coordinates": []},
+            {"type": "Polygon", "coordinates": [[]]},
+            {"type": "MultiPolygon", "coordinates": [[]]},
+            {"type": "Polygon", "coordinates": [[[0, 0], [1, 1]]]},
+            {"type": "Polygon", "coordinates": [[["a", 0], [1, 0], [1, 1], [0, 0]]]},
+            {"type": "Point", "coordinates": [0, 0]},
+            "POLYGON",
+        ):
+            with self.subTest(geometry=geometry), self.assertRaises(ValidationError):
+                Ward(name="Test").set_boundary(geometry)
+
+    def test_locate_single_and_batch(self):
+        output = self.import_boundaries([
+            {"type": "Feature", "properties": {"name": "Kipevu"}, "geometry": square(39.6, -4.1, 0.1)},
+            {"type": "Feature", "properties": {"name": "Miritini"}, "geometry": square(39.5, -4.1, 0.1)},
+            {"type": "Feature", "properties": {"name": "Port Reitz"}, "geometry": {"type": "Polygon", "coordinates": []}},
+        ])
+        self.assertIn("Wards: 2 updated", output)
+        self.assertIn("invalid or non-polygon features: 1", output)
+
+        response = self.client.get("/api/locations/locate/", {"lat": -4.05, "lng": 39.65})
+        self.assertEqual(response.data["ward"]["name"], "Kipevu")
+        self.assertEqual(response.data["ward"]["path"][-1]["name"], "Mombasa")
+        self.assertEqual(self.client.get("/api/locations/locate/", {"lat": 0, "lng": 0}).status_code, 404)
+        self.assertEqual(self.client.get("/api/locations/locate/", {"lat": 91, "lng": 0}).status_code, 400)
+
+        response = self.client.post(
+            "/api/locations/locate/batch/", {"points": [[-4.05, 39.55], {"lat": 0, "lng": 0}, "x"]}, format="json"
+        )
+        results = response.data["results"]
+        self.assertEqual(results[0]["ward"]["name"], "Miritini")
+        self.assertIsNone(results[1]["ward"])
+        self.assertIn("error", results[2])
+
+    def test_lists_never_load_boundaries(self):
+        self.import_boundaries([
+            {"type": "Feature", "properties": {"name": "Kipevu"}, "geometry": square(39.6, -4.1, 0.1)},
+        ])
+        county = County.objects.get(code=1)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/api/locations/wards/", {"county": county.pk})
+            self.client.get("/api/locations/constituencies/", {"county": county.pk})
+            SubCountySerializer(SubCountyViewSet.queryset.all(), many=True).data
+        self.assertEqual(len(queries), 6)
+        for query in queries.captured_queries:
+            self.assertNotIn("boundary", query["sql"])
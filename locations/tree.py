@@ -0,0 +1,45 @@
+"""
+Builds the nested County → SubCounty → Constituency → Ward tree with one
+query per level, instead of letting nested serializers query per parent.
+"""
+from .models import SubCounty, Constituency, Ward
+
+
+def build_tree(counties):
+    """
+    Return the nested hierarchy for the given County queryset.
+    Runs exactly four queries whatever the amount of data.
+    """
+    counties = list(counties.values("id", "code", "name"))
+    county_ids = [c["id"] for c in counties]
+
+    subcounties = SubCounty.objects.filter(county_id__in=county_ids).values("id", "name", "code", "county_id")
+    constituencies = Constituency.objects.filter(
+        sub_county__county_id__in=county_ids
+    ).values("id", "name", "code", "sub_county_id")
+    wards = Ward.objects.filter(
+        constituency__sub_county__county_id__in=county_ids
+    ).values("id", "name", "code", "constituency_id")
+
+    wards_by_const = {}
+    for ward in wards:
+        wards_by_const.setdefault(ward.pop("constituency_id"), []).append(ward)
+
+    consts_by_sub = {}
+    for const in constituencies:
+        const["wards"] = wards_by_const.get(const["id"], [])
+        consts_by_sub.setdefault(const.pop("sub_county_id"), []).append(const)
+
+    subs_by_county = {}
+    for sub in subcounties:
+        sub["constituencies"] = consts_by_sub.get(sub["id"], [])
+        subs_by_county.setdefault(sub.pop("county_id"), []).append(sub)
+
+    return [
+        {
+            "county_id": county["code"],
+            "county_name": county["name"],
+            "subcounties": subs_by_county.get(county["id"], []),
+        }
+        for county in counties
+    ]
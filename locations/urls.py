@@ -1,5 +1,9 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import CountyViewSet, SubCountyViewSet, ConstituencyViewSet, WardViewSet
+from .views import (
+    CountyViewSet, SubCountyViewSet, ConstituencyViewSet, WardViewSet, LocationHierarchyView,
+    LocationAutocompleteView, LocationResolveView, LocateView, LocateBatchView,
+)
 
 router = DefaultRouter()
 router.register(r'counties', CountyViewSet, basename='counties')
@@ -7,4 +11,10 @@ router.register(r'subcounties', SubCountyViewSet)
 router.register(r'constituencies', ConstituencyViewSet)
 router.register(r'wards', WardViewSet)
 
-urlpatterns = router.urls
+urlpatterns = [
+    path('hierarchy/', LocationHierarchyView.as_view(), name='location-hierarchy'),
+    path('autocomplete/', LocationAutocompleteView.as_view(), name='location-autocomplete'),
+    path('resolve/', LocationResolveView.as_view(), name='location-resolve'),
+    path('locate/', LocateView.as_view(), name='location-locate'),
+    path('locate/batch/', LocateBatchView.as_view(), name='location-locate-batch'),
+] + router.urls
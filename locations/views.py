@@ -1,26 +1,272 @@
-from rest_framework import viewsets
-from .models import County, SubCounty, Constituency, Ward
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import viewsets, serializers
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .autocomplete import LEVELS as AUTOCOMPLETE_LEVELS, get_index
+from .exports import get_export
+from .geo import get_locator
+from .resolve import get_name_index
+from .models import County, SubCounty, Constituency, Ward, LocationDataVersion
 from .serializers import CountySerializer, SubCountySerializer, ConstituencySerializer, WardSerializer
+from .snapshot import get_snapshot, sort_key
+from .tree import build_tree
 
 
+class SnapshotReadMixin:
+    """
+    Serves list and retrieve from the shared, memory-mapped location snapshot
+    instead of the database. Writes still go through the regular viewset.
+    """
+    snapshot_level = None
+    # The viewset's ordering, which the snapshot stores rows in (see snapshot.sort_key).
+    snapshot_ordering = ("name", "pk")
+    # Query params the snapshot cannot answer; lists using them hit the database.
+    filter_params = ()
+
+    def list(self, request, *args, **kwargs):
+        if any(param in request.query_params for param in self.filter_params):
+            return super().list(request, *args, **kwargs)
+        snapshot = get_snapshot()
+        level = self.snapshot_level
+        if self.paginator is None:
+            return Response([snapshot.data(level, i) for i in range(snapshot.count(level))])
+
+        field = getattr(snapshot, self.snapshot_ordering[0])
+        positions = self.paginator.paginate_sequence(
+            snapshot.count(level),
+            key=lambda i: [field(level, i), snapshot.pk(level, i)],
+            ordering=self.snapshot_ordering,
+            request=request,
+            find=lambda pk: snapshot.index(level, pk) if isinstance(pk, int) else None,
+            sort_key=lambda values: sort_key(level, *values),
+        )
+        return self.get_paginated_response([snapshot.data(level, i) for i in positions])
+
+    def retrieve(self, request, *args, **kwargs):
+        snapshot = get_snapshot()
+        try:
+            pk = int(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except (TypeError, ValueError):
+            raise Http404
+        i = snapshot.index(self.snapshot_level, pk)
+        if i is None:
+            raise Http404
+        return Response(snapshot.data(self.snapshot_level, i))
+
 
-class CountyViewSet(viewsets.ReadOnlyModelViewSet):
+class AncestorFilterMixin:
+    """
+    Filters by ?county= and ?subcounty= with one indexed prefix match on the
+    materialized ``path`` column instead of joining up the hierarchy.
+    """
+    filter_params = ("county", "subcounty")
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        county_id = self.request.query_params.get("county")
+        subcounty_id = self.request.query_params.get("subcounty")
+        if county_id:
+            if not county_id.isdigit():
+                return qs.none()
+            qs = qs.filter(path__startswith=f"/{county_id}/")
+        if subcounty_id:
+            subcounty = None
+            if subcounty_id.isdigit():
+                subcounty = SubCounty.objects.filter(pk=subcounty_id).only("path").first()
+            if subcounty is None:
+                return qs.none()
+            qs = qs.filter(path__startswith=subcounty.descendant_prefix())
+        return qs
+
+
+class CountyViewSet(SnapshotReadMixin, viewsets.ReadOnlyModelViewSet):
     """
     Returns a list of all counties.
     """
-    queryset = County.objects.all().order_by('code')
+    # Boundaries are never serialized, so their polygons are never loaded.
+    queryset = County.objects.defer("boundary").order_by('code')
     serializer_class = CountySerializer
+    snapshot_level = "county"
+    snapshot_ordering = ("code", "pk")
+
+    @action(detail=False, methods=["get"], url_path="tree")
+    def country_tree(self, request):
+        """
+        Full County → SubCounty → Constituency → Ward tree for the whole country.
+        """
+        return Response(build_tree(self.get_queryset()))
 
-class SubCountyViewSet(viewsets.ModelViewSet):
-    queryset = SubCounty.objects.all()
+    @action(detail=False, methods=["get"], url_path=r"(?P<code>\d+)/tree")
+    def tree(self, request, code=None):
+        """
+        Nested hierarchy of a single county, looked up by its official code.
+        """
+        data = build_tree(self.get_queryset().filter(code=code))
+        if not data:
+            raise Http404
+        return Response(data[0])
+
+class SubCountyViewSet(SnapshotReadMixin, viewsets.ModelViewSet):
+    queryset = SubCounty.objects.defer("boundary").prefetch_related(
+        Prefetch("constituencies", queryset=Constituency.objects.defer("boundary")),
+        Prefetch("constituencies__wards", queryset=Ward.objects.defer("boundary")),
+    )
     serializer_class = SubCountySerializer
+    snapshot_level = "subcounty"
 
 
-class ConstituencyViewSet(viewsets.ModelViewSet):
-    queryset = Constituency.objects.all()
+class ConstituencyViewSet(AncestorFilterMixin, SnapshotReadMixin, viewsets.ModelViewSet):
+    queryset = Constituency.objects.defer("boundary").prefetch_related(
+        Prefetch("wards", queryset=Ward.objects.defer("boundary"))
+    )
     serializer_class = ConstituencySerializer
+    snapshot_level = "constituency"
 
 
-class WardViewSet(viewsets.ModelViewSet):
-    queryset = Ward.objects.all()
+class WardViewSet(AncestorFilterMixin, SnapshotReadMixin, viewsets.ModelViewSet):
+    queryset = Ward.objects.defer("boundary")
     serializer_class = WardSerializer
+    snapshot_level = "ward"
+
+
+class LocationHierarchyView(APIView):
+    """
+    Full location hierarchy as precompressed JSON, with a strong ETag and
+    Last-Modified so unchanged clients get a 304 without any serializer work.
+    """
+
+    def get(self, request):
+        export = get_export(LocationDataVersion.current())
+        encoding = export.negotiate(request.META.get("HTTP_ACCEPT_ENCODING"))
+
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if if_none_match:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            not_modified = "*" in tags or bool(tags & set(export.etags.values()))
+        else:
+            since = parse_http_date_safe(request.META.get("HTTP_IF_MODIFIED_SINCE", ""))
+            not_modified = since is not None and int(export.last_modified.timestamp()) <= since
+
+        if not_modified:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(export.bodies[encoding], content_type="application/json")
+            if encoding != "identity":
+                response["Content-Encoding"] = encoding
+
+        response["ETag"] = export.etags[encoding]
+        response["Last-Modified"] = http_date(export.last_modified.timestamp())
+        response["Vary"] = "Accept-Encoding"
+        response["Cache-Control"] = "no-cache"
+        return response
+
+
+class LocationAutocompleteView(APIView):
+    """
+    Ranked type-ahead matches over ward and constituency names.
+    Query params: q (required), limit (default 10, max 50), type (ward or constituency).
+    """
+
+    def get(self, request):
+        query = request.query_params.get("q", "")
+        try:
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        level = request.query_params.get("type")
+        levels = (level,) if level in AUTOCOMPLETE_LEVELS else AUTOCOMPLETE_LEVELS
+        return Response({"query": query, "results": get_index().results(query, limit, levels)})
+
+
+class LocationResolveView(APIView):
+    """
+    Resolves a batch of free-text ward/constituency names to ids in one request.
+
+    Body: {"names": [...], "county": optional default county name or code}.
+    Each name is a string or {"name": ..., "county": ..., "type": "ward" | "constituency"}.
+    """
+    max_names = 5000
+
+    def post(self, request):
+        data = request.data
+        names = data.get("names") if isinstance(data, dict) else data
+        default_county = data.get("county") if isinstance(data, dict) else None
+        if not isinstance(names, list) or not names:
+            raise serializers.ValidationError({"names": "Provide a non-empty list of names."})
+        if len(names) > self.max_names:
+            raise serializers.ValidationError({"names": f"At most {self.max_names} names per request."})
+
+        index = get_name_index()
+        results = []
+        for item in names:
+            if isinstance(item, str):
+                item = {"name": item}
+            if not isinstance(item, dict) or not isinstance(item.get("name"), str) or not item["name"].strip():
+                results.append({"input": item, "error": "Each entry needs a non-empty name."})
+                continue
+            level = item.get("type")
+            levels = (level,) if level in AUTOCOMPLETE_LEVELS else AUTOCOMPLETE_LEVELS
+            result = index.resolve(item["name"], item.get("county", default_county), levels)
+            results.append({"input": item["name"], **result})
+
+        return Response({
+            "count": len(results),
+            "resolved": sum(1 for r in results if r.get("match")),
+            "ambiguous": sum(1 for r in results if r.get("ambiguous")),
+            "results": results,
+        })
+
+
+def _coordinates(lat, lng):
+    lat, lng = float(lat), float(lng)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError("Coordinates out of range")
+    return lat, lng
+
+
+class LocateView(APIView):
+    """
+    Reverse-geocodes ?lat=&lng= to the ward whose boundary contains it.
+    """
+
+    def get(self, request):
+        try:
+            lat, lng = _coordinates(request.query_params.get("lat"), request.query_params.get("lng"))
+        except (TypeError, ValueError):
+            raise serializers.ValidationError({"detail": "Provide numeric lat and lng query parameters."})
+        ward = get_locator().result(lat, lng)
+        if ward is None:
+            raise Http404("No ward boundary contains this point.")
+        return Response({"lat": lat, "lng": lng, "ward": ward})
+
+
+class LocateBatchView(APIView):
+    """
+    Reverse-geocodes a batch of points in one request.
+    Body: {"points": [{"lat": ..., "lng": ...}, ...]} (or [lat, lng] pairs).
+    """
+    max_points = 10000
+
+    def post(self, request):
+        points = request.data.get("points") if isinstance(request.data, dict) else request.data
+        if not isinstance(points, list) or not points:
+            raise serializers.ValidationError({"points": "Provide a non-empty list of points."})
+        if len(points) > self.max_points:
+            raise serializers.ValidationError({"points": f"At most {self.max_points} points per request."})
+
+        locator = get_locator()
+        results = []
+        for point in points:
+            try:
+                if isinstance(point, dict):
+                    lat, lng = _coordinates(point.get("lat"), point.get("lng"))
+                else:
+                    lat, lng = _coordinates(*point)
+            except (TypeError, ValueError):
+                results.append({"input": point, "error": "Invalid coordinates."})
+                continue
+            results.append({"lat": lat, "lng": lng, "ward": locator.result(lat, lng)})
+        return Response({"count": len(results), "results": results})